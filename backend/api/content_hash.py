@@ -0,0 +1,93 @@
+# backend/api/content_hash.py
+"""
+Content hash of a forecast document, used to skip writes that would not
+change anything.
+
+compute() hashes the content fields only (CONTENT_FIELDS), in a normalized
+form: the date as YYYY-MM-DD, kp values whichever layout they are stored in
+(api.kp_codec), numbers as floats, and empty values treated as absent.
+Timestamps, derived fields and the storage layout therefore do not affect
+the hash, and the ORM and pymongo write paths agree on it.
+
+Writers stamp `content_hash` on every document. Before a batch is written,
+split_unchanged() fetches the stored hashes of the batch's days with a single
+$in query and drops the documents whose (date, source) already holds the
+same hash.
+
+Kept free of Django imports so standalone scripts can use it.
+"""
+
+import hashlib
+import json
+
+from .kp_codec import kp_list
+from .schema import infer_source
+from .utils_spaceweather import to_utc_date, date_match_values
+
+HASH_FIELD = "content_hash"
+CONTENT_FIELDS = (
+    "date", "source", "kp_index", "kp_daily_avg", "a_index", "radio_flux", "solar_radiation",
+    "radio_blackout", "rationale_geomagnetic", "rationale_radiation", "rationale_blackout",
+)
+
+
+def _norm(value):
+    if isinstance(value, bool) or value is None or isinstance(value, str):
+        return value
+    if isinstance(value, (int, float)):
+        return float(value)
+    if isinstance(value, dict):
+        return {str(k): _norm(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_norm(v) for v in value]
+    return str(value)
+
+
+def compute(doc):
+    """Hex digest of the document's content fields."""
+    content = {}
+    for field in CONTENT_FIELDS:
+        if field == "date":
+            value = to_utc_date(doc.get("date"))
+            value = value.isoformat() if value else None
+        elif field == "kp_index":
+            value = kp_list(doc)
+        elif field == "source":
+            value = infer_source(doc)
+        else:
+            value = doc.get(field)
+        if value in (None, "", [], {}):
+            continue
+        content[field] = _norm(value)
+    payload = json.dumps(content, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+
+def stamp(docs):
+    """Set content_hash on each document in place; returns docs."""
+    for doc in docs:
+        doc[HASH_FIELD] = compute(doc)
+    return docs
+
+
+def _key(doc):
+    return to_utc_date(doc.get("date")), infer_source(doc)
+
+
+def existing_hashes(collection, docs):
+    """{(day, source): stored hash} for the batch's days, in one $in query."""
+    days = {to_utc_date(doc.get("date")) for doc in docs} - {None}
+    keys = [k for day in days for k in date_match_values(day)]
+    if not keys:
+        return {}
+    found = collection.find({"date": {"$in": keys}},
+                            projection={"date": 1, "source": 1, "rationale_geomagnetic": 1, HASH_FIELD: 1})
+    return {_key(d): d.get(HASH_FIELD) for d in found}
+
+
+def split_unchanged(collection, docs):
+    """Stamp `docs` and return (docs to write, number skipped as unchanged)."""
+    stamp(docs)
+    stored = existing_hashes(collection, docs)
+    changed = [doc for doc in docs if stored.get(_key(doc)) != doc[HASH_FIELD]]
+    return changed, len(docs) - len(changed)
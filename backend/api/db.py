@@ -59,6 +59,7 @@ init_mongo()
 
 from django.core.exceptions import ValidationError
 from forecast.models import Forecast3Day
+from . import validation
 from datetime import datetime
 
 
@@ -70,9 +71,18 @@ def save_forecast3day_validated(doc: dict) -> dict:
          kp_index, a_index, radio_flux, solar_radiation, radio_blackout,
          rationale_geomagnetic, rationale_radiation, rationale_blackout)
 
-    Returns a dict: {"ok": True, "method": "orm"|"pymongo", "id": <id/string>}
-    On validation failure returns {"ok": False, "error": str(...)}
+    Upserts on (date, source) and skips the write when the stored content hash
+    matches (api.content_hash), like the publish / ingest writers.
+
+    Returns a dict: {"ok": True, "method": "orm"|"pymongo", "action": "created"|"updated"|"unchanged",
+    "id": <id/string>}. On validation failure returns {"ok": False, "error": str(...)}
     """
+    # same rules as full_clean (api.validation), checked before building the
+    # instance so malformed JSON fields come back as errors, not exceptions
+    errors = validation.field_errors(doc)
+    if errors:
+        return {"ok": False, "error": "validation failed: " + "; ".join(f"{k}: {v}" for k, v in errors.items())}
+
     # normalize date
     try:
         d = doc.get("date")
@@ -89,6 +99,7 @@ def save_forecast3day_validated(doc: dict) -> dict:
             rationale_geomagnetic=doc.get("rationale_geomagnetic", "") or "",
             rationale_radiation=doc.get("rationale_radiation", "") or "",
             rationale_blackout=doc.get("rationale_blackout", "") or "",
+            source=doc.get("source", "") or "",
         )
     except Exception as e:
         return {"ok": False, "error": f"payload parse error: {e}"}
@@ -99,18 +110,37 @@ def save_forecast3day_validated(doc: dict) -> dict:
     except ValidationError as e:
         return {"ok": False, "error": f"validation failed: {e}"}
 
-    # save via ORM
+    # upsert via ORM on (date, source); an unchanged row (same content hash) is not rewritten
     try:
+        inst.normalize()
+        stored = Forecast3Day.objects.filter(date=inst.date, source=inst.source).first()
+        if stored is not None:
+            if stored.content_hash == inst.content_hash:
+                return {"ok": True, "method": "orm", "action": "unchanged", "id": str(stored.id)}
+            inst.pk, inst.kp_packed = stored.pk, stored.kp_packed
         inst.save()
-        return {"ok": True, "method": "orm", "id": str(inst.id)}
+        return {"ok": True, "method": "orm", "action": "updated" if stored else "created", "id": str(inst.id)}
     except Exception as orm_exc:
         logger.exception("ORM save failed, falling back to pymongo: %s", orm_exc)
-        # fallback to pymongo
+        # fallback to pymongo, through the same stamp-and-skip upsert as publish / ingest
         try:
             if collection is None:
                 init_mongo()
-            res = collection.insert_one(doc)
-            return {"ok": True, "method": "pymongo", "id": str(res.inserted_id)}
+            from .schema import canonicalize_doc
+            from .publish import upsert_op
+            from . import content_hash
+            doc = canonicalize_doc(doc)
+            changed, unchanged = content_hash.split_unchanged(collection, [doc])
+            if unchanged:
+                return {"ok": True, "method": "pymongo", "action": "unchanged", "id": None}
+            res = collection.bulk_write([upsert_op(doc)])
+            from .rollups import refresh_days
+            from .kp_series import sync_days
+            refresh_days(collection, [doc.get("date")])
+            sync_days(collection, [doc.get("date")])
+            upserted = res.upserted_ids.get(0)
+            return {"ok": True, "method": "pymongo", "action": "created" if upserted else "updated",
+                    "id": str(upserted) if upserted else None}
         except Exception as mongo_exc:
             logger.exception("Pymongo fallback failed: %s", mongo_exc)
             return {"ok": False, "error": f"both ORM and pymongo failed: {mongo_exc}"}
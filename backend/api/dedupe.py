@@ -0,0 +1,115 @@
+# backend/api/dedupe.py
+"""
+Incremental duplicate removal for forecast documents.
+
+A duplicate is a second document with the same key: (day, source) by
+default, which is the identity the writers upsert on (api.publish), or the
+calendar day alone with by="day". Within a key the survivor is chosen by
+rank(): preferred source first (NOAA > LSTM model > other model output >
+seed), then latest issuance (created_at, else the ObjectId timestamp), then
+the greater _id, so the choice never depends on scan order.
+
+The collection is processed in date windows: each window loads only the
+fields rank() needs, decides the losers, streams their full documents to a
+gzip NDJSON backup (Extended JSON, so types survive a restore) and only
+then deletes them. Memory is bounded by one window. Only BSON Date `date`
+values are windowed; run normalize_forecast_schema first on older data.
+
+Kept free of Django imports so standalone scripts can use it.
+"""
+
+import gzip
+from datetime import datetime, timedelta
+
+from bson import ObjectId, json_util
+
+from .schema import SOURCE_GFZ, SOURCE_ML, SOURCE_LSTM, SOURCE_NOAA, SOURCE_SEED, infer_source
+from .utils_spaceweather import to_utc_date
+
+SOURCE_RANK = {SOURCE_GFZ: 4, SOURCE_NOAA: 3, SOURCE_LSTM: 2, SOURCE_ML: 1, SOURCE_SEED: 0}
+RANK_FIELDS = ("_id", "date", "source", "created_at", "rationale_geomagnetic")
+BY_CHOICES = ("source", "day")
+
+
+def issued_at(doc):
+    created = doc.get("created_at")
+    if isinstance(created, datetime):
+        return created.replace(tzinfo=None)
+    oid = doc.get("_id")
+    return oid.generation_time.replace(tzinfo=None) if isinstance(oid, ObjectId) else datetime.min
+
+
+def rank(doc):
+    """Survivor order: higher wins."""
+    return SOURCE_RANK.get(infer_source(doc), 0), issued_at(doc), str(doc.get("_id"))
+
+
+def key_of(doc, by="source"):
+    day = to_utc_date(doc.get("date"))
+    return day if by == "day" else (day, infer_source(doc))
+
+
+def losers(docs, by="source"):
+    """_ids of every document that is not its key's survivor (documents without a usable date are left alone)."""
+    best = {}
+    for doc in docs:
+        key = key_of(doc, by)
+        if (key if by == "day" else key[0]) is None:
+            continue
+        if key not in best or rank(doc) > rank(best[key]):
+            best[key] = doc
+    keep = {id(doc) for doc in best.values()}
+    return [doc["_id"] for doc in docs
+            if id(doc) not in keep and to_utc_date(doc.get("date")) is not None]
+
+
+def date_bounds(collection):
+    """(first, last) BSON dates in the collection, or (None, None) when empty."""
+    first = collection.find_one({"date": {"$type": "date"}}, projection={"date": 1}, sort=[("date", 1)])
+    last = collection.find_one({"date": {"$type": "date"}}, projection={"date": 1}, sort=[("date", -1)])
+    return (first["date"], last["date"]) if first and last else (None, None)
+
+
+def windows(start, end, days):
+    """Half-open [lo, hi) windows of `days` days covering start..end (datetimes)."""
+    lo = datetime(start.year, start.month, start.day)
+    while lo <= end:
+        hi = lo + timedelta(days=days)
+        yield lo, hi
+        lo = hi
+
+
+class Backup:
+    """Append-only gzip NDJSON sink for removed documents."""
+
+    def __init__(self, path):
+        self.path = path
+        self.count = 0
+        self._fh = gzip.open(path, "at", encoding="utf-8")
+
+    def write(self, docs):
+        for doc in docs:
+            self._fh.write(json_util.dumps(doc, json_options=json_util.CANONICAL_JSON_OPTIONS))
+            self._fh.write("\n")
+            self.count += 1
+        # each window is on disk before its deletes run
+        self._fh.flush()
+
+    def close(self):
+        self._fh.close()
+
+
+def dedupe_window(collection, lo, hi, by="source", backup=None, dry_run=False):
+    """Remove duplicates with lo <= date < hi. Returns (removed_ids, days touched)."""
+    docs = list(collection.find({"date": {"$gte": lo, "$lt": hi}}, projection=list(RANK_FIELDS)))
+    drop = losers(docs, by)
+    if not drop:
+        return [], []
+    dropped = set(drop)
+    days = sorted({to_utc_date(d["date"]) for d in docs if d["_id"] in dropped})
+    if dry_run:
+        return drop, days
+    if backup is not None:
+        backup.write(collection.find({"_id": {"$in": drop}}))
+    collection.delete_many({"_id": {"$in": drop}})
+    return drop, days
@@ -0,0 +1,127 @@
+# backend/api/derive.py
+"""
+Write-time derivation of the Kp-dependent fields.
+
+Every write path stores, next to kp_index:
+
+  ap_index  per-slot ap from the thirds-aware NOAA table (index round(Kp * 3));
+  ap_daily  daily Ap, the rounded mean of the per-slot ap values;
+  kp_max    greatest 3-hour Kp of the day;
+  g_scale   NOAA geomagnetic storm level of kp_max (0 = none, 1..5 = G1..G5).
+
+derive_rows() works on a whole batch at once (one NaN-padded 2-D array), so
+bulk writers pay a few NumPy operations per batch rather than Python loops
+per value. Readers (API, viewset, formatter, frontend) use the stored values
+and only fall back to computing them for documents written before this
+existed; `manage.py derive_forecast_fields` backfills those.
+
+Kept free of Django imports so standalone ml_model scripts can use it.
+"""
+
+import numpy as np
+
+from . import kp_codec
+
+# ap for Kp 0, 0+, 1-, 1, 1+, ... 9-, 9 (index = round(Kp * 3), 0..27)
+AP_TABLE = np.array([0, 2, 3, 4, 5, 6, 7, 9, 12, 15, 18, 22, 27, 32,
+                     39, 48, 56, 67, 80, 94, 111, 132, 154, 179, 207, 236, 300, 400])
+# Kp 5-, 6-, 7-, 8-, 9- -> G1..G5, as thirds indexes (round(Kp * 3)) and as 2-decimal Kp
+G_THIRDS = np.array([14, 17, 20, 23, 26])
+G_THRESHOLDS = np.round(G_THIRDS / 3.0, 2)
+DERIVED_FIELDS = ("ap_index", "ap_daily", "kp_max", "g_scale")
+SLOTS = 8
+
+
+def _matrix(kp_rows):
+    """List of kp lists (None / junk allowed) -> NaN-padded float array (n, width)."""
+    try:
+        # fast path: uniform numeric rows (the common case)
+        out = np.array(kp_rows, dtype=float)
+        if out.ndim == 2:
+            return out
+    except (TypeError, ValueError):
+        pass
+    rows = []
+    for kp in kp_rows:
+        if not isinstance(kp, (list, tuple)):
+            kp = [] if kp is None else [kp]
+        vals = []
+        for v in kp:
+            try:
+                vals.append(float(v))
+            except (TypeError, ValueError):
+                vals.append(np.nan)
+        rows.append(vals)
+    width = max([SLOTS] + [len(r) for r in rows])
+    out = np.full((len(rows), width), np.nan)
+    for i, r in enumerate(rows):
+        out[i, :len(r)] = r
+    return out
+
+
+def ap_of(kp):
+    """Thirds-aware ap for an array of Kp values (NaN stays NaN)."""
+    kp = np.asarray(kp, dtype=float)
+    idx = np.clip(np.rint(np.nan_to_num(kp) * 3), 0, len(AP_TABLE) - 1).astype(int)
+    return np.where(np.isnan(kp), np.nan, AP_TABLE[idx])
+
+
+def g_scale_of(kp):
+    """G level (0..5) for Kp values, classified on the thirds index (4.67 and 4.667 are both 5-, G1)."""
+    kp = np.asarray(kp, dtype=float)
+    return np.searchsorted(G_THIRDS, np.rint(np.nan_to_num(kp) * 3), side="right")
+
+
+def kp_to_ap(kp):
+    """Scalar convenience wrapper around ap_of(); 0 for unusable input."""
+    try:
+        ap = ap_of([float(kp)])[0]
+    except (TypeError, ValueError):
+        return 0
+    return 0 if np.isnan(ap) else int(ap)
+
+
+def _empty_fields():
+    return {"ap_index": [], "ap_daily": None, "kp_max": None, "g_scale": None}
+
+
+def derive_rows(kp_rows):
+    """Derived fields for each kp list in `kp_rows` (list of dicts, one per row, same order)."""
+    kp = _matrix(kp_rows)
+    if not kp.size:
+        # no rows, or only empty rows ([[]] gives a zero-width matrix)
+        return [_empty_fields() for _ in range(len(kp))]
+    ap = ap_of(kp)
+    has = ~np.isnan(kp)
+    any_value = has.any(axis=1)
+    counts = np.maximum(has.sum(axis=1), 1)
+    ap_daily = np.rint(np.where(has, ap, 0).sum(axis=1) / counts)
+    kp_max = np.where(has, kp, -np.inf).max(axis=1)
+    g = g_scale_of(np.where(any_value, kp_max, 0))
+
+    # one conversion to Python lists per batch; -1 marks a missing slot
+    ap_rows = np.where(has, ap, -1).astype(int).tolist()
+    lengths = (kp.shape[1] - np.argmax(has[:, ::-1], axis=1)).tolist()
+    full = has.all(axis=1).tolist()
+    ap_daily, kp_max, g = ap_daily.astype(int).tolist(), np.round(kp_max, 2).tolist(), g.tolist()
+
+    out = []
+    for i, row in enumerate(ap_rows):
+        if not lengths[i] or not any_value[i]:
+            out.append(_empty_fields())
+            continue
+        out.append({
+            "ap_index": row if full[i] else [None if a < 0 else a for a in row[:lengths[i]]],
+            "ap_daily": ap_daily[i],
+            "kp_max": kp_max[i],
+            "g_scale": g[i],
+        })
+    return out
+
+
+def apply(docs):
+    """Set the derived fields on each document in place (packed kp supported); returns docs."""
+    docs = list(docs)
+    for doc, fields in zip(docs, derive_rows([kp_codec.kp_list(d) for d in docs])):
+        doc.update(fields)
+    return docs
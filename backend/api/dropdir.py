@@ -0,0 +1,288 @@
+# backend/api/dropdir.py
+"""
+Watched drop-directory ingest.
+
+A Watcher polls one directory for forecast payload files (*.json, *.ndjson,
+*.jsonl: noaa_recent.json, ml_forecast.json, forecast_3day.json, ...) and
+feeds each new or changed file to the shared ingest engine
+(api.ingest.ingest_file: streaming parse, batch validation, bulk upserts) on
+a bounded thread pool.
+
+Per-file checkpoints live in `ingest_files`, keyed by the file name:
+size, mtime, sha256, status and the engine counts. A file is picked up only
+once its size and mtime have been stable for one poll (so half-written files
+are left alone) and they differ from the checkpoint; its hash is then
+compared with the checkpointed one, and identical content is recorded as a
+duplicate instead of being ingested again. Processed files are moved to the
+archive directory with os.replace (atomic on one filesystem; across
+filesystems the file is copied next to its destination first and then
+renamed into place). Without an archive directory files stay where they are
+and the size/mtime checkpoint keeps them from being re-read.
+
+A failed file (unreadable, database down, archive move refused) is retried
+with exponential backoff: the checkpoint counts the attempts on the same
+size/mtime and holds `retry_after` (epoch seconds, RETRY_BASE doubling per
+attempt up to RETRY_MAX). After max_attempts it is left failed until the
+file changes.
+
+Every poll the watcher stores its metrics (files / records per minute over
+a sliding window, arrival-to-done lag, backlog age) in `ingest_watchers`;
+GET /api/ingest/metrics serves them.
+"""
+
+import errno
+import hashlib
+import logging
+import os
+import shutil
+import socket
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone as dt_timezone
+
+from . import ingest
+
+logger = logging.getLogger(__name__)
+
+FILES_COLLECTION = "ingest_files"
+WATCHERS_COLLECTION = "ingest_watchers"
+SUFFIXES = (".json", ".ndjson", ".jsonl")
+HASH_CHUNK = 1024 * 1024
+METRICS_WINDOW = 300  # seconds
+MAX_ATTEMPTS = 5
+RETRY_BASE = 30.0  # seconds before the first retry
+RETRY_MAX = 3600.0
+
+
+def _now():
+    return datetime.now(dt_timezone.utc)
+
+
+def file_hash(path):
+    h = hashlib.sha256()
+    with open(path, "rb") as fh:
+        for chunk in iter(lambda: fh.read(HASH_CHUNK), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def archive(path, archive_dir, digest):
+    """Move `path` into archive_dir/YYYY-MM-DD/<stem>.<hash><ext> atomically; returns the destination."""
+    day_dir = os.path.join(archive_dir, _now().strftime("%Y-%m-%d"))
+    os.makedirs(day_dir, exist_ok=True)
+    stem, ext = os.path.splitext(os.path.basename(path))
+    dest = os.path.join(day_dir, f"{stem}.{digest[:12]}{ext}")
+    try:
+        os.replace(path, dest)
+    except OSError as e:
+        if e.errno != errno.EXDEV:
+            raise
+        # different filesystem: copy beside the destination, then rename into place
+        tmp = f"{dest}.part"
+        shutil.copyfile(path, tmp)
+        os.replace(tmp, dest)
+        os.remove(path)
+    return dest
+
+
+class Metrics:
+    """Thread-safe throughput / lag counters for one watcher."""
+
+    def __init__(self, window=METRICS_WINDOW):
+        self.window = window
+        self._lock = threading.Lock()
+        self._recent = deque()  # (finished monotonic time, records)
+        self.totals = {"files": 0, "records": 0, "duplicates": 0, "failed": 0}
+        self.last_lag = None
+        self.max_lag = 0.0
+        self.backlog = 0
+        self.backlog_age = 0.0
+
+    def record(self, records, lag, status):
+        with self._lock:
+            key = {"done": "files", "duplicate": "duplicates"}.get(status, "failed")
+            self.totals[key] += 1
+            self.totals["records"] += records
+            self._recent.append((time.monotonic(), records))
+            if lag is not None:
+                self.last_lag = lag
+                self.max_lag = max(self.max_lag, lag)
+
+    def pending(self, count, oldest_age):
+        with self._lock:
+            self.backlog, self.backlog_age = count, oldest_age
+
+    def snapshot(self):
+        with self._lock:
+            cutoff = time.monotonic() - self.window
+            while self._recent and self._recent[0][0] < cutoff:
+                self._recent.popleft()
+            minutes = self.window / 60
+            return {
+                "totals": dict(self.totals),
+                "files_per_min": round(len(self._recent) / minutes, 2),
+                "records_per_sec": round(sum(r for _, r in self._recent) / self.window, 2),
+                "last_lag_seconds": None if self.last_lag is None else round(self.last_lag, 2),
+                "max_lag_seconds": round(self.max_lag, 2),
+                "backlog_files": self.backlog,
+                "backlog_age_seconds": round(self.backlog_age, 2),
+                "window_seconds": self.window,
+            }
+
+
+class Watcher:
+    def __init__(self, collection, drop_dir, archive_dir=None, workers=2, interval=5.0, batch_size=None,
+                 max_attempts=MAX_ATTEMPTS, retry_base=RETRY_BASE):
+        self.collection = collection
+        self.drop_dir = drop_dir
+        self.archive_dir = archive_dir
+        self.workers = max(1, workers)
+        self.interval = interval
+        self.batch_size = batch_size
+        self.max_attempts = max(1, max_attempts)
+        self.retry_base = retry_base
+        self.files = collection.database[FILES_COLLECTION]
+        self.watchers = collection.database[WATCHERS_COLLECTION]
+        self.id = f"{socket.gethostname()}:{os.getpid()}"
+        self.metrics = Metrics()
+        self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="dropdir")
+        self._inflight = {}  # name -> future
+        self._last_seen = {}  # name -> (size, mtime) from the previous poll
+
+    # -- scanning -------------------------------------------------------
+
+    def _listing(self):
+        out = {}
+        with os.scandir(self.drop_dir) as entries:
+            for entry in entries:
+                if not entry.is_file() or not entry.name.lower().endswith(SUFFIXES):
+                    continue
+                st = entry.stat()
+                out[entry.name] = (st.st_size, st.st_mtime)
+        return out
+
+    def _due(self, checkpoint, stat, now):
+        """New or changed since its checkpoint, or failed with attempts left and its backoff over."""
+        if checkpoint is None or (checkpoint.get("size"), checkpoint.get("mtime")) != stat:
+            return True
+        return (checkpoint.get("status") == "failed" and checkpoint.get("attempts", 1) < self.max_attempts
+                and checkpoint.get("retry_after", 0) <= now)
+
+    def scan(self):
+        """Names ready to process: stable since the last poll and new, changed or due for a retry."""
+        listing = self._listing()
+        stable = {name: stat for name, stat in listing.items()
+                  if self._last_seen.get(name) == stat and name not in self._inflight}
+        self._last_seen = listing
+        if not stable:
+            self.metrics.pending(0, 0.0)
+            return []
+        projection = {"size": 1, "mtime": 1, "status": 1, "attempts": 1, "retry_after": 1}
+        checkpoints = {c["_id"]: c for c in self.files.find({"_id": {"$in": list(stable)}}, projection=projection)}
+        now = time.time()
+        ready = sorted((name for name, stat in stable.items() if self._due(checkpoints.get(name), stat, now)),
+                       key=lambda n: stable[n][1])
+        self.metrics.pending(len(ready), now - stable[ready[0]][1] if ready else 0.0)
+        return [(name, *stable[name]) for name in ready]
+
+    # -- processing -----------------------------------------------------
+
+    def process(self, name, size, mtime):
+        """Hash, ingest (unless duplicate), checkpoint and archive one file. Returns the checkpoint."""
+        path = os.path.join(self.drop_dir, name)
+        entry = {"size": size, "mtime": mtime, "watcher": self.id}
+        records = 0
+        stored = None
+        try:
+            stored = self.files.find_one({"_id": name},
+                                         projection={"sha256": 1, "status": 1, "size": 1, "mtime": 1, "attempts": 1})
+            digest = file_hash(path)
+            entry["sha256"] = digest
+            if stored and stored.get("sha256") == digest and stored.get("status") in ("done", "duplicate"):
+                entry["status"] = "duplicate"
+            else:
+                counts, errors = ingest.ingest_file(self.collection, path, batch_size=self.batch_size)
+                records = counts["processed"]
+                entry.update(status="done", counts=counts, errors=errors[:20])
+            if self.archive_dir:
+                entry["archived_to"] = archive(path, self.archive_dir, digest)
+        except Exception as exc:
+            logger.exception("Drop-dir ingest of %s failed", name)
+            retried = (stored and stored.get("status") == "failed"
+                       and (stored.get("size"), stored.get("mtime")) == (size, mtime))
+            attempts = (stored.get("attempts", 1) if retried else 0) + 1
+            delay = min(self.retry_base * 2 ** (attempts - 1), RETRY_MAX)
+            entry.update(status="failed", error=str(exc), attempts=attempts, retry_after=time.time() + delay)
+            if attempts >= self.max_attempts:
+                logger.warning("Drop-dir %s: giving up after %d attempt(s) until the file changes", name, attempts)
+        entry["processed_at"] = _now()
+        update = {"$set": entry}
+        if entry["status"] != "failed":
+            update["$unset"] = {"error": "", "attempts": "", "retry_after": ""}
+        self.files.update_one({"_id": name}, update, upsert=True)
+        lag = time.time() - mtime
+        self.metrics.record(records, lag, entry["status"])
+        logger.info("Drop-dir %s: %s (%d record(s), lag %.1fs)", name, entry["status"], records, lag)
+        return entry
+
+    def _reap(self):
+        for name, future in list(self._inflight.items()):
+            if future.done():
+                del self._inflight[name]
+
+    def poll(self):
+        """One poll: reap finished work, then submit ready files while workers are free."""
+        self._reap()
+        for name, size, mtime in self.scan():
+            if len(self._inflight) >= self.workers:
+                break
+            self._inflight[name] = self._pool.submit(self.process, name, size, mtime)
+        self.publish_metrics()
+
+    def publish_metrics(self):
+        doc = dict(self.metrics.snapshot(), drop_dir=self.drop_dir, archive_dir=self.archive_dir,
+                   workers=self.workers, in_flight=len(self._inflight), heartbeat=_now(), interval=self.interval)
+        try:
+            self.watchers.replace_one({"_id": self.id}, doc, upsert=True)
+        except Exception:
+            logger.exception("Could not store drop-dir watcher metrics")
+
+    def drain(self, settle=1.0):
+        """Process everything currently in the directory, then return (used by --once)."""
+        self._last_seen = self._listing()
+        time.sleep(settle)
+        while True:
+            self.poll()
+            if not self._inflight:
+                break
+            for future in list(self._inflight.values()):
+                future.result()
+
+    def run(self, stop=None):
+        stop = stop or threading.Event()
+        logger.info("Watching %s (%d worker(s), every %.1fs)", self.drop_dir, self.workers, self.interval)
+        try:
+            while not stop.is_set():
+                self.poll()
+                stop.wait(self.interval)
+        finally:
+            self._pool.shutdown(wait=True)
+            self._reap()
+            self.publish_metrics()
+
+
+def read_metrics(db):
+    """Stored metrics of every watcher, with `stale` set when the heartbeat is older than three polls."""
+    now = _now()
+    out = []
+    for doc in db[WATCHERS_COLLECTION].find():
+        beat = doc.get("heartbeat")
+        if isinstance(beat, datetime) and beat.tzinfo is None:
+            beat = beat.replace(tzinfo=dt_timezone.utc)
+        age = (now - beat).total_seconds() if isinstance(beat, datetime) else None
+        doc["watcher"] = doc.pop("_id")
+        doc["stale"] = age is None or age > 3 * max(float(doc.get("interval") or 0), 1.0)
+        out.append(doc)
+    return out
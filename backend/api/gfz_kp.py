@@ -0,0 +1,208 @@
+# backend/api/gfz_kp.py
+"""
+Backfill of observed Kp from the GFZ Potsdam Kp/ap archive text files.
+
+Two layouts of the archive are understood, both fixed-column text with "#"
+comment headers:
+
+  daily     Kp_ap_Ap_SN_F107_since_1932.txt, one line per day:
+            YYYY MM DD days days_m Bsr dB Kp1..Kp8 ap1..ap8 Ap SN F10.7obs F10.7adj D
+  3-hourly  Kp_ap_since_1932.txt, one line per 3-hour interval:
+            YYYY MM DD hh.h hh._m days days_m Kp ap D
+
+parse() reads a whole file in one pass: the data lines are split into one
+token array and reshaped to (rows, columns), so every column is a NumPy
+vector and the 3-hourly layout is folded into (days, 8) with one scatter.
+Missing values (-1 in the archive) become NaN. D flags preliminary rows.
+
+backfill() writes one document per day with source "gfz" (kp_index, a_index
+= Ap, radio_flux = observed F10.7), validated per batch (api.validation),
+content-hash skipped (api.content_hash) and upserted in bulk on
+(date, source). It is incremental: the high-water mark is the first
+preliminary GFZ day stored, or the day after the last definitive one, so a
+re-run only appends new days and replaces days that have since become
+definitive.
+
+Kept free of Django imports so standalone scripts can use it.
+"""
+
+import gzip
+import logging
+import warnings
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from . import content_hash, derive, kp_series, publish, rollups, validation
+from .schema import SOURCE_GFZ, canonicalize_doc
+from .utils_spaceweather import to_utc_date
+
+logger = logging.getLogger(__name__)
+
+SLOTS = 8
+DAILY_COLUMNS = 28
+HOURLY_COLUMNS = 10
+DEFINITIVE = "GFZ definitive Kp/ap archive"
+PRELIMINARY = "GFZ preliminary Kp/ap (nowcast)"
+
+
+def _open(path):
+    return gzip.open(path, "rt", encoding="ascii") if str(path).endswith(".gz") else open(path, "r", encoding="ascii")
+
+
+def _table(fh):
+    """Data lines -> float array (rows, columns); comment and blank lines are skipped."""
+    lines = [line for line in fh if line.strip() and not line.startswith("#")]
+    if not lines:
+        return np.empty((0, 0))
+    width = len(lines[0].split())
+    values = np.array("".join(lines).split(), dtype=float)
+    if values.size % width:
+        raise ValueError(f"ragged archive: {values.size} values are not a multiple of {width} columns")
+    return values.reshape(-1, width)
+
+
+def _days(table):
+    years = (table[:, 0].astype(int) - 1970).astype("datetime64[Y]")
+    months = years.astype("datetime64[M]") + (table[:, 1].astype(int) - 1).astype("timedelta64[M]")
+    return months.astype("datetime64[D]") + (table[:, 2].astype(int) - 1).astype("timedelta64[D]")
+
+
+def _missing(values):
+    return np.where(values < 0, np.nan, values)
+
+
+def parse(fh):
+    """
+    Parse one archive file (either layout). Returns a dict of aligned arrays,
+    one row per day in date order: day (datetime64[D]), kp (n, 8), ap_daily,
+    f107 (NaN where the layout has none) and preliminary (bool).
+    """
+    table = _table(fh)
+    if not table.size:
+        return {"day": np.array([], dtype="datetime64[D]"), "kp": np.empty((0, SLOTS)),
+                "ap_daily": np.empty(0), "f107": np.empty(0), "preliminary": np.empty(0, dtype=bool)}
+    days = _days(table)
+    if table.shape[1] == DAILY_COLUMNS:
+        order = np.argsort(days, kind="stable")
+        table, days = table[order], days[order]
+        return {
+            "day": days,
+            "kp": _missing(table[:, 7:15]),
+            "ap_daily": _missing(table[:, 23]),
+            "f107": _missing(table[:, 25]),
+            "preliminary": table[:, 27] != 0,
+        }
+    if table.shape[1] == HOURLY_COLUMNS:
+        unique, row = np.unique(days, return_inverse=True)
+        slot = np.clip((table[:, 3] // 3).astype(int), 0, SLOTS - 1)
+        kp = np.full((len(unique), SLOTS), np.nan)
+        ap = np.full((len(unique), SLOTS), np.nan)
+        kp[row, slot] = _missing(table[:, 7])
+        ap[row, slot] = _missing(table[:, 8])
+        preliminary = np.zeros(len(unique), dtype=bool)
+        np.logical_or.at(preliminary, row, table[:, 9] != 0)
+        with warnings.catch_warnings():
+            # days without any ap value: "mean of empty slice"
+            warnings.simplefilter("ignore", RuntimeWarning)
+            ap_daily = np.nanmean(ap, axis=1)
+        return {"day": unique, "kp": kp, "ap_daily": ap_daily, "f107": np.full(len(unique), np.nan),
+                "preliminary": preliminary}
+    raise ValueError(f"unrecognized archive layout ({table.shape[1]} columns)")
+
+
+def parse_file(path):
+    with _open(path) as fh:
+        return parse(fh)
+
+
+def merge(parsed):
+    """Combine several parse() results; for a day present more than once the later file wins."""
+    parsed = [p for p in parsed if len(p["day"])]
+    if not parsed:
+        return parse(iter(()))
+    merged = {k: np.concatenate([p[k] for p in parsed]) for k in parsed[0]}
+    # keep the last occurrence of each day
+    reverse = merged["day"][::-1]
+    _, first = np.unique(reverse, return_index=True)
+    keep = len(reverse) - 1 - first
+    return {k: v[keep] for k, v in merged.items()}
+
+
+def high_water_mark(collection):
+    """First day to (re)load: the earliest preliminary GFZ day, else the day after the last one; None if empty."""
+    prelim = collection.find_one({"source": SOURCE_GFZ, "rationale_geomagnetic": PRELIMINARY},
+                                 projection={"date": 1}, sort=[("date", 1)])
+    if prelim:
+        return to_utc_date(prelim["date"])
+    last = collection.find_one({"source": SOURCE_GFZ}, projection={"date": 1}, sort=[("date", -1)])
+    return to_utc_date(last["date"]) + timedelta(days=1) if last else None
+
+
+def to_docs(rows, start=None):
+    """Model-shaped documents for the parsed days on or after `start` (a date)."""
+    keep = rows["day"] >= np.datetime64(start, "D") if start else np.ones(len(rows["day"]), dtype=bool)
+    # snap to the thirds grid the rest of the code uses (5- = 4.67, not the archive's 4.667)
+    kp = np.round(np.rint(rows["kp"][keep] * 3) / 3, 2)
+    kp_rows = np.where(np.isnan(kp), None, kp).tolist()
+    ap = rows["ap_daily"][keep]
+    ap_daily = np.where(np.isnan(ap), None, np.rint(ap)).tolist()
+    flux = rows["f107"][keep]
+    f107 = np.where(np.isnan(flux), None, np.round(flux, 1)).tolist()
+    days = rows["day"][keep].astype("datetime64[s]").astype(datetime).tolist()
+    preliminary = rows["preliminary"][keep].tolist()
+    now = datetime.utcnow()
+    return [
+        {
+            "date": day,
+            "source": SOURCE_GFZ,
+            "kp_index": kp_rows[i],
+            "a_index": None if ap_daily[i] is None else int(ap_daily[i]),
+            "radio_flux": f107[i],
+            "solar_radiation": [],
+            "radio_blackout": {},
+            "rationale_geomagnetic": PRELIMINARY if preliminary[i] else DEFINITIVE,
+            "rationale_radiation": "",
+            "rationale_blackout": "",
+            "created_at": now,
+        }
+        for i, day in enumerate(days)
+    ]
+
+
+def write_batch(collection, docs):
+    """Validate, derive, hash-skip and upsert one batch. Returns counts."""
+    counts = {"written": 0, "unchanged": 0, "invalid": 0}
+    masks = validation.validate_batch(docs)
+    docs = [canonicalize_doc(doc, derived=False) for doc, bad in zip(docs, masks["invalid"].tolist()) if not bad]
+    counts["invalid"] = int(masks["invalid"].sum())
+    derive.apply(docs)
+    changed, counts["unchanged"] = content_hash.split_unchanged(collection, docs)
+    if changed:
+        collection.bulk_write([publish.upsert_op(doc) for doc in changed], ordered=False)
+        touched = [doc["date"] for doc in changed]
+        rollups.refresh_days(collection, touched)
+        kp_series.sync_days(collection, touched)
+    counts["written"] = len(changed)
+    return counts
+
+
+def backfill(collection, paths, batch_size=2000, start=None, dry_run=False, progress=None):
+    """
+    Load the archive files into `collection` from `start` (default: the
+    high-water mark). progress(counts) is called after every batch. Returns
+    (counts, start).
+    """
+    rows = merge([parse_file(p) for p in paths])
+    if start is None:
+        start = high_water_mark(collection)
+    docs = to_docs(rows, start)
+    counts = {"parsed": len(rows["day"]), "pending": len(docs), "written": 0, "unchanged": 0, "invalid": 0}
+    if dry_run:
+        return counts, start
+    for i in range(0, len(docs), batch_size):
+        for key, n in write_batch(collection, docs[i:i + batch_size]).items():
+            counts[key] += n
+        if progress:
+            progress(dict(counts))
+    return counts, start
@@ -0,0 +1,128 @@
+# backend/api/indexes.py
+"""
+Declared MongoDB indexes for every hot query, plus a reconciler.
+
+DECLARED maps collection name -> IndexSpec list; each spec records the query
+it serves. plan(db) diffs the declarations against index_information() and
+returns the actions needed; apply(db, actions) runs them. Indexes are matched
+by key pattern, so an existing index with another name is kept as-is, and a
+second plan() after apply() is empty.
+
+Kept free of Django imports so standalone scripts can use it.
+"""
+
+import os
+from collections import namedtuple
+
+from . import kp_series, retention, rollups
+
+FORECAST_COLLECTION = os.environ.get("MONGO_COLLECTION", "forecast_forecast3day")
+NOAA_COLLECTION = os.environ.get("NOAA_COLLECTION", "noaa_baseline")
+
+# options compared when reconciling; server-side extras (v, ns, background) are ignored
+COMPARED_OPTIONS = ("unique", "sparse", "expireAfterSeconds", "partialFilterExpression")
+
+IndexSpec = namedtuple("IndexSpec", "keys options serves")
+Action = namedtuple("Action", "op collection name spec")  # op: create | rebuild | drop | extra
+
+
+def _index(keys, serves, **options):
+    return IndexSpec(tuple(keys), options, serves)
+
+
+def index_name(keys):
+    return "_".join(f"{field}_{direction}" for field, direction in keys)
+
+
+DECLARED = {
+    FORECAST_COLLECTION: [
+        _index([("date", 1), ("source", 1)], "date $in / range lookups, latest-date sort; "
+               "unique publish key for the (date, source) upserts (api.publish)", unique=True),
+        _index([("source", 1), ("date", -1)], "latest document per source (NOAA baseline start)"),
+    ],
+    NOAA_COLLECTION: [
+        _index([("source", 1)], "get_noaa_baseline find_one by source"),
+    ],
+    "model_runs": [
+        _index([("trained_at", -1)], "latest model run (publish quality gate)"),
+    ],
+    "prediction_publishes": [
+        _index([("published_at", 1)], "publish history; TTL expiry (RETENTION_PUBLISH_TTL_DAYS)",
+               **({"expireAfterSeconds": retention.PUBLISH_TTL_DAYS * 86400} if retention.PUBLISH_TTL_DAYS else {})),
+    ],
+    f"{FORECAST_COLLECTION}_archive": [
+        _index([("start", 1), ("end", 1)], "retention.read_days / read_range chunk overlap"),
+    ],
+    rollups.DAILY_COLLECTION: [
+        _index([("month", 1)], "monthly rollup recompute"),
+    ],
+    rollups.MONTHLY_COLLECTION: [
+        _index([("year", 1)], "yearly rollup recompute"),
+    ],
+    kp_series.BUCKETS_COLLECTION: [
+        _index([("kind", 1), ("start", 1)], "kp_series.range_read month range"),
+    ],
+}
+
+
+def _key(raw):
+    # older servers report directions as floats (1.0)
+    return tuple((field, int(d) if isinstance(d, float) else d) for field, d in raw)
+
+
+def _options(info):
+    return {k: info[k] for k in COMPARED_OPTIONS if k in info and info[k] not in (False, None)}
+
+
+def has_index(collection, keys, **options):
+    """True when `collection` has an index on `keys` (any name) with the given options (e.g. unique=True)."""
+    for info in collection.index_information().values():
+        if _key(info["key"]) == tuple(keys) and all(info.get(k) == v for k, v in options.items()):
+            return True
+    return False
+
+
+def plan(db, declared=None, drop_extra=False):
+    """Actions needed to bring `db` in line with the declarations."""
+    declared = DECLARED if declared is None else declared
+    actions = []
+    for coll, specs in declared.items():
+        existing = db[coll].index_information()
+        by_key = {_key(info["key"]): (name, info) for name, info in existing.items()}
+        matched = {"_id_"}
+        for spec in specs:
+            found = by_key.get(spec.keys)
+            if found is None:
+                actions.append(Action("create", coll, index_name(spec.keys), spec))
+                continue
+            name, info = found
+            matched.add(name)
+            if _options(info) != _options(spec.options):
+                actions.append(Action("rebuild", coll, name, spec))
+        for name in existing:
+            if name not in matched:
+                actions.append(Action("drop" if drop_extra else "extra", coll, name, None))
+    return actions
+
+
+def apply(db, actions):
+    """
+    Run the create / rebuild / drop actions from plan(); 'extra' entries are report-only.
+    A unique index over duplicated keys fails with DuplicateKeyError; remove the
+    duplicates first and re-run.
+    """
+    for action in actions:
+        col = db[action.collection]
+        if action.op in ("rebuild", "drop"):
+            col.drop_index(action.name)
+        if action.op in ("create", "rebuild"):
+            col.create_index(list(action.spec.keys), name=index_name(action.spec.keys), **action.spec.options)
+
+
+def describe(action):
+    if action.spec is None:
+        what = "not declared" + ("" if action.op == "drop" else " (kept; --drop-extra removes it)")
+    else:
+        opts = "".join(f" {k}={v}" for k, v in sorted(action.spec.options.items()))
+        what = f"{list(action.spec.keys)}{opts} - {action.spec.serves}"
+    return f"{action.op:<8}{action.collection}.{action.name}: {what}"
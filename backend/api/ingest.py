@@ -0,0 +1,442 @@
+# backend/api/ingest.py
+"""
+Streaming ingest for forecast payload files (JSON list / wrapper object / NDJSON).
+
+ingest_items() is the one ingest engine: records are normalized and validated
+one batch at a time (api.validation checks the whole batch with column
+operations instead of a model full_clean() per record) and written with
+unordered bulk upserts. ingest_file() /
+ingest_records() feed it from a file or a list and back the CLI entry points
+(save_ml_forecast_json, load_ml_forecast, forecast.utils.save_forecast_data).
+
+The upload endpoint in api.views spools the file to disk and runs the same
+engine on a bounded background worker pool. Job progress is kept in the
+`ingest_jobs` collection so any gunicorn worker can answer a status request.
+"""
+
+import json
+import logging
+import os
+import re
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, date, timezone as dt_timezone
+
+from django.conf import settings
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+
+from . import content_hash, derive, kp_codec, kp_series, publish, rollups, validation
+from .schema import canonicalize_doc
+
+logger = logging.getLogger(__name__)
+
+JOBS_COLLECTION = "ingest_jobs"
+READ_CHUNK = 64 * 1024
+# a single record larger than this is treated as malformed rather than buffered
+MAX_RECORD_CHARS = 4 * 1024 * 1024
+MAX_REPORTED_ERRORS = 200
+
+_decoder = json.JSONDecoder()
+_WRAPPER_RE = re.compile(r'\{\s*"predictions"\s*:\s*\[')
+
+
+# ---------------------------------------------------------------------
+# Streaming parser
+# ---------------------------------------------------------------------
+
+class _Reader:
+    """Small buffered reader that lets raw_decode work across chunk boundaries."""
+
+    def __init__(self, fh, chunk_size=READ_CHUNK):
+        self.fh = fh
+        self.chunk_size = chunk_size
+        self.buf = ""
+        self.pos = 0
+        self.eof = False
+
+    def fill(self):
+        if self.eof:
+            return False
+        chunk = self.fh.read(self.chunk_size)
+        if not chunk:
+            self.eof = True
+            return False
+        # drop consumed prefix so the buffer stays bounded by the record size
+        self.buf = self.buf[self.pos:] + chunk
+        self.pos = 0
+        return True
+
+    def skip(self, chars=" \t\r\n"):
+        while True:
+            while self.pos < len(self.buf) and self.buf[self.pos] in chars:
+                self.pos += 1
+            if self.pos < len(self.buf) or not self.fill():
+                return
+
+    def peek(self):
+        self.skip()
+        return self.buf[self.pos] if self.pos < len(self.buf) else ""
+
+    def decode(self):
+        """Decode one JSON value at the cursor, reading more input as needed."""
+        while True:
+            try:
+                value, end = _decoder.raw_decode(self.buf, self.pos)
+                # a number at the end of the buffer may be truncated
+                if end == len(self.buf) and not self.eof and not isinstance(value, (dict, list)):
+                    if self.fill():
+                        continue
+                self.pos = end
+                return value
+            except json.JSONDecodeError as e:
+                if not self._maybe_truncated(e) or len(self.buf) - self.pos > MAX_RECORD_CHARS:
+                    raise
+                if not self.fill():
+                    raise
+
+    def _maybe_truncated(self, err):
+        """Could more input fix this error? Not once a newline follows the error point."""
+        return self.buf.find("\n", err.pos) < 0
+
+    def starts_wrapper(self):
+        """True (and cursor moved inside the list) for a {"predictions": [ ... wrapper."""
+        while len(self.buf) - self.pos < 64 and self.fill():
+            pass
+        m = _WRAPPER_RE.match(self.buf, self.pos)
+        if not m:
+            return False
+        self.pos = m.end()
+        return True
+
+    def skip_line(self):
+        while True:
+            nl = self.buf.find("\n", self.pos)
+            if nl >= 0:
+                self.pos = nl + 1
+                return
+            self.pos = len(self.buf)
+            if not self.fill():
+                return
+
+
+def iter_records(fh):
+    """
+    Yield (index, record, error) tuples from a text stream without loading it whole.
+
+    Accepts a JSON array of objects, a single object, a {"predictions": [...]}
+    wrapper, or newline-delimited / concatenated JSON objects. A malformed
+    NDJSON line is reported as an error for that record and parsing resumes on
+    the next line; a malformed JSON array aborts the stream (nothing after the
+    broken element can be located reliably).
+    """
+    reader = _Reader(fh)
+    first = reader.peek()
+    index = 0
+
+    if first == "":
+        return
+
+    if first == "[" or (first == "{" and reader.starts_wrapper()):
+        if first == "[":
+            reader.pos += 1
+        while True:
+            reader.skip(" \t\r\n,")
+            ch = reader.peek()
+            if ch == "]" or ch == "":
+                return
+            value = reader.decode()
+            yield index, value, None if isinstance(value, dict) else "record is not an object"
+            index += 1
+
+    while True:
+        ch = reader.peek()
+        if ch == "":
+            return
+        try:
+            value = reader.decode()
+        except json.JSONDecodeError as e:
+            yield index, None, f"invalid JSON: {e.msg}"
+            index += 1
+            reader.skip_line()
+            continue
+
+        if index == 0 and isinstance(value, dict) and isinstance(value.get("predictions"), list):
+            for rec in value["predictions"]:
+                yield index, rec, None if isinstance(rec, dict) else "record is not an object"
+                index += 1
+            continue
+
+        yield index, value, None if isinstance(value, dict) else "record is not an object"
+        index += 1
+
+
+# ---------------------------------------------------------------------
+# Normalization / validation
+# ---------------------------------------------------------------------
+
+def to_date_obj(d):
+    """Normalize date inputs (str or date/datetime) -> datetime.date or None."""
+    if d is None:
+        return None
+    if isinstance(d, datetime):
+        return d.date()
+    if isinstance(d, date):
+        return d
+    s = str(d).strip()
+    if s.endswith("Z"):
+        s = s[:-1] + "+00:00"
+    try:
+        return datetime.fromisoformat(s).date()
+    except Exception:
+        try:
+            return date.fromisoformat(s.split("T")[0])
+        except Exception:
+            return None
+
+
+def normalize_record(rec: dict) -> dict:
+    """Map incoming JSON keys to the Forecast3Day field names."""
+    mapped = {}
+    mapped["date"] = to_date_obj(rec.get("date") or rec.get("start_date") or rec.get("day"))
+    mapped["kp_index"] = rec.get("kp_index") if rec.get("kp_index") is not None else rec.get("kp_list") or []
+    mapped["a_index"] = rec.get("a_index", rec.get("ap_index"))
+    mapped["radio_flux"] = rec.get("radio_flux", rec.get("f107", None))
+    mapped["solar_radiation"] = rec.get("solar_radiation") or rec.get("solar_radiation_percent") or []
+    mapped["radio_blackout"] = rec.get("radio_blackout") or {}
+    mapped["rationale_geomagnetic"] = rec.get("rationale_geomagnetic") or rec.get("source", "") or ""
+    mapped["rationale_radiation"] = rec.get("rationale_radiation") or ""
+    mapped["rationale_blackout"] = rec.get("rationale_blackout") or ""
+    return mapped
+
+
+def validate_record(mapped: dict):
+    """Forecast3Day validation rules (api.validation) for one record; returns an error string or None."""
+    return validate_batch([mapped])[0]
+
+
+def validate_batch(mapped_records):
+    """Validate a batch with column operations (api.validation); one error string or None per record."""
+    return validation.batch_messages(validation.validate_batch(mapped_records))
+
+
+def to_mongo_doc(mapped: dict) -> dict:
+    """Model-shaped dict -> Mongo document in canonical shape (see api.schema); derived fields are added per batch."""
+    return canonicalize_doc(mapped, derived=False)
+
+
+def bulk_upsert(collection, docs):
+    """Unordered bulk upsert keyed on (date, source). Returns (created, updated, errors)."""
+    if not docs:
+        return 0, 0, []
+    ops = [UpdateOne(publish.key_of(doc), kp_codec.update_for(doc), upsert=True) for doc in docs]
+    try:
+        res = collection.bulk_write(ops, ordered=False)
+        return res.upserted_count, res.matched_count, []
+    except BulkWriteError as e:
+        details = e.details or {}
+        errors = [
+            {"date": docs[w["index"]]["date"].date().isoformat(), "error": w.get("errmsg")}
+            for w in details.get("writeErrors", [])
+        ]
+        return details.get("nUpserted", 0), details.get("nMatched", 0), errors
+
+
+# ---------------------------------------------------------------------
+# Engine
+# ---------------------------------------------------------------------
+
+def _default_batch_size():
+    return max(1, int(getattr(settings, "INGEST_BATCH_SIZE", 500)))
+
+
+def ingest_items(collection, items, batch_size=None, progress=None):
+    """
+    Shared ingest engine: consume (index, record, error) tuples as produced by
+    iter_records(), normalize and validate each record, and write in batches
+    (derived fields, content-hash skip with one $in fetch per batch, unordered
+    bulk upserts keyed on (date, source), rollup / series refresh).
+
+    progress(counts, batch_errors) is called after every batch. Returns
+    (counts, errors) with at most MAX_REPORTED_ERRORS errors. A record that
+    cannot be normalized, validated or converted is rejected with its index
+    like any invalid one; it never fails the whole run (or upload job).
+    """
+    batch_size = batch_size or _default_batch_size()
+    counts = {"processed": 0, "created": 0, "updated": 0, "unchanged": 0, "invalid": 0}
+    reported = []
+
+    def flush(batch, errors):
+        if batch:
+            derive.apply(batch)
+            batch, unchanged = content_hash.split_unchanged(collection, batch)
+            counts["unchanged"] += unchanged
+        if batch:
+            created, updated, write_errors = bulk_upsert(collection, batch)
+            counts["created"] += created
+            counts["updated"] += updated
+            counts["invalid"] += len(write_errors)
+            errors.extend(write_errors)
+            touched = [doc["date"] for doc in batch]
+            rollups.refresh_days(collection, touched)
+            kp_series.sync_days(collection, touched)
+        reported.extend(errors[:MAX_REPORTED_ERRORS - len(reported)])
+        if progress:
+            progress(dict(counts), errors)
+
+    def reject(index, rec, error, errors):
+        counts["invalid"] += 1
+        day = rec.get("date", "") if isinstance(rec, dict) else ""
+        errors.append({"index": index, "date": str(day), "error": error})
+
+    def check_one(mapped):
+        try:
+            return validate_record(mapped)
+        except Exception as exc:
+            return f"invalid record: {exc}"
+
+    def validate_and_flush(pending, errors):
+        try:
+            messages = validate_batch([mapped for _, _, mapped in pending])
+        except Exception:
+            # a record shape the column checks trip over: re-check one by one so only that record is rejected
+            logger.exception("Batch validation failed; validating %d record(s) one by one", len(pending))
+            messages = [check_one(mapped) for _, _, mapped in pending]
+        batch = []
+        for (index, rec, mapped), error in zip(pending, messages):
+            if not error:
+                try:
+                    batch.append(to_mongo_doc(mapped))
+                    continue
+                except Exception as exc:
+                    error = f"invalid record: {exc}"
+            reject(index, rec, error, errors)
+        flush(batch, errors)
+
+    pending, errors = [], []
+    for index, rec, error in items:
+        counts["processed"] += 1
+        if error:
+            reject(index, rec, error, errors)
+            continue
+        try:
+            mapped = normalize_record(rec)
+        except Exception as exc:
+            reject(index, rec, f"invalid record: {exc}", errors)
+            continue
+        pending.append((index, rec, mapped))
+        if len(pending) >= batch_size:
+            validate_and_flush(pending, errors)
+            pending, errors = [], []
+    validate_and_flush(pending, errors)
+    return counts, reported
+
+
+def ingest_file(collection, path, batch_size=None, progress=None):
+    """Stream a JSON / NDJSON file through the engine without loading it whole."""
+    with open(path, "r", encoding="utf-8-sig") as fh:
+        return ingest_items(collection, iter_records(fh), batch_size=batch_size, progress=progress)
+
+
+def ingest_records(collection, records, batch_size=None, progress=None):
+    """Run an iterable of already-parsed record dicts through the engine."""
+    items = ((i, rec, None if isinstance(rec, dict) else "record is not an object")
+             for i, rec in enumerate(records))
+    return ingest_items(collection, items, batch_size=batch_size, progress=progress)
+
+
+# ---------------------------------------------------------------------
+# Background jobs
+# ---------------------------------------------------------------------
+
+_executor = None
+_executor_lock = threading.Lock()
+_slots = None
+
+
+def _pool():
+    global _executor, _slots
+    with _executor_lock:
+        if _executor is None:
+            workers = max(1, int(getattr(settings, "INGEST_WORKERS", 2)))
+            pending = max(workers, int(getattr(settings, "INGEST_MAX_PENDING_JOBS", 8)))
+            _executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="ingest")
+            _slots = threading.BoundedSemaphore(pending)
+    return _executor
+
+
+def _now():
+    return datetime.now(dt_timezone.utc)
+
+
+def get_job(collection, job_id):
+    return collection.database[JOBS_COLLECTION].find_one({"_id": job_id})
+
+
+def submit_file(collection, path, filename=""):
+    """
+    Queue an already-spooled upload for background ingest.
+
+    Returns the job id, or None when the pool is saturated (the caller should
+    answer 503 and the spooled file is removed).
+    """
+    pool = _pool()
+    if not _slots.acquire(blocking=False):
+        _remove(path)
+        return None
+
+    job_id = uuid.uuid4().hex
+    collection.database[JOBS_COLLECTION].insert_one({
+        "_id": job_id,
+        "status": "queued",
+        "filename": filename,
+        "created_at": _now(),
+        "processed": 0,
+        "created": 0,
+        "updated": 0,
+        "unchanged": 0,
+        "invalid": 0,
+        "errors": [],
+    })
+    try:
+        pool.submit(_run_job, collection, job_id, path)
+    except Exception:
+        _slots.release()
+        _remove(path)
+        raise
+    return job_id
+
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+def _run_job(collection, job_id, path):
+    jobs = collection.database[JOBS_COLLECTION]
+    counts = {}
+
+    def progress(totals, errors):
+        counts.update(totals)
+        update = {"$set": dict(totals)}
+        if errors:
+            update["$push"] = {"errors": {"$each": errors, "$slice": MAX_REPORTED_ERRORS}}
+        jobs.update_one({"_id": job_id}, update)
+
+    try:
+        jobs.update_one({"_id": job_id}, {"$set": {"status": "running", "started_at": _now()}})
+        ingest_file(collection, path, progress=progress)
+        jobs.update_one({"_id": job_id}, {"$set": {"status": "done", "finished_at": _now()}})
+        logger.info("Ingest job %s done: %s", job_id, counts)
+    except Exception as exc:
+        logger.exception("Ingest job %s failed", job_id)
+        jobs.update_one(
+            {"_id": job_id},
+            {"$set": dict(counts, status="failed", finished_at=_now(), failure=str(exc))},
+        )
+    finally:
+        _slots.release()
+        _remove(path)
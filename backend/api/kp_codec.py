@@ -0,0 +1,139 @@
+# backend/api/kp_codec.py
+"""
+Compact encoding for kp_index arrays.
+
+Kp is reported in thirds (0, 0.33, 0.67, 1, ... 9): 28 values. A packed
+document stores one uint8 per 3-hour slot in `kp_packed` (BSON binary):
+
+  0..27  the third k, decoding to round(k / 3, 2) (how NOAA and the seeders
+         write them: 3.33, 3.67, ...);
+  254    no value (None / NaN);
+  255    off-grid value, taken in order from the `kp_raw` float list.
+
+A packed day is ~10 bytes of payload instead of eight BSON doubles (~90
+bytes with the array keys). Model output, which is rarely on a third, stays
+as a plain kp_index list: encode() returns None when packing would not help.
+
+Decoding is a lookup-table gather over np.frombuffer; decode_many() handles
+a whole batch with a single concatenation and no per-element Python work.
+When a document has `kp_packed`, it takes precedence over `kp_index`.
+
+KP_PACKED=1 makes the write paths that go through api.schema pack new
+documents; the pack_kp_index command converts existing ones (and back).
+
+Kept free of Django imports so standalone ml_model scripts can use it.
+"""
+
+import os
+
+import numpy as np
+from bson import Binary
+
+THIRDS = np.round(np.arange(28) / 3.0, 2)
+NONE_CODE = 254
+RAW_CODE = 255
+
+_LUT = np.full(256, np.nan)
+_LUT[:28] = THIRDS
+_CODE_BY_VALUE = {float(v): k for k, v in enumerate(THIRDS)}
+
+
+def enabled():
+    return os.environ.get("KP_PACKED", "").strip().lower() in ("1", "true", "yes")
+
+
+def encode(values):
+    """kp list -> {"kp_packed": Binary, "kp_raw": [...]} or None if not worth packing."""
+    if not isinstance(values, (list, tuple)) or not values or len(values) > 255:
+        return None
+    codes = bytearray()
+    raw = []
+    for v in values:
+        if v is None:
+            codes.append(NONE_CODE)
+            continue
+        try:
+            f = float(v)
+        except (TypeError, ValueError):
+            return None
+        if f != f:
+            codes.append(NONE_CODE)
+        elif f in _CODE_BY_VALUE:
+            codes.append(_CODE_BY_VALUE[f])
+        else:
+            codes.append(RAW_CODE)
+            raw.append(f)
+    # mostly off-grid: the raw list would be as big as the original array
+    if len(raw) * 2 > len(values):
+        return None
+    return {"kp_packed": Binary(bytes(codes)), "kp_raw": raw}
+
+
+def decode(packed, raw=None):
+    """Packed bytes (+ raw list) -> float64 array; NaN where there was no value."""
+    codes = np.frombuffer(packed, dtype=np.uint8)
+    out = _LUT[codes]
+    if raw:
+        out[codes == RAW_CODE] = raw
+    return out
+
+
+def decode_many(docs):
+    """
+    Decode the packed kp of many documents at once. Returns a 2-D float64 array
+    (one row per document) when all have the same length, else a list of arrays.
+    """
+    blobs = [d["kp_packed"] for d in docs]
+    if not blobs:
+        return np.empty((0, 0))
+    codes = np.frombuffer(b"".join(blobs), dtype=np.uint8)
+    flat = _LUT[codes]
+    raw_mask = codes == RAW_CODE
+    if raw_mask.any():
+        flat[raw_mask] = [f for d in docs if d.get("kp_raw") for f in d["kp_raw"]]
+    lengths = np.fromiter((len(b) for b in blobs), dtype=np.int64, count=len(blobs))
+    if (lengths == lengths[0]).all():
+        return flat.reshape(len(blobs), int(lengths[0]))
+    return np.split(flat, np.cumsum(lengths)[:-1])
+
+
+def kp_list(doc):
+    """The document's kp values as a list (None for gaps), whichever layout it uses."""
+    packed = doc.get("kp_packed")
+    if packed is None:
+        return doc.get("kp_index")
+    return [None if v != v else float(v) for v in decode(packed, doc.get("kp_raw")).tolist()]
+
+
+def expand_doc(doc):
+    """Copy of `doc` with kp_index restored and the packed fields removed (no-op if unpacked)."""
+    if doc.get("kp_packed") is None:
+        return doc
+    out = {k: v for k, v in doc.items() if k not in ("kp_packed", "kp_raw")}
+    out["kp_index"] = kp_list(doc)
+    return out
+
+
+def update_for(doc):
+    """
+    Update document for $set-ing `doc` over an existing one, clearing whichever
+    kp layout `doc` does not use so a stale copy cannot shadow the new values.
+    """
+    update = {"$set": doc}
+    if "kp_packed" in doc:
+        update["$unset"] = {"kp_index": ""}
+    elif "kp_index" in doc:
+        update["$unset"] = {"kp_packed": "", "kp_raw": ""}
+    return update
+
+
+def pack_doc(doc):
+    """Copy of `doc` with kp_index replaced by the packed fields (unchanged if not packable)."""
+    if doc.get("kp_packed") is not None:
+        return doc
+    packed = encode(doc.get("kp_index"))
+    if packed is None:
+        return doc
+    out = {k: v for k, v in doc.items() if k != "kp_index"}
+    out.update(packed)
+    return out
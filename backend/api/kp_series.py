@@ -0,0 +1,287 @@
+# backend/api/kp_series.py
+"""
+Bucketed storage for the 3-hourly Kp series.
+
+One document per (kind, calendar month) in `kp_series_buckets`, holding a
+fixed 31 days x 8 slots float32 array (little-endian BSON binary, NaN = no
+value). Reading a range is one indexed query plus np.frombuffer per month, so
+callers get NumPy arrays without re-expanding day documents element by
+element. Fixed-size buckets work on any MongoDB version; native time-series
+collections would need 5.0+ and per-measurement documents.
+
+Two kinds are kept apart: "observed" (NOAA / archive sources) and "forecast"
+(model and seeded rows); range_read() merges them with observed values
+taking precedence.
+
+KP_SERIES_MODE selects how the layout is used during the transition:
+  off    - buckets are not maintained (default);
+  dual   - writers keep buckets in sync with the day documents (sync_days);
+  series - as dual, and the training / prediction loaders read from buckets.
+
+Kept free of Django imports so standalone ml_model scripts can use it.
+"""
+
+import calendar
+import logging
+import os
+from datetime import datetime
+
+import numpy as np
+from bson import Binary
+from pymongo import ReplaceOne
+from pymongo.errors import BulkWriteError
+
+from . import retention
+from .rollups import pick_per_day, _kp_values
+from .schema import SOURCE_LSTM, SOURCE_ML, SOURCE_SEED, infer_source
+from .utils_spaceweather import to_utc_date
+
+logger = logging.getLogger(__name__)
+
+BUCKETS_COLLECTION = "kp_series_buckets"
+OBSERVED = "observed"
+FORECAST = "forecast"
+KINDS = (OBSERVED, FORECAST)
+
+SLOTS_PER_DAY = 8
+BUCKET_SLOTS = 31 * SLOTS_PER_DAY
+STEP = np.timedelta64(3, "h")
+_DTYPE = np.dtype("<f4")
+FORECAST_SOURCES = {SOURCE_LSTM, SOURCE_ML, SOURCE_SEED}
+MAX_ATTEMPTS = 5
+_PROJECTION = {"date": 1, "kp_index": 1, "kp_packed": 1, "kp_raw": 1, "predicted_kp_3hr": 1, "kp": 1,
+               "rationale_geomagnetic": 1, "source": 1, "created_at": 1}
+
+
+def mode():
+    return os.environ.get("KP_SERIES_MODE", "off").strip().lower()
+
+
+def enabled():
+    return mode() in ("dual", "series")
+
+
+def kind_for(doc):
+    return FORECAST if infer_source(doc) in FORECAST_SOURCES else OBSERVED
+
+
+def _bucket_id(kind, month):
+    return f"{kind}:{month}"
+
+
+def _empty():
+    return np.full(BUCKET_SLOTS, np.nan, dtype=_DTYPE)
+
+
+def _decode(doc):
+    raw = doc.get("values")
+    if raw is None:
+        return _empty()
+    return np.frombuffer(bytes(raw), dtype=_DTYPE).copy()
+
+
+def ensure_indexes(db):
+    db[BUCKETS_COLLECTION].create_index([("kind", 1), ("start", 1)])
+
+
+def _write_months(db, kind, updates):
+    """
+    Overlay {month: (slot_index_array, values_array)} onto the stored buckets.
+    Optimistic concurrency on a per-bucket version counter: a bucket changed
+    (or created) by another writer in between is re-read and re-applied.
+    """
+    col = db[BUCKETS_COLLECTION]
+    pending = dict(updates)
+    for _ in range(MAX_ATTEMPTS):
+        if not pending:
+            return
+        ids = {_bucket_id(kind, month): month for month in pending}
+        stored = {doc["_id"]: doc for doc in col.find({"_id": {"$in": list(ids)}})}
+        ops, op_ids = [], []
+        for bucket_id, month in ids.items():
+            doc = stored.get(bucket_id)
+            arr = _decode(doc) if doc else _empty()
+            idx, vals = pending[month]
+            arr[idx] = vals
+            version = doc.get("version", 0) if doc else 0
+            y, m = int(month[:4]), int(month[5:7])
+            ops.append(ReplaceOne(
+                {"_id": bucket_id, "version": version} if doc else {"_id": bucket_id, "version": {"$exists": False}},
+                {
+                    "kind": kind,
+                    "month": month,
+                    "start": datetime(y, m, 1),
+                    "days": calendar.monthrange(y, m)[1],
+                    "values": Binary(arr.astype(_DTYPE).tobytes()),
+                    "n": int(np.count_nonzero(~np.isnan(arr))),
+                    "version": version + 1,
+                    "updated_at": datetime.utcnow(),
+                },
+                upsert=True,
+            ))
+            op_ids.append(bucket_id)
+        try:
+            col.bulk_write(ops, ordered=False)
+            return
+        except BulkWriteError as e:
+            # duplicate key = lost the race on an upsert; retry those months only
+            errors = e.details.get("writeErrors", [])
+            if any(err.get("code") != 11000 for err in errors):
+                raise
+            failed = {op_ids[err["index"]] for err in errors}
+            pending = {ids[b]: pending[ids[b]] for b in failed}
+    raise RuntimeError(f"kp_series: gave up after {MAX_ATTEMPTS} attempts on {sorted(pending)}")
+
+
+def bulk_append(db, kind, times, values):
+    """
+    Write 3-hourly values at `times` (datetime64 / datetime / ISO, UTC) into the
+    `kind` series, overwriting existing slots. Times are floored to their 3-hour
+    slot. Returns the number of values written.
+    """
+    if kind not in KINDS:
+        raise ValueError(f"unknown kp series kind: {kind!r}")
+    t = np.asarray(times, dtype="datetime64[h]")
+    v = np.asarray(values, dtype=_DTYPE)
+    if t.shape != v.shape:
+        raise ValueError("times and values must have the same length")
+    if not t.size:
+        return 0
+
+    months = t.astype("datetime64[M]")
+    days = (t.astype("datetime64[D]") - months).astype(np.int64)
+    hours = (t - t.astype("datetime64[D]")).astype(np.int64)
+    slot = days * SLOTS_PER_DAY + hours // 3
+
+    updates = {}
+    for month in np.unique(months):
+        sel = months == month
+        updates[str(month)] = (slot[sel], v[sel])
+    _write_months(db, kind, updates)
+    return int(t.size)
+
+
+def bounds(db, kinds=KINDS):
+    """(first day, day after the last bucket month) covered by the stored buckets, or (None, None)."""
+    col = db[BUCKETS_COLLECTION]
+    query = {"kind": {"$in": list(kinds)}}
+    first = col.find_one(query, projection={"start": 1}, sort=[("start", 1)])
+    last = col.find_one(query, projection={"start": 1, "days": 1}, sort=[("start", -1)])
+    if not first or not last:
+        return None, None
+    end = np.datetime64(last["start"], "D") + np.timedelta64(last.get("days", 31), "D")
+    return first["start"].date(), end.astype(datetime)
+
+
+def read_all(db, kinds=KINDS):
+    """Every stored value, as range_read() returns it (NaN slots dropped)."""
+    start, end = bounds(db, kinds)
+    if start is None:
+        return np.empty(0, dtype="datetime64[s]"), np.empty(0, dtype=_DTYPE)
+    return range_read(db, start, end, kinds)
+
+
+def tail(db, n, kinds=KINDS):
+    """
+    The newest `n` stored values (NaN slots dropped), reading back from the
+    last bucket month in widening windows instead of the whole series.
+    """
+    first, end = bounds(db, kinds)
+    if first is None or n <= 0:
+        return np.empty(0, dtype="datetime64[s]"), np.empty(0, dtype=_DTYPE)
+    days = -(-n // SLOTS_PER_DAY) + 31
+    while True:
+        start = max(first, (np.datetime64(end, "D") - np.timedelta64(days, "D")).astype(datetime))
+        times, values = range_read(db, start, end, kinds)
+        if len(values) >= n or start <= first:
+            return times[-n:], values[-n:]
+        days *= 2
+
+
+def range_read(db, start, end, kinds=KINDS, dropna=True):
+    """
+    Series for [start, end) as (times datetime64[s] array, values float32 array).
+    With several kinds the first one holding a value wins, slot by slot.
+    """
+    start64 = np.datetime64(to_utc_date(start), "D").astype("datetime64[s]")
+    end64 = np.datetime64(to_utc_date(end), "D").astype("datetime64[s]")
+    if end64 <= start64:
+        return np.empty(0, dtype="datetime64[s]"), np.empty(0, dtype=_DTYPE)
+
+    first_month = start64.astype("datetime64[M]")
+    total = int((end64 - start64) // STEP)
+    merged = np.full(total, np.nan, dtype=_DTYPE)
+
+    cursor = db[BUCKETS_COLLECTION].find(
+        {"kind": {"$in": list(kinds)}, "start": {"$gte": first_month.astype("datetime64[s]").astype(datetime),
+                                              "$lt": end64.astype(datetime)}},
+        projection={"kind": 1, "start": 1, "days": 1, "values": 1},
+    )
+    # lower rank wins; fill lowest priority first so higher ones overwrite
+    rank = {k: i for i, k in enumerate(kinds)}
+    for doc in sorted(cursor, key=lambda d: -rank[d["kind"]]):
+        arr = _decode(doc)[: doc.get("days", 31) * SLOTS_PER_DAY]
+        offset = int((np.datetime64(doc["start"], "s") - start64) // STEP)
+        lo, hi = max(0, offset), min(total, offset + arr.size)
+        if lo >= hi:
+            continue
+        part = arr[lo - offset: hi - offset]
+        have = ~np.isnan(part)
+        merged[lo:hi][have] = part[have]
+
+    times = start64 + np.arange(total) * STEP
+    if dropna:
+        keep = ~np.isnan(merged)
+        return times[keep], merged[keep]
+    return times, merged
+
+
+def _day_arrays(days, best):
+    """Slot times and values for `days`, from the chosen document per day (NaN where missing)."""
+    day64 = np.array(days, dtype="datetime64[D]")
+    times = (day64[:, None] + (np.arange(SLOTS_PER_DAY) * STEP)[None, :]).ravel()
+    rows = [[np.nan if v is None else v for v in _kp_values(best[d])] if d in best else [np.nan] * SLOTS_PER_DAY
+            for d in days]
+    return times, np.array(rows, dtype=_DTYPE).ravel()
+
+
+def sync_days(collection, dates):
+    """
+    Dual-write hook: re-derive the bucket slots of `dates` from the day documents
+    (one preferred document per day and kind; days without one are cleared).
+    No-op unless KP_SERIES_MODE is dual or series. Never raises.
+    """
+    if not enabled() or collection is None:
+        return 0
+    days = sorted({d for d in (to_utc_date(x) for x in dates or []) if d})
+    if not days:
+        return 0
+    try:
+        docs = retention.read_days(collection, days, projection=_PROJECTION)
+        for kind in KINDS:
+            best = pick_per_day(d for d in docs if kind_for(d) == kind)
+            bulk_append(collection.database, kind, *_day_arrays(days, best))
+        return len(days)
+    except Exception:
+        logger.exception("kp series sync failed for %d day(s)", len(days))
+        return 0
+
+
+def rebuild(collection, batch_size=1000, log=None):
+    """Regenerate the buckets from every day document (runs regardless of KP_SERIES_MODE)."""
+    db = collection.database
+    db[BUCKETS_COLLECTION].delete_many({})
+    ensure_indexes(db)
+    by_kind = {kind: [] for kind in KINDS}
+    for doc in retention.iter_all(collection, projection=_PROJECTION, batch_size=batch_size):
+        by_kind[kind_for(doc)].append(doc)
+
+    written = 0
+    for kind, docs in by_kind.items():
+        best = pick_per_day(docs)
+        days = sorted(best)
+        for i in range(0, len(days), batch_size):
+            written += bulk_append(db, kind, *_day_arrays(days[i:i + batch_size], best))
+            if log:
+                log(f"{kind}: {min(i + batch_size, len(days))}/{len(days)} days")
+    return written
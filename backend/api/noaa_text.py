@@ -0,0 +1,322 @@
+# backend/api/noaa_text.py
+"""
+Parser and backfill for NOAA SWPC ":Product: 3-Day Forecast" text products
+(the format forecast.formatter.generate_forecast_text imitates).
+
+parse() turns one product into the issue time, the three forecast days, the
+Kp breakdown table (3 x 8), the S1-or-greater, R1-R2 and R3-or-greater
+percentages and the three rationales. Day columns only carry "Mon DD"; the
+year comes from the :Issued: line (a January column in a December product
+belongs to the next year).
+
+backfill() parses files on a process pool, keeps for every day the product
+issued last (shortest lead time), and bulk-upserts one NOAA-sourced document
+per day on (date, source): validated per batch (api.validation), derived,
+content-hash skipped. Each document carries the product's `issued_at`;
+days whose stored document was issued later are dropped from the batch
+(one $in prefetch per batch), and the upsert itself only matches a stored
+day issued at or before it, so re-running an older directory never
+overwrites a newer product. That last guard relies on the unique
+(date, source) index (api.indexes): backfill() refuses to write without it. The newest product also
+becomes the noaa_baseline document (get_noaa_baseline), whose
+baseline_start / baseline_end are its first and last forecast day.
+
+Kept free of Django imports so the pool workers stay light.
+"""
+
+import logging
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, datetime
+
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+
+from . import content_hash, derive, indexes, kp_codec, kp_series, publish, rollups, validation
+from .schema import SOURCE_NOAA, canonicalize_doc
+from .utils_spaceweather import NOAA_BASELINE_SOURCE, date_match_values, to_utc_date
+
+logger = logging.getLogger(__name__)
+
+SLOTS = 8
+DAYS = 3
+DUPLICATE_KEY = 11000
+MONTHS = {m: i for i, m in enumerate(
+    ("Jan", "Feb", "Mar", "Apr", "May", "Jun", "Jul", "Aug", "Sep", "Oct", "Nov", "Dec"), start=1)}
+
+_PRODUCT_RE = re.compile(r"^:Product:\s*3-Day Forecast", re.M)
+_ISSUED_RE = re.compile(r"^:Issued:\s*(\d{4})\s+([A-Z][a-z]{2})\s+(\d{1,2})\s+(\d{2})(\d{2})\s*UTC", re.M)
+_SECTION_RE = re.compile(r"^(?=[ABC]\.\s)", re.M)
+_DAY_RE = re.compile(r"\b([A-Z][a-z]{2})\s+(\d{1,2})\b")
+_KP_ROW_RE = re.compile(r"^\s*(\d{2})-(\d{2})UT\s+(.+)$", re.M)
+_STORM_TAG_RE = re.compile(r"\(G\d\)")
+_NUMBER_RE = re.compile(r"\d+(?:\.\d+)?")
+_PERCENT_RE = re.compile(r"(\d+(?:\.\d+)?)\s*%")
+_RATIONALE_RE = re.compile(r"Rationale:\s*(.*?)(?:\n\s*\n|\Z)", re.S)
+
+
+class ParseError(ValueError):
+    """The text is not a usable 3-day forecast product."""
+
+
+class MissingIndexError(RuntimeError):
+    """The forecast collection lacks the unique (date, source) index the upserts rely on."""
+
+
+def _day(month, day, issued):
+    """Calendar date of a "Mon DD" column, in the year that puts it nearest the issue date."""
+    if month not in MONTHS:
+        raise ParseError(f"unknown month {month!r}")
+    best = None
+    for year in (issued.year - 1, issued.year, issued.year + 1):
+        try:
+            d = date(year, MONTHS[month], int(day))
+        except ValueError:
+            continue
+        if best is None or abs((d - issued.date()).days) < abs((best - issued.date()).days):
+            best = d
+    if best is None:
+        raise ParseError(f"invalid day {month} {day}")
+    return best
+
+
+def _sections(text):
+    return {part[0]: part for part in _SECTION_RE.split(text) if part[:1] in "ABC" and part[1:2] == "."}
+
+
+def _rationale(section):
+    m = _RATIONALE_RE.search(section or "")
+    return " ".join(m.group(1).split()) if m else ""
+
+
+def _row(section, label):
+    m = re.search(rf"^\s*{re.escape(label)}\s+(.+)$", section or "", re.M)
+    return [float(v) for v in _PERCENT_RE.findall(m.group(1))][:DAYS] if m else []
+
+
+def parse(text):
+    """Parse one product. Raises ParseError when the issue line or the Kp table is missing."""
+    if not _PRODUCT_RE.search(text):
+        raise ParseError("not a 3-Day Forecast product")
+    m = _ISSUED_RE.search(text)
+    if not m:
+        raise ParseError("missing :Issued: line")
+    year, month, day, hh, mm = m.groups()
+    if month not in MONTHS:
+        raise ParseError(f"unknown month {month!r}")
+    issued = datetime(int(year), MONTHS[month], int(day), int(hh), int(mm))
+
+    sections = _sections(text)
+    geo = sections.get("A", "")
+    _, sep, table = geo.partition("Kp index breakdown")
+    if not sep:
+        raise ParseError("missing Kp index breakdown")
+    # the header line is the first one naming three days
+    columns = next((found for found in (_DAY_RE.findall(line) for line in table.splitlines()[1:])
+                    if len(found) >= DAYS), None)
+    if not columns:
+        raise ParseError("missing Kp table header")
+    days = [_day(mon, dd, issued) for mon, dd in columns[:DAYS]]
+
+    kp = [[None] * SLOTS for _ in range(DAYS)]
+    for start, _, values in _KP_ROW_RE.findall(table.split("Rationale:")[0]):
+        slot = int(start) // 3
+        if slot >= SLOTS:
+            continue
+        for i, v in enumerate(_NUMBER_RE.findall(_STORM_TAG_RE.sub("", values))[:DAYS]):
+            kp[i][slot] = float(v)
+    if all(v is None for row in kp for v in row):
+        raise ParseError("empty Kp table")
+
+    radiation, blackout = sections.get("B", ""), sections.get("C", "")
+    return {
+        "issued_at": issued,
+        "days": days,
+        "kp": kp,
+        "s1": _row(radiation, "S1 or greater"),
+        "r1_r2": _row(blackout, "R1-R2"),
+        "r3": _row(blackout, "R3 or greater"),
+        "rationale_geomagnetic": _rationale(geo),
+        "rationale_radiation": _rationale(radiation),
+        "rationale_blackout": _rationale(blackout),
+    }
+
+
+def parse_file(path):
+    """Pool task: (path, parsed or None, error or None)."""
+    try:
+        with open(path, "r", encoding="utf-8", errors="replace") as fh:
+            return path, parse(fh.read()), None
+    except (OSError, ValueError) as e:
+        return path, None, str(e)
+
+
+def iter_paths(paths, suffixes=(".txt",)):
+    """Files named directly, plus files with one of `suffixes` under directories, in sorted order."""
+    for path in paths:
+        if os.path.isdir(path):
+            for root, dirs, files in os.walk(path):
+                dirs.sort()
+                for name in sorted(files):
+                    if name.lower().endswith(suffixes):
+                        yield os.path.join(root, name)
+        else:
+            yield path
+
+
+def to_docs(parsed):
+    """One model-shaped NOAA document per forecast day of a parsed product."""
+    docs = []
+    for i, day in enumerate(parsed["days"]):
+        blackout = {}
+        if i < len(parsed["r1_r2"]):
+            blackout["R1-R2"] = parsed["r1_r2"][i]
+        if i < len(parsed["r3"]):
+            blackout["R3 or greater"] = parsed["r3"][i]
+        docs.append({
+            "date": datetime(day.year, day.month, day.day),
+            "source": SOURCE_NOAA,
+            "kp_index": parsed["kp"][i],
+            "solar_radiation": [parsed["s1"][i]] if i < len(parsed["s1"]) else [],
+            "radio_blackout": blackout,
+            "rationale_geomagnetic": parsed["rationale_geomagnetic"],
+            "rationale_radiation": parsed["rationale_radiation"],
+            "rationale_blackout": parsed["rationale_blackout"],
+            "issued_at": parsed["issued_at"],
+        })
+    return docs
+
+
+def baseline_doc(parsed):
+    """The noaa_baseline document (get_noaa_baseline) for a parsed product."""
+    first, last = parsed["days"][0], parsed["days"][-1]
+    return {
+        "source": NOAA_BASELINE_SOURCE,
+        "issued_at": parsed["issued_at"],
+        "baseline_start": datetime(first.year, first.month, first.day),
+        "baseline_end": datetime(last.year, last.month, last.day),
+        "days": [{k: d[k] for k in ("date", "kp_index", "solar_radiation", "radio_blackout")}
+                 for d in to_docs(parsed)],
+        "rationale_geomagnetic": parsed["rationale_geomagnetic"],
+        "rationale_radiation": parsed["rationale_radiation"],
+        "rationale_blackout": parsed["rationale_blackout"],
+        "updated_at": datetime.utcnow(),
+    }
+
+
+def write_baseline(baseline_collection, parsed):
+    """Replace the baseline document unless the stored one is from this or a later product. Returns True if written."""
+    stored = baseline_collection.find_one({"source": NOAA_BASELINE_SOURCE}, projection={"issued_at": 1})
+    if stored and stored.get("issued_at") and stored["issued_at"] >= parsed["issued_at"]:
+        return False
+    baseline_collection.replace_one({"source": NOAA_BASELINE_SOURCE}, baseline_doc(parsed), upsert=True)
+    return True
+
+
+def _upsert_if_newer(doc, now):
+    """Upsert on (date, source), matching only a stored day not issued after this product."""
+    fields = {k: v for k, v in doc.items() if k != "_id"}
+    update = kp_codec.update_for(fields)
+    update["$setOnInsert"] = {"created_at": now}
+    query = dict(publish.key_of(doc), **{"$or": [{"issued_at": {"$lte": doc["issued_at"]}},
+                                                  {"issued_at": {"$exists": False}}]})
+    # a day made newer since the prefetch fails the match; the upsert then hits the unique key and is skipped
+    return UpdateOne(query, update, upsert=True)
+
+
+def _stored_issued(collection, docs):
+    """{day: latest issued_at} of the stored NOAA documents for the batch's days, in one $in query."""
+    keys = [k for day in {to_utc_date(doc["date"]) for doc in docs} for k in date_match_values(day)]
+    stored = {}
+    query = {"date": {"$in": keys}, "source": SOURCE_NOAA}
+    for found in collection.find(query, projection={"date": 1, "issued_at": 1}):
+        day, issued = to_utc_date(found.get("date")), found.get("issued_at")
+        if issued is not None and (stored.get(day) is None or issued > stored[day]):
+            stored[day] = issued
+    return stored
+
+
+def write_batch(collection, docs):
+    """Validate, derive, hash-skip and upsert one batch of day documents. Returns counts."""
+    counts = {"written": 0, "unchanged": 0, "superseded": 0, "invalid": 0}
+    masks = validation.validate_batch(docs)
+    counts["invalid"] = int(masks["invalid"].sum())
+    docs = [canonicalize_doc(doc, derived=False) for doc, bad in zip(docs, masks["invalid"].tolist()) if not bad]
+    derive.apply(docs)
+    changed, counts["unchanged"] = content_hash.split_unchanged(collection, docs)
+    if not changed:
+        return counts
+    stored = _stored_issued(collection, changed)
+    current = [doc for doc in changed if stored.get(to_utc_date(doc["date"]), datetime.min) <= doc["issued_at"]]
+    counts["superseded"] = len(changed) - len(current)
+    changed = current
+    if not changed:
+        return counts
+    now = datetime.utcnow()
+    failed = set()
+    try:
+        collection.bulk_write([_upsert_if_newer(doc, now) for doc in changed], ordered=False)
+    except BulkWriteError as e:
+        for err in (e.details or {}).get("writeErrors", []):
+            failed.add(err["index"])
+            if err.get("code") == DUPLICATE_KEY:
+                counts["superseded"] += 1
+            else:
+                counts["invalid"] += 1
+                logger.warning("NOAA day %s not written: %s", changed[err["index"]]["date"].date(), err.get("errmsg"))
+    touched = [doc["date"] for i, doc in enumerate(changed) if i not in failed]
+    counts["written"] = len(touched)
+    rollups.refresh_days(collection, touched)
+    kp_series.sync_days(collection, touched)
+    return counts
+
+
+def parse_all(paths, workers=None, chunksize=32):
+    """Parse files on a process pool. Returns (products sorted by issue time, [(path, error)])."""
+    products, failures = [], []
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count()) as pool:
+        for path, parsed, error in pool.map(parse_file, paths, chunksize=chunksize):
+            if error:
+                failures.append((path, error))
+            else:
+                products.append(parsed)
+    products.sort(key=lambda p: p["issued_at"])
+    return products, failures
+
+
+def latest_per_day(products):
+    """Day documents, one per day, each from the last product issued for it (products sorted by issue time)."""
+    by_day = {}
+    for parsed in products:
+        for doc in to_docs(parsed):
+            by_day[doc["date"]] = doc
+    return [by_day[d] for d in sorted(by_day)]
+
+
+def backfill(collection, baseline_collection, paths, workers=None, batch_size=1000, dry_run=False,
+             progress=None):
+    """
+    Parse every product under `paths` and write the NOAA day documents and
+    the baseline. progress(counts) is called after every batch. Returns
+    (counts, failures) where failures lists (path, error) for unparsable files.
+    Raises MissingIndexError before parsing when the unique (date, source)
+    index is missing.
+    """
+    if not dry_run and not indexes.has_index(collection, [(k, 1) for k in publish.KEY_FIELDS], unique=True):
+        raise MissingIndexError(f"{collection.name} has no unique (date, source) index; run manage.py ensure_indexes")
+    files = list(iter_paths(paths))
+    products, failures = parse_all(files, workers=workers)
+    docs = latest_per_day(products)
+    counts = {"files": len(files), "products": len(products), "failed": len(failures), "days": len(docs),
+              "written": 0, "unchanged": 0, "superseded": 0, "invalid": 0, "baseline": False}
+    if dry_run or not products:
+        return counts, failures
+    for i in range(0, len(docs), batch_size):
+        for key, n in write_batch(collection, docs[i:i + batch_size]).items():
+            counts[key] += n
+        if progress:
+            progress(dict(counts))
+    if baseline_collection is not None:
+        counts["baseline"] = write_baseline(baseline_collection, products[-1])
+    return counts, failures
@@ -0,0 +1,92 @@
+# backend/api/publish.py
+"""
+Idempotent publishing of model forecasts.
+
+A forecast document is identified by (date, source); api.indexes declares
+that pair unique. publish() writes a batch as unordered bulk upserts on that
+key: fields are $set, created_at only on insert ($setOnInsert). Documents whose
+stored content hash (api.content_hash) already matches are not sent at all,
+so re-running the pipeline for the same days writes nothing.
+
+When the deployment supports transactions (replica set or mongos), the
+upserts and the prediction_publishes log entry commit together, so readers
+see either all of the days or none. On a standalone server the bulk write is
+applied without a transaction.
+
+Kept free of Django imports so standalone ml_model scripts can use it.
+"""
+
+import logging
+from datetime import datetime
+
+from pymongo import UpdateOne
+from pymongo.errors import PyMongoError
+
+from . import content_hash, kp_codec
+
+logger = logging.getLogger(__name__)
+
+PUBLISHES_COLLECTION = "prediction_publishes"
+KEY_FIELDS = ("date", "source")
+INSERT_ONLY_FIELDS = ("created_at",)
+
+
+def key_of(doc):
+    return {k: doc[k] for k in KEY_FIELDS}
+
+
+def upsert_op(doc):
+    """UpdateOne upserting `doc` on (date, source); insert-only fields go to $setOnInsert."""
+    fields = {k: v for k, v in doc.items() if k != "_id" and k not in INSERT_ONLY_FIELDS}
+    update = kp_codec.update_for(fields)
+    on_insert = {k: doc[k] for k in INSERT_ONLY_FIELDS if k in doc}
+    if on_insert:
+        update["$setOnInsert"] = on_insert
+    return UpdateOne(key_of(doc), update, upsert=True)
+
+
+def supports_transactions(client):
+    """True for replica sets and sharded clusters (multi-document transactions)."""
+    try:
+        hello = client.admin.command("ismaster")
+    except PyMongoError:
+        return False
+    return bool(hello.get("setName") or hello.get("msg") == "isdbgrid")
+
+
+def publish(collection, docs, log=None):
+    """
+    Upsert `docs` keyed on (date, source) and record the publish in
+    prediction_publishes (with `log` merged into the entry). Returns the
+    publish entry: upserted / matched / modified counts and upserted ids.
+    """
+    missing = [k for doc in docs for k in KEY_FIELDS if doc.get(k) is None]
+    if missing:
+        raise ValueError(f"publish needs {KEY_FIELDS} on every document (missing: {sorted(set(missing))})")
+    keys = [key_of(doc) for doc in docs]
+    changed, unchanged = content_hash.split_unchanged(collection, docs)
+    ops = [upsert_op(doc) for doc in changed]
+    publishes = collection.database[PUBLISHES_COLLECTION]
+
+    def run(session=None):
+        res = collection.bulk_write(ops, ordered=False, session=session) if ops else None
+        entry = {
+            "published_at": datetime.utcnow(),
+            "published": True,
+            "keys": keys,
+            "upserted_ids": [str(x) for x in (res.upserted_ids.values() if res else [])],
+            "matched": res.matched_count if res else 0,
+            "modified": res.modified_count if res else 0,
+            "unchanged": unchanged,
+            "transactional": session is not None,
+        }
+        entry.update(log or {})
+        publishes.insert_one(entry, session=session)
+        return entry
+
+    client = collection.database.client
+    if not supports_transactions(client):
+        logger.info("Server has no transaction support; publishing %d doc(s) without one", len(ops))
+        return run()
+    with client.start_session() as session:
+        return session.with_transaction(run)
@@ -0,0 +1,229 @@
+# backend/api/ratelimit.py
+"""
+Per-client token-bucket rate limiting and load shedding for the public API.
+
+State lives in a small memory-mapped file guarded by flock, so every gunicorn
+worker on the host shares the same buckets and the same view of how many
+workers are busy. One check costs a lock round-trip and a few struct reads,
+cheap enough to run on every request.
+
+- 429 + Retry-After: the client has exhausted its bucket.
+- 503 + Retry-After: the worker pool is saturated (all workers busy, or the
+  request already waited longer than RATE_LIMIT_MAX_QUEUE_MS in the proxy
+  queue) and this client is using more than its fair share.
+"""
+
+import fcntl
+import hashlib
+import logging
+import math
+import mmap
+import os
+import struct
+import threading
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.http import JsonResponse
+
+logger = logging.getLogger(__name__)
+
+MAX_WORKERS = 64
+_WORKER = struct.Struct("<qd")          # pid, busy_since (0 = idle)
+_SLOT = struct.Struct("<Qdd")           # key hash, tokens, last refill
+HEADER_SIZE = MAX_WORKERS * _WORKER.size
+PROBES = 8
+# a worker marked busy for longer than this is assumed dead (gunicorn timeout is 30s)
+STALE_BUSY_SECONDS = 120
+
+
+def _key_hash(key: str) -> int:
+    # stable across processes (builtin hash() is salted per interpreter)
+    h = int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest(), "little")
+    return h or 1
+
+
+class SharedState:
+    """Token buckets + busy-worker table in a memory-mapped file."""
+
+    def __init__(self, path, slots):
+        self.path = path
+        self.slots = slots
+        self.size = HEADER_SIZE + slots * _SLOT.size
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def _open(self):
+        # (re)open after fork: flock is tied to the open file description
+        if self._pid == os.getpid():
+            return
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+        if os.fstat(fd).st_size < self.size:
+            os.ftruncate(fd, self.size)
+        self.fd = fd
+        self.mm = mmap.mmap(fd, self.size)
+        self._pid = os.getpid()
+
+    @contextmanager
+    def _locked(self):
+        with self._lock:
+            self._open()
+            fcntl.flock(self.fd, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(self.fd, fcntl.LOCK_UN)
+
+    # -- token buckets --------------------------------------------------
+
+    def take(self, key, rate, burst, now=None):
+        """Consume one token; returns (allowed, tokens_left, retry_after_seconds)."""
+        now = time.time() if now is None else now
+        h = _key_hash(key)
+        with self._locked():
+            offset = self._find_slot(h, now, rate, burst)
+            _, tokens, last = _SLOT.unpack_from(self.mm, offset)
+            tokens = min(burst, tokens + max(0.0, now - last) * rate)
+            if tokens >= 1.0:
+                tokens -= 1.0
+                _SLOT.pack_into(self.mm, offset, h, tokens, now)
+                return True, tokens, 0.0
+            _SLOT.pack_into(self.mm, offset, h, tokens, now)
+            return False, tokens, (1.0 - tokens) / rate
+
+    def _find_slot(self, h, now, rate, burst):
+        refill = burst / rate if rate > 0 else 0.0
+        victim, victim_last = None, None
+        for i in range(PROBES):
+            offset = HEADER_SIZE + ((h + i) % self.slots) * _SLOT.size
+            key, _, last = _SLOT.unpack_from(self.mm, offset)
+            if key == h:
+                return offset
+            # empty, or idle long enough that the bucket would be full again
+            if key == 0 or now - last >= refill:
+                _SLOT.pack_into(self.mm, offset, h, float(burst), now)
+                return offset
+            if victim is None or last < victim_last:
+                victim, victim_last = offset, last
+        _SLOT.pack_into(self.mm, victim, h, float(burst), now)
+        return victim
+
+    # -- busy workers ---------------------------------------------------
+
+    def enter(self, now=None):
+        """Mark this worker busy; returns how many workers are busy (including this one)."""
+        now = time.time() if now is None else now
+        pid = os.getpid()
+        with self._locked():
+            busy, mine, free = 0, None, None
+            for i in range(MAX_WORKERS):
+                offset = i * _WORKER.size
+                wpid, since = _WORKER.unpack_from(self.mm, offset)
+                if wpid == pid:
+                    mine = offset
+                elif since and now - since < STALE_BUSY_SECONDS:
+                    busy += 1
+                elif free is None:
+                    free = offset
+            offset = mine if mine is not None else free
+            if offset is not None:
+                _WORKER.pack_into(self.mm, offset, pid, now)
+            return busy + 1
+
+    def leave(self):
+        pid = os.getpid()
+        with self._locked():
+            for i in range(MAX_WORKERS):
+                offset = i * _WORKER.size
+                wpid, _ = _WORKER.unpack_from(self.mm, offset)
+                if wpid == pid:
+                    _WORKER.pack_into(self.mm, offset, pid, 0.0)
+                    return
+
+
+def client_key(request):
+    """
+    Client address as seen by the last trusted proxy hop. X-Forwarded-For is
+    only read when RATE_LIMIT_PROXY_HOPS configures proxies in front of us,
+    and only an entry those proxies appended is used: a shorter chain means
+    the request did not come through them, so REMOTE_ADDR is used instead.
+    """
+    hops = int(getattr(settings, "RATE_LIMIT_PROXY_HOPS", 0))
+    forwarded = request.META.get("HTTP_X_FORWARDED_FOR", "") if hops > 0 else ""
+    parts = [p.strip() for p in forwarded.split(",") if p.strip()]
+    if len(parts) >= hops > 0:
+        return parts[len(parts) - hops]
+    return request.META.get("REMOTE_ADDR", "") or "unknown"
+
+
+def queue_ms(request, now=None):
+    """Time spent queued before reaching Django, from an X-Request-Start header (t=<epoch>)."""
+    raw = request.META.get("HTTP_X_REQUEST_START", "")
+    if not raw:
+        return None
+    try:
+        value = float(raw.split("t=")[-1].strip())
+    except ValueError:
+        return None
+    now = time.time() if now is None else now
+    # proxies send seconds, milliseconds or microseconds since the epoch
+    while value > now * 10:
+        value /= 1000.0
+    return max(0.0, (now - value) * 1000.0)
+
+
+def _reject(status, retry_after, message):
+    resp = JsonResponse({"error": message}, status=status)
+    resp["Retry-After"] = str(max(1, int(math.ceil(retry_after))))
+    resp["Access-Control-Allow-Origin"] = "*"
+    return resp
+
+
+class RateLimitMiddleware:
+    """Applies the shared token buckets / load shedding to RATE_LIMIT_PATHS."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.enabled = getattr(settings, "RATE_LIMIT_ENABLED", True)
+        self.rate = float(getattr(settings, "RATE_LIMIT_RATE", 2.0))
+        self.burst = float(getattr(settings, "RATE_LIMIT_BURST", 20))
+        self.capacity = int(getattr(settings, "RATE_LIMIT_WORKER_CAPACITY", 3))
+        self.max_queue_ms = float(getattr(settings, "RATE_LIMIT_MAX_QUEUE_MS", 2000))
+        self.paths = tuple(getattr(settings, "RATE_LIMIT_PATHS", ("/api/", "/forecast/")))
+        self.exempt = tuple(getattr(settings, "RATE_LIMIT_EXEMPT_PATHS", ("/api/health/",)))
+        self.state = SharedState(
+            getattr(settings, "RATE_LIMIT_STATE_FILE", "/tmp/space-forecast-ratelimit.bin"),
+            int(getattr(settings, "RATE_LIMIT_SLOTS", 4096)),
+        )
+
+    def __call__(self, request):
+        path = request.path
+        if not self.enabled or request.method == "OPTIONS" or not path.startswith(self.paths) \
+                or path.startswith(self.exempt):
+            return self.get_response(request)
+
+        try:
+            now = time.time()
+            allowed, tokens, retry_after = self.state.take(client_key(request), self.rate, self.burst, now)
+            if not allowed:
+                return _reject(429, retry_after, "rate limit exceeded")
+
+            busy = self.state.enter(now)
+        except OSError:
+            # never take the API down because the shared state file is unusable
+            logger.exception("Rate limiter unavailable; letting request through")
+            return self.get_response(request)
+
+        try:
+            waited = queue_ms(request, now)
+            saturated = busy >= self.capacity or (waited is not None and waited > self.max_queue_ms)
+            # under saturation only clients with at least half a bucket left get through
+            if saturated and tokens < self.burst / 2:
+                return _reject(503, (self.burst / 2 - tokens) / self.rate, "server busy, retry later")
+            return self.get_response(request)
+        finally:
+            try:
+                self.state.leave()
+            except OSError:
+                logger.exception("Rate limiter: could not release worker slot")
@@ -0,0 +1,423 @@
+# backend/api/retention.py
+"""
+Hot / cold retention for forecast documents.
+
+Documents whose `date` is older than RETENTION_HOT_DAYS are moved, in
+bounded batches, out of the hot collection into compressed archive chunks:
+one `<collection>_archive` document per batch holding the zlib-compressed
+BSON of the batch, plus its date span and sizes. With
+RETENTION_ARCHIVE_DIR set, the compressed payload goes to a local file and
+the chunk document only keeps its path.
+
+Each batch is written to the archive before it is deleted from the hot
+collection, and the chunk id is derived from the batch contents, so an
+interrupted run just redoes the last batch. Readers (read_days / read_range /
+iter_range, used by the batch and range / export endpoints, the rollup /
+series rebuilds, and chunks / read_chunk / iter_archived for the training
+history loaders) merge both tiers.
+
+A document is identified by (date, source) in both tiers. Writers only look
+at the hot collection, so re-writing an archived day (a GFZ backfill with
+--full / --since, an old NOAA product, an upload for an old date) creates a
+new hot document next to the archived one. Readers drop an archived document
+when the hot collection holds its (date, source) - the hot copy wins - and
+between archived copies the most recently archived chunk wins. When the
+re-written day is archived in turn, archive_batch removes the older copy
+from its chunk, so each (date, source) is stored once per tier.
+
+Publish logs (prediction_publishes) are not archived: they expire through
+the TTL index declared in api.indexes (RETENTION_PUBLISH_TTL_DAYS).
+
+Kept free of Django imports so standalone scripts can use it.
+"""
+
+import hashlib
+import heapq
+import logging
+import os
+import zlib
+from datetime import datetime, time, timedelta
+from itertools import count
+
+import bson
+from bson import Binary
+from bson.errors import BSONError
+
+from .schema import infer_source
+from .utils_spaceweather import to_utc_date, date_match_values
+
+logger = logging.getLogger(__name__)
+
+HOT_DAYS = int(os.environ.get("RETENTION_HOT_DAYS", 730))
+PUBLISH_TTL_DAYS = int(os.environ.get("RETENTION_PUBLISH_TTL_DAYS", 180))
+ARCHIVE_DIR = os.environ.get("RETENTION_ARCHIVE_DIR", "").strip() or None
+COMPRESSION_LEVEL = 6
+# what identifies a document across the tiers: (date day, source)
+KEY_PROJECTION = {"date": 1, "source": 1, "rationale_geomagnetic": 1}
+
+
+def archive_name(collection):
+    return f"{collection.name}_archive"
+
+
+def ensure_indexes(db, name):
+    db[name].create_index([("start", 1), ("end", 1)])
+
+
+# -- chunk encoding ------------------------------------------------------
+
+def _encode(docs):
+    return zlib.compress(b"".join(bson.encode(d) for d in docs), COMPRESSION_LEVEL)
+
+
+def _chunk_docs(chunk):
+    if chunk.get("data") is not None:
+        payload = bytes(chunk["data"])
+    else:
+        with open(chunk["path"], "rb") as fh:
+            payload = fh.read()
+    return bson.decode_all(zlib.decompress(payload))
+
+
+def _key(doc):
+    return to_utc_date(doc.get("date")), infer_source(doc)
+
+
+def _day_span(first, last):
+    """Query bounds covering the whole calendar days of `first` .. `last`."""
+    return datetime.combine(to_utc_date(first), time.min), datetime.combine(to_utc_date(last), time.max)
+
+
+def _with_keys(projection):
+    """`projection` widened by the fields _key() reads (None stays None: every field)."""
+    return dict(projection, **KEY_PROJECTION) if projection else projection
+
+
+def _write_file(name, chunk_id, payload):
+    folder = os.path.join(ARCHIVE_DIR, name)
+    os.makedirs(folder, exist_ok=True)
+    path = os.path.join(folder, f"{chunk_id}.bson.zz")
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as fh:
+        fh.write(payload)
+        fh.flush()
+        os.fsync(fh.fileno())
+    os.replace(tmp, path)
+    return path
+
+
+# -- archiving -----------------------------------------------------------
+
+def cutoff(hot_days=None, now=None):
+    now = now or datetime.utcnow()
+    day = (now - timedelta(days=HOT_DAYS if hot_days is None else hot_days)).date()
+    return datetime(day.year, day.month, day.day)
+
+
+def _store_chunk(collection, chunk_id, docs, archived_at):
+    """Write (or rewrite) archive chunk `chunk_id` holding `docs`."""
+    name = archive_name(collection)
+    payload = _encode(docs)
+    dates = [d["date"] for d in docs]
+    chunk = {
+        "start": min(dates),
+        "end": max(dates),
+        "count": len(docs),
+        "codec": "bson+zlib",
+        "raw_bytes": sum(len(bson.encode(d)) for d in docs),
+        "stored_bytes": len(payload),
+        "archived_at": archived_at,
+    }
+    if ARCHIVE_DIR:
+        chunk["path"] = _write_file(name, chunk_id, payload)
+    else:
+        chunk["data"] = Binary(payload)
+    collection.database[name].replace_one({"_id": chunk_id}, chunk, upsert=True)
+
+
+def _drop_superseded(collection, chunk_id, docs):
+    """
+    Remove from the other chunks every archived copy of the (date, source)
+    keys (or _ids) in `docs`, just archived as chunk `chunk_id`: the day was
+    re-written in the hot collection after it had been archived, and only
+    the newest copy is kept. Returns the number of copies removed.
+    """
+    name = archive_name(collection)
+    keys = {_key(d) for d in docs}
+    ids = {d["_id"] for d in docs}
+    lo, hi = _day_span(min(d["date"] for d in docs), max(d["date"] for d in docs))
+    removed = 0
+    for chunk in list(collection.database[name].find({"_id": {"$ne": chunk_id}, "start": {"$lte": hi},
+                                                       "end": {"$gte": lo}})):
+        try:
+            old = _chunk_docs(chunk)
+        except (OSError, zlib.error, BSONError):
+            logger.exception("Unreadable archive chunk %s in %s", chunk["_id"], name)
+            continue
+        keep = [d for d in old if d["_id"] not in ids and _key(d) not in keys]
+        if len(keep) == len(old):
+            continue
+        removed += len(old) - len(keep)
+        if keep:
+            _store_chunk(collection, chunk["_id"], keep, chunk.get("archived_at"))
+            continue
+        collection.database[name].delete_one({"_id": chunk["_id"]})
+        if chunk.get("path"):
+            try:
+                os.remove(chunk["path"])
+            except OSError:
+                pass
+    return removed
+
+
+def archive_batch(collection, before, batch_size=1000):
+    """
+    Move up to batch_size documents with date < `before` into the archive.
+    Returns the number of documents moved (0 when nothing is left).
+    """
+    docs = list(collection.find({"date": {"$lt": before}}).sort([("date", 1), ("_id", 1)]).limit(batch_size))
+    if not docs:
+        return 0
+
+    ids = [d["_id"] for d in docs]
+    chunk_id = hashlib.sha1(b"".join(bson.encode({"_id": i}) for i in ids)).hexdigest()
+    _store_chunk(collection, chunk_id, docs, datetime.utcnow())
+    superseded = _drop_superseded(collection, chunk_id, docs)
+    if superseded:
+        logger.info("Archive: %d older cop(ies) of re-archived days removed", superseded)
+    collection.delete_many({"_id": {"$in": ids}})
+    return len(docs)
+
+
+def archive(collection, hot_days=None, batch_size=1000, max_batches=None, log=None):
+    """Archive everything older than the hot window, one bounded batch at a time."""
+    ensure_indexes(collection.database, archive_name(collection))
+    before = cutoff(hot_days)
+    moved = batches = 0
+    while max_batches is None or batches < max_batches:
+        n = archive_batch(collection, before, batch_size)
+        if not n:
+            break
+        moved += n
+        batches += 1
+        if log:
+            log(f"archived {moved} document(s) older than {before.date()} in {batches} batch(es)")
+    return moved
+
+
+# -- reading both tiers --------------------------------------------------
+
+def _merge(hot, cold, projection=None):
+    """
+    Hot documents, then the archived ones - `cold` is (chunk _id, document),
+    most recently archived chunk first - whose (date, source) is neither hot
+    nor already taken from another chunk. Documents must carry KEY_PROJECTION.
+    """
+    out = list(hot)
+    ids = {d["_id"] for d in out}
+    taken = dict.fromkeys((_key(d) for d in out))
+    for chunk_id, doc in cold:
+        key = _key(doc)
+        if doc["_id"] in ids or taken.get(key, chunk_id) != chunk_id:
+            continue
+        taken[key] = chunk_id
+        ids.add(doc["_id"])
+        out.append(doc)
+    return list(_project(out, projection))
+
+
+def read_days(collection, days, projection=None):
+    """Documents for the given calendar days from the hot collection and the archive."""
+    days = sorted({d for d in (to_utc_date(x) for x in days or []) if d})
+    if not days:
+        return []
+    keys = [k for d in days for k in date_match_values(d)]
+    hot = collection.find({"date": {"$in": keys}}, projection=_with_keys(projection))
+    wanted = set(days)
+    cold = ((c, d) for c, d in _archived_runs(collection, days) if to_utc_date(d.get("date")) in wanted)
+    return _merge(hot, cold, projection)
+
+
+def _runs(days):
+    """Sorted days as (first, last) runs of consecutive days."""
+    runs = []
+    for day in days:
+        if runs and (day - runs[-1][1]).days == 1:
+            runs[-1][1] = day
+        else:
+            runs.append([day, day])
+    return runs
+
+
+def _archived_runs(collection, days):
+    """
+    (chunk _id, document) for the archived documents of the chunks
+    overlapping any run of consecutive `days`, each chunk decompressed once
+    (most recently archived first): scattered days do not pull in every chunk
+    between the first and the last.
+    """
+    name = archive_name(collection)
+    spans = [{"start": {"$lte": datetime.combine(last, time.max)},
+              "end": {"$gte": datetime.combine(first, time.min)}} for first, last in _runs(days)]
+    for chunk in collection.database[name].find({"$or": spans}).sort([("archived_at", -1), ("_id", 1)]):
+        try:
+            docs = _chunk_docs(chunk)
+        except (OSError, zlib.error, BSONError):
+            logger.exception("Unreadable archive chunk %s in %s", chunk.get("_id"), name)
+            continue
+        for doc in docs:
+            yield chunk["_id"], doc
+
+
+def iter_range(collection, start, end, projection=None, batch_size=1000):
+    """
+    Documents with start <= date day <= end from both tiers, streamed in
+    (date, _id) order: the date-sorted hot cursor merged with iter_archived().
+    `projection` must keep `date`.
+    """
+    start, end = to_utc_date(start), to_utc_date(end)
+    lo = datetime(start.year, start.month, start.day)
+    hi = datetime(end.year, end.month, end.day) + timedelta(days=1)
+    hot = (collection.find({"date": {"$gte": lo, "$lt": hi}}, projection=projection, batch_size=batch_size)
+           .sort([("date", 1), ("_id", 1)]))
+    cold = iter_archived(collection, lo, projection, until=hi)
+    return heapq.merge(hot, cold, key=lambda d: (d["date"], str(d["_id"])))
+
+
+def read_range(collection, start, end, projection=None):
+    """Documents with start <= date day <= end from both tiers, sorted by date."""
+    return list(iter_range(collection, start, end, projection))
+
+
+def iter_all(collection, projection=None, batch_size=1000):
+    """
+    Every document of both tiers (hot first, then the archive most recently
+    archived chunk first; a (date, source) held by the hot collection or an
+    earlier chunk is skipped); used by the full rebuilds.
+    """
+    seen, taken = set(), {}
+    for doc in collection.find({}, projection=_with_keys(projection), batch_size=batch_size):
+        seen.add(doc["_id"])
+        taken[_key(doc)] = None
+        yield next(_project([doc], projection))
+    name = archive_name(collection)
+    for chunk in collection.database[name].find({}).sort([("archived_at", -1), ("_id", 1)]):
+        for doc in _chunk_docs(chunk):
+            key = _key(doc)
+            if doc["_id"] in seen or taken.get(key, chunk["_id"]) != chunk["_id"]:
+                continue
+            seen.add(doc["_id"])
+            taken[key] = chunk["_id"]
+            yield next(_project([doc], projection))
+
+
+def chunks(collection, since=None, until=None):
+    """
+    Archive chunk summaries (_id, start, end, count) in date order; with
+    `since` / `until`, only chunks ending on or after / starting before them.
+    """
+    query = {}
+    if since:
+        query["end"] = {"$gte": since}
+    if until:
+        query["start"] = {"$lt": until}
+    return list(collection.database[archive_name(collection)].find(
+        query, projection={"start": 1, "end": 1, "count": 1, "archived_at": 1}).sort([("start", 1), ("_id", 1)]))
+
+
+def _unshadowed(collection, chunk):
+    """
+    Full documents of one archive chunk that the hot collection does not
+    shadow: neither their _id (an interrupted archive run leaves a batch in
+    both tiers) nor their (date, source) (a day re-written after it was
+    archived) is hot. The hot copy wins, as in iter_all().
+    """
+    name = archive_name(collection)
+    stored = collection.database[name].find_one({"_id": chunk["_id"]})
+    if stored is None:
+        return []
+    try:
+        docs = _chunk_docs(stored)
+    except (OSError, zlib.error, BSONError):
+        logger.exception("Unreadable archive chunk %s in %s", chunk["_id"], name)
+        return []
+    lo, hi = _day_span(stored["start"], stored["end"])
+    hot = list(collection.find({"$or": [{"_id": {"$in": [d["_id"] for d in docs]}},
+                                        {"date": {"$gte": lo, "$lte": hi}}]}, projection=KEY_PROJECTION))
+    ids, keys = {d["_id"] for d in hot}, {_key(d) for d in hot}
+    return [d for d in docs if d["_id"] not in ids and _key(d) not in keys]
+
+
+def read_chunk(collection, chunk, projection=None):
+    """Documents of one archive chunk (a summary from chunks()) that are not in the hot collection as well."""
+    return list(_project(_unshadowed(collection, chunk), projection))
+
+
+def iter_archived(collection, since=None, projection=None, until=None):
+    """
+    Archived documents dated from `since` (a datetime, None = all) and
+    before `until` (None = no bound) that are not in the hot collection, in
+    (date, _id) order; a (date, source) archived more than once comes from
+    the most recently archived chunk only. Chunks are decoded in start order
+    and held on a heap only until the next chunk starts, so memory is bounded
+    by the overlap between chunks (a later run that archived backfilled
+    days), not by the archive size; every copy of a day is on the heap by the
+    time that day is due.
+    """
+    # best[key] = [rank of the chunk whose copies win, copies of it still pending]
+    pending, best, order = [], {}, count()
+
+    def due(entry):
+        current = best.get(entry[3])
+        if current is None or current[0] != entry[4]:
+            return False
+        current[1] -= 1
+        if not current[1]:
+            del best[entry[3]]
+        return True
+
+    for chunk in chunks(collection, since, until):
+        # whole days only: a later chunk can still hold another copy of its first day
+        first_day, _ = _day_span(chunk["start"], chunk["start"])
+        while pending and pending[0][0] < first_day:
+            entry = heapq.heappop(pending)
+            if due(entry):
+                yield next(_project([entry[-1]], projection))
+        rank = (chunk.get("archived_at") or datetime.min, str(chunk["_id"]))
+        for doc in _unshadowed(collection, chunk):
+            in_range = (since is None or doc["date"] >= since) and (until is None or doc["date"] < until)
+            if not in_range:
+                continue
+            key = _key(doc)
+            current = best.get(key)
+            if current is not None and current[0] > rank:
+                continue
+            if current is None or current[0] < rank:
+                best[key] = [rank, 1]
+            else:
+                current[1] += 1
+            heapq.heappush(pending, (doc["date"], str(doc["_id"]), next(order), key, rank, doc))
+    while pending:
+        entry = heapq.heappop(pending)
+        if due(entry):
+            yield next(_project([entry[-1]], projection))
+
+
+def _project(docs, projection):
+    if not projection:
+        yield from docs
+        return
+    keep = {k for k, v in projection.items() if v} | {"_id"}
+    for doc in docs:
+        yield {k: v for k, v in doc.items() if k in keep}
+
+
+def stats(collection):
+    """Tier sizes for reporting: hot document count and archive chunk totals."""
+    agg = list(collection.database[archive_name(collection)].aggregate([
+        {"$group": {"_id": None, "chunks": {"$sum": 1}, "docs": {"$sum": "$count"},
+                    "raw_bytes": {"$sum": "$raw_bytes"}, "stored_bytes": {"$sum": "$stored_bytes"}}},
+    ]))
+    cold = agg[0] if agg else {"chunks": 0, "docs": 0, "raw_bytes": 0, "stored_bytes": 0}
+    cold.pop("_id", None)
+    return {"hot_docs": collection.estimated_document_count(), "archive": cold}
@@ -0,0 +1,239 @@
+# backend/api/rollups.py
+"""
+Incrementally maintained Kp climatology rollups (daily -> monthly -> yearly).
+
+Writers call refresh_days(collection, dates) with the calendar days they
+touched; only those daily buckets, and the monthly / yearly buckets that
+contain them, are recomputed. Each step reads at most one bucket's worth of
+children (<= 31 days, <= 12 months), so the cost does not grow with history.
+
+Kept free of Django imports so standalone ml_model scripts can use it.
+"""
+
+import logging
+from datetime import datetime
+
+from pymongo import ReplaceOne, DeleteOne
+
+from . import dedupe, retention
+from .derive import G_THRESHOLDS, g_scale_of
+from .kp_codec import kp_list
+from .utils_spaceweather import to_utc_date
+
+logger = logging.getLogger(__name__)
+
+DAILY_COLLECTION = "kp_rollup_daily"
+MONTHLY_COLLECTION = "kp_rollup_monthly"
+YEARLY_COLLECTION = "kp_rollup_yearly"
+
+SLOTS = 8
+HIST_BINS = 10  # integer Kp 0..9
+# Kp 5- (4.67) and above is reported as G1 (see api.derive; classified on the thirds index)
+STORM_KP = float(G_THRESHOLDS[0])
+
+_indexes_ready = False
+
+
+def _kp_values(doc):
+    kp = kp_list(doc)
+    if kp is None:
+        kp = doc.get("predicted_kp_3hr") or doc.get("kp")
+    if not isinstance(kp, (list, tuple)):
+        kp = [kp] if kp is not None else []
+    out = []
+    for v in kp[:SLOTS]:
+        try:
+            f = float(v)
+            out.append(f if f == f else None)
+        except (TypeError, ValueError):
+            out.append(None)
+    return out + [None] * (SLOTS - len(out))
+
+
+def _preference(doc):
+    """Higher wins: the dedupe survivor order (preferred source, then latest issuance)."""
+    return dedupe.rank(doc)
+
+
+def _empty_slot():
+    return {"n": 0, "sum": 0.0, "max": None, "hist": [0] * HIST_BINS}
+
+
+def _merge_slot(acc, n, total, mx, hist):
+    acc["n"] += n
+    acc["sum"] += total
+    if mx is not None and (acc["max"] is None or mx > acc["max"]):
+        acc["max"] = mx
+    acc["hist"] = [a + b for a, b in zip(acc["hist"], hist)]
+
+
+def _finish(bucket):
+    bucket["mean"] = round(bucket["sum"] / bucket["n"], 3) if bucket["n"] else None
+    for slot in bucket["slots"]:
+        slot["mean"] = round(slot["sum"] / slot["n"], 3) if slot["n"] else None
+    return bucket
+
+
+def daily_rollup(day, doc):
+    """Daily bucket for one forecast document."""
+    kp = _kp_values(doc)
+    valid = [v for v in kp if v is not None]
+    slots = []
+    for v in kp:
+        slot = _empty_slot()
+        if v is not None:
+            hist = [0] * HIST_BINS
+            hist[min(max(int(v), 0), HIST_BINS - 1)] = 1
+            _merge_slot(slot, 1, v, v, hist)
+        slots.append(slot)
+    bucket = {
+        "_id": day.isoformat(),
+        "date": datetime(day.year, day.month, day.day),
+        "month": day.strftime("%Y-%m"),
+        "year": day.year,
+        "kp": kp,
+        "days": 1,
+        "n": len(valid),
+        "sum": float(sum(valid)),
+        "max": max(valid) if valid else None,
+        "storm_days": 1 if valid and g_scale_of(max(valid)) >= 1 else 0,
+        "slots": slots,
+        "updated_at": datetime.utcnow(),
+    }
+    return _finish(bucket)
+
+
+def _combine(bucket_id, children, extra):
+    bucket = {"_id": bucket_id, "days": 0, "n": 0, "sum": 0.0, "max": None, "storm_days": 0,
+              "slots": [_empty_slot() for _ in range(SLOTS)], "updated_at": datetime.utcnow()}
+    bucket.update(extra)
+    for child in children:
+        bucket["days"] += child.get("days", 0)
+        bucket["storm_days"] += child.get("storm_days", 0)
+        bucket["n"] += child.get("n", 0)
+        bucket["sum"] += child.get("sum", 0.0)
+        mx = child.get("max")
+        if mx is not None and (bucket["max"] is None or mx > bucket["max"]):
+            bucket["max"] = mx
+        for acc_slot, slot in zip(bucket["slots"], child.get("slots") or []):
+            _merge_slot(acc_slot, slot["n"], slot["sum"], slot["max"], slot["hist"])
+    return _finish(bucket)
+
+
+def pick_per_day(docs):
+    """One document per calendar day, chosen by _preference()."""
+    best = {}
+    for doc in docs:
+        day = to_utc_date(doc.get("date"))
+        if day is None:
+            continue
+        if day not in best or _preference(doc) > _preference(best[day]):
+            best[day] = doc
+    return best
+
+
+def _write_daily(db, days, best):
+    ops = []
+    for day in days:
+        doc = best.get(day)
+        if doc is None:
+            ops.append(DeleteOne({"_id": day.isoformat()}))
+        else:
+            ops.append(ReplaceOne({"_id": day.isoformat()}, daily_rollup(day, doc), upsert=True))
+    if ops:
+        db[DAILY_COLLECTION].bulk_write(ops, ordered=False)
+
+
+def _refresh_months(db, months):
+    ops = []
+    for month in sorted(months):
+        children = list(db[DAILY_COLLECTION].find({"month": month}, projection={"kp": 0}))
+        if children:
+            extra = {"month": month, "year": int(month[:4])}
+            ops.append(ReplaceOne({"_id": month}, _combine(month, children, extra), upsert=True))
+        else:
+            ops.append(DeleteOne({"_id": month}))
+    if ops:
+        db[MONTHLY_COLLECTION].bulk_write(ops, ordered=False)
+
+
+def _refresh_years(db, years):
+    ops = []
+    for year in sorted(years):
+        children = list(db[MONTHLY_COLLECTION].find({"year": year}))
+        if children:
+            ops.append(ReplaceOne({"_id": str(year)}, _combine(str(year), children, {"year": year}), upsert=True))
+        else:
+            ops.append(DeleteOne({"_id": str(year)}))
+    if ops:
+        db[YEARLY_COLLECTION].bulk_write(ops, ordered=False)
+
+
+def refresh_days(collection, dates):
+    """
+    Recompute rollups for the given calendar days (date/datetime/ISO strings).
+    Missing source documents remove the daily bucket. Never raises: rollups are
+    derived data and must not fail the write that triggered them.
+    """
+    days = sorted({d for d in (to_utc_date(v) for v in dates) if d is not None})
+    if not days or collection is None:
+        return 0
+    global _indexes_ready
+    try:
+        best = pick_per_day(retention.read_days(collection, days))
+        db = collection.database
+        if not _indexes_ready:
+            ensure_indexes(db)
+            _indexes_ready = True
+        _write_daily(db, days, best)
+        _refresh_months(db, {d.strftime("%Y-%m") for d in days})
+        _refresh_years(db, {d.year for d in days})
+        return len(days)
+    except Exception:
+        logger.exception("Rollup refresh failed for %d day(s)", len(days))
+        return 0
+
+
+def rebuild(collection, batch_size=1000, log=None):
+    """Regenerate every rollup from scratch by streaming the forecast collection once."""
+    db = collection.database
+    projection = {"date": 1, "kp_index": 1, "kp_packed": 1, "kp_raw": 1, "predicted_kp_3hr": 1, "kp": 1,
+                  "rationale_geomagnetic": 1, "source": 1, "created_at": 1}
+    best = pick_per_day(retention.iter_all(collection, projection=projection, batch_size=batch_size))
+
+    for name in (DAILY_COLLECTION, MONTHLY_COLLECTION, YEARLY_COLLECTION):
+        db[name].delete_many({})
+
+    days = sorted(best)
+    for i in range(0, len(days), batch_size):
+        _write_daily(db, days[i:i + batch_size], best)
+        if log:
+            log(f"daily rollups: {min(i + batch_size, len(days))}/{len(days)}")
+    _refresh_months(db, {d.strftime("%Y-%m") for d in days})
+    _refresh_years(db, {d.year for d in days})
+    ensure_indexes(db)
+    return len(days)
+
+
+def ensure_indexes(db):
+    db[DAILY_COLLECTION].create_index("month")
+    db[MONTHLY_COLLECTION].create_index("year")
+
+
+def read_stats(db, period="monthly", start=None, end=None):
+    """
+    Read pre-aggregated buckets; `start` / `end` are inclusive bucket ids (YYYY, YYYY-MM or YYYY-MM-DD).
+    Daily buckets need both bounds, so a read does not grow with history.
+    """
+    if period == "daily" and not (start and end):
+        raise ValueError("daily stats need a start and an end")
+    name = {"daily": DAILY_COLLECTION, "monthly": MONTHLY_COLLECTION, "yearly": YEARLY_COLLECTION}[period]
+    query = {}
+    if start or end:
+        query["_id"] = {}
+        if start:
+            query["_id"]["$gte"] = start
+        if end:
+            query["_id"]["$lte"] = end
+    projection = {"sum": 0, "slots.sum": 0, "updated_at": 0}
+    return list(db[name].find(query, projection=projection).sort("_id", 1))
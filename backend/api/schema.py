@@ -0,0 +1,129 @@
+# backend/api/schema.py
+"""
+Canonical storage shape for forecast documents.
+
+- `date` is a BSON Date in UTC (naive datetime, as pymongo and djongo store
+  it; midnight for day documents), never an ISO string;
+- JSON-ish fields (kp_index, solar_radiation, radio_blackout) are native
+  arrays / objects, never their string serialization;
+- `source` names the producer (noaa / seed / lstm_kp_model / ml / gfz) so readers
+  can filter on an indexed field instead of regex-matching rationale text.
+
+Every write path runs documents through canonicalize_doc(); the
+normalize_forecast_schema management command rewrites existing documents.
+canonicalize_doc() also stores the Kp-derived fields (api.derive) and, with
+KP_PACKED enabled, packs kp_index (api.kp_codec).
+Kept free of Django imports so standalone scripts can use it.
+"""
+
+import ast
+import json
+from datetime import datetime, date, timezone as dt_timezone
+
+from . import derive, kp_codec
+
+JSON_FIELDS = {
+    "kp_index": list,
+    "solar_radiation": list,
+    "radio_blackout": dict,
+}
+
+SOURCE_NOAA = "noaa"
+SOURCE_SEED = "seed"
+SOURCE_LSTM = "lstm_kp_model"
+SOURCE_ML = "ml"
+SOURCE_GFZ = "gfz"
+
+
+class SchemaError(ValueError):
+    pass
+
+
+def canonical_date(val):
+    """date / datetime / ISO string -> naive UTC datetime (or None); time of day is kept."""
+    if val is None:
+        return None
+    if isinstance(val, datetime):
+        dt = val
+    elif isinstance(val, date):
+        return datetime(val.year, val.month, val.day)
+    else:
+        s = str(val).strip()
+        if s.endswith("Z"):
+            s = s[:-1] + "+00:00"
+        try:
+            dt = datetime.fromisoformat(s)
+        except ValueError:
+            return None
+    if dt.tzinfo is not None:
+        dt = dt.astimezone(dt_timezone.utc).replace(tzinfo=None)
+    return dt.replace(microsecond=(dt.microsecond // 1000) * 1000)  # BSON dates hold milliseconds
+
+
+def canonical_json(val, fallback=None):
+    """Parse string-serialized JSON (or Python literal) values back to native types."""
+    if not isinstance(val, str):
+        return val
+    s = val.strip()
+    if not s:
+        return fallback
+    try:
+        return json.loads(s)
+    except ValueError:
+        try:
+            return ast.literal_eval(s)
+        except (ValueError, SyntaxError):
+            return fallback
+
+
+def infer_source(doc: dict) -> str:
+    """Producer of a document: explicit `source` if set, otherwise guessed from the rationale text."""
+    if doc.get("source"):
+        return doc["source"]
+    text = str(doc.get("rationale_geomagnetic") or "").lower()
+    if "noaa" in text:
+        return SOURCE_NOAA
+    if "auto-seeded" in text or "placeholder" in text:
+        return SOURCE_SEED
+    if "lstm" in text:
+        return SOURCE_LSTM
+    return SOURCE_ML
+
+
+def canonicalize_doc(doc: dict, pack=None, derived=True) -> dict:
+    """
+    Return a copy of `doc` in canonical shape; raises SchemaError for an unusable date.
+    Batch writers pass derived=False and run derive.apply() over the whole batch.
+    """
+    out = dict(doc)
+    if "date" in out:
+        d = canonical_date(out["date"])
+        if d is None:
+            raise SchemaError(f"invalid date: {out['date']!r}")
+        out["date"] = d
+    for field, kind in JSON_FIELDS.items():
+        if isinstance(out.get(field), str):
+            out[field] = canonical_json(out[field], fallback=kind())
+    out["source"] = infer_source(out)
+    if derived:
+        derive.apply([out])
+    if kp_codec.enabled() if pack is None else pack:
+        out = kp_codec.pack_doc(out)
+    return out
+
+
+def canonical_changes(doc: dict) -> dict:
+    """The $set needed to bring a stored document to canonical shape ({} if already canonical)."""
+    try:
+        fixed = canonicalize_doc(doc, pack=False, derived=False)
+    except SchemaError:
+        return {}
+    changes = {}
+    if "date" in doc and (type(doc["date"]) is not datetime or doc["date"] != fixed["date"]):
+        changes["date"] = fixed["date"]
+    for field in JSON_FIELDS:
+        if field in doc and fixed[field] is not doc[field]:
+            changes[field] = fixed[field]
+    if doc.get("source") != fixed["source"]:
+        changes["source"] = fixed["source"]
+    return changes
@@ -6,7 +6,7 @@ Now robust: starts after the last date already in Mongo (avoids overlap).
 
 import os
 import sys
-from datetime import datetime, timedelta, timezone
+from datetime import datetime, timedelta
 
 # ensure local package imports work
 BASE = os.path.dirname(os.path.abspath(__file__))
@@ -41,21 +41,27 @@ if collection is None:
 if collection is None:
     raise RuntimeError("Mongo collection not available. Set MONGO_URI or fix api/db.py")
 
+from api import content_hash, kp_codec
+from api.schema import canonical_date, canonicalize_doc
+from api.publish import key_of
+
 
 # --- Helpers ---
-def iso_midnight_utc(dt_date):
-    return datetime(dt_date.year, dt_date.month, dt_date.day, tzinfo=timezone.utc).isoformat().replace("+00:00", "Z")
+def utc_midnight(dt_date):
+    # stored as a BSON Date (see api.schema), never as an ISO string
+    return datetime(dt_date.year, dt_date.month, dt_date.day)
 
 def make_doc_for(date_obj):
     return {
-        "date": iso_midnight_utc(date_obj),
+        "date": utc_midnight(date_obj),
         "kp_index": [3.0, 3.1, 3.2, 3.3, 3.4, 3.5, 3.6, 3.7],
         "solar_radiation": [1],
         "radio_blackout": {"R1-R2": 0, "R3 or greater": 0},
         "rationale_geomagnetic": "Auto-seeded placeholder",
         "rationale_radiation": "Auto-seeded placeholder",
         "rationale_blackout": "Auto-seeded placeholder",
-        "created_at": datetime.utcnow().isoformat(),
+        "source": "seed",
+        "created_at": datetime.utcnow(),
     }
 
 def get_latest_date_in_mongo():
@@ -63,10 +69,8 @@ def get_latest_date_in_mongo():
     doc = collection.find_one(sort=[("date", -1)])
     if not doc:
         return None
-    try:
-        return datetime.fromisoformat(str(doc["date"]).replace("Z", "+00:00")).date()
-    except Exception:
-        return None
+    d = canonical_date(doc["date"])
+    return d.date() if d else None
 
 
 # --- Main seeding ---
@@ -82,20 +86,26 @@ def seed_future(n_days=3):
     created = 0
     updated = 0
 
-    for i in range(n_days):
-        target = start + timedelta(days=i)
-        iso_date = iso_midnight_utc(target)
-        doc = make_doc_for(target)
-
-        res = collection.update_one({"date": iso_date}, {"$set": doc}, upsert=True)
+    docs = [canonicalize_doc(make_doc_for(start + timedelta(days=i))) for i in range(n_days)]
+    # one $in fetch of the stored hashes; unchanged days are not rewritten
+    docs, unchanged = content_hash.split_unchanged(collection, docs)
+    for doc in docs:
+        target = doc["date"].date()
+        res = collection.update_one(key_of(doc), kp_codec.update_for(doc), upsert=True)
         if getattr(res, "upserted_id", None):
             created += 1
-            print(f"Created Mongo forecast for {iso_date}")
+            print(f"Created Mongo forecast for {target}")
         else:
             updated += 1
-            print(f"Updated Mongo forecast for {iso_date}")
+            print(f"Updated Mongo forecast for {target}")
+
+    print(f"[seed] done — created={created}, updated={updated}, unchanged={unchanged}")
 
-    print(f"[seed] done — created={created}, updated={updated}")
+    from api.rollups import refresh_days
+    from api.kp_series import sync_days
+    touched = [start + timedelta(days=i) for i in range(n_days)]
+    refresh_days(collection, touched)
+    sync_days(collection, touched)
 
 
 if __name__ == "__main__":
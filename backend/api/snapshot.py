@@ -0,0 +1,241 @@
+# backend/api/snapshot.py
+"""
+Parallel snapshot / restore of the Mongo database.
+
+A snapshot is a directory holding manifest.json plus gzip chunk files. Every
+collection is split into partitions: calendar years of `date` for
+collections that have BSON dates, plus one partition for the rest. Partitions
+are dumped by a process pool, each worker with its own MongoClient and a
+streaming cursor. A worker rotates to a new chunk every `chunk_docs`
+documents, so memory stays bounded whatever the collection size.
+
+Chunks are either Extended-JSON NDJSON (`ndjson`, greppable, type-preserving)
+or concatenated BSON (`bson`, faster). The manifest records each chunk's
+document count and sha256, and each collection's indexes.
+
+restore() verifies a chunk's checksum before loading it, loads chunks in
+parallel with unordered insert_many batches, recreates the indexes once the
+data is in, and compares the counts with the manifest.
+
+Kept free of Django imports so the pool workers stay light.
+"""
+
+import gzip
+import hashlib
+import os
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+import bson
+from bson import json_util
+from pymongo import MongoClient
+from pymongo.errors import BulkWriteError
+
+MANIFEST = "manifest.json"
+FORMATS = ("ndjson", "bson")
+INDEX_OPTIONS = ("unique", "sparse", "expireAfterSeconds", "partialFilterExpression")
+_JSON = json_util.CANONICAL_JSON_OPTIONS
+
+
+class SnapshotError(Exception):
+    pass
+
+
+def _db(uri, db_name):
+    return MongoClient(uri, serverSelectionTimeoutMS=5000)[db_name]
+
+
+def sha256_file(path, block=1 << 20):
+    h = hashlib.sha256()
+    with open(path, "rb") as fh:
+        for chunk in iter(lambda: fh.read(block), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+# -- partitions ----------------------------------------------------------
+
+def partitions(db, name):
+    """(label, query) pairs covering the collection exactly once."""
+    col = db[name]
+    dated = {"date": {"$type": "date"}}
+    first = col.find_one(dated, projection={"date": 1}, sort=[("date", 1)])
+    if first is None:
+        return [("all", {})]
+    last = col.find_one(dated, projection={"date": 1}, sort=[("date", -1)])
+    parts = [
+        (str(year), {"date": {"$gte": datetime(year, 1, 1), "$lt": datetime(year + 1, 1, 1)}})
+        for year in range(first["date"].year, last["date"].year + 1)
+    ]
+    parts.append(("undated", {"date": {"$not": {"$type": "date"}}}))
+    return parts
+
+
+# -- dump ----------------------------------------------------------------
+
+def _open_chunk(out_dir, name, label, n, fmt):
+    rel = os.path.join(name, f"{label}-{n:05d}.{fmt}.gz")
+    os.makedirs(os.path.join(out_dir, name), exist_ok=True)
+    return rel, gzip.open(os.path.join(out_dir, rel), "wb", compresslevel=6)
+
+
+def _write(fh, doc, fmt):
+    if fmt == "bson":
+        fh.write(bson.encode(doc))
+    else:
+        fh.write(json_util.dumps(doc, json_options=_JSON).encode("utf-8") + b"\n")
+
+
+def dump_partition(uri, db_name, name, label, query, out_dir, fmt="ndjson", chunk_docs=50000, batch_size=1000):
+    """Worker: stream one partition into chunk files. Returns the chunk entries for the manifest."""
+    col = _db(uri, db_name)[name]
+    chunks = []
+    fh = rel = None
+    count = 0
+
+    def close():
+        fh.close()
+        path = os.path.join(out_dir, rel)
+        chunks.append({"file": rel, "partition": label, "count": count,
+                       "bytes": os.path.getsize(path), "sha256": sha256_file(path)})
+
+    for doc in col.find(query, batch_size=batch_size):
+        if fh is None or count >= chunk_docs:
+            if fh is not None:
+                close()
+            rel, fh = _open_chunk(out_dir, name, label, len(chunks), fmt)
+            count = 0
+        _write(fh, doc, fmt)
+        count += 1
+    if fh is not None:
+        close()
+    return name, chunks
+
+
+def snapshot(uri, db_name, out_dir, collections=None, fmt="ndjson", workers=None, chunk_docs=50000, log=None):
+    """Dump `collections` (default: all) into out_dir in parallel. Returns the manifest."""
+    if fmt not in FORMATS:
+        raise SnapshotError(f"format must be one of {FORMATS}")
+    db = _db(uri, db_name)
+    names = collections or sorted(n for n in db.list_collection_names() if not n.startswith("system."))
+    os.makedirs(out_dir, exist_ok=True)
+
+    manifest = {"created_at": datetime.utcnow(), "db": db_name, "format": fmt, "collections": {}}
+    tasks = []
+    for name in names:
+        manifest["collections"][name] = {
+            "count": 0,
+            "indexes": {k: v for k, v in db[name].index_information().items() if k != "_id_"},
+            "chunks": [],
+        }
+        tasks.extend((name, label, query) for label, query in partitions(db, name))
+
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count()) as pool:
+        futures = [pool.submit(dump_partition, uri, db_name, name, label, query, out_dir, fmt, chunk_docs)
+                   for name, label, query in tasks]
+        for future in futures:
+            name, chunks = future.result()
+            entry = manifest["collections"][name]
+            entry["chunks"].extend(chunks)
+            entry["count"] += sum(c["count"] for c in chunks)
+            if log:
+                log(f"{name}: {sum(c['count'] for c in chunks)} doc(s) in {len(chunks)} chunk(s)")
+
+    with open(os.path.join(out_dir, MANIFEST), "w", encoding="utf-8") as fh:
+        fh.write(json_util.dumps(manifest, json_options=_JSON, indent=2))
+    return manifest
+
+
+# -- restore -------------------------------------------------------------
+
+def read_manifest(snapshot_dir):
+    path = os.path.join(snapshot_dir, MANIFEST)
+    if not os.path.exists(path):
+        raise SnapshotError(f"No {MANIFEST} in {snapshot_dir}")
+    with open(path, encoding="utf-8") as fh:
+        return json_util.loads(fh.read())
+
+
+def iter_chunk(path, fmt):
+    with gzip.open(path, "rb") as fh:
+        if fmt == "bson":
+            yield from bson.decode_file_iter(fh)
+        else:
+            for line in fh:
+                if line.strip():
+                    yield json_util.loads(line)
+
+
+def restore_chunk(uri, db_name, name, chunk, snapshot_dir, fmt, batch_size=1000):
+    """Worker: verify one chunk's checksum and bulk-insert it. Returns (name, inserted, duplicates)."""
+    path = os.path.join(snapshot_dir, chunk["file"])
+    if sha256_file(path) != chunk["sha256"]:
+        raise SnapshotError(f"Checksum mismatch for {chunk['file']}")
+    col = _db(uri, db_name)[name]
+    inserted = duplicates = 0
+
+    def flush(batch):
+        nonlocal inserted, duplicates
+        try:
+            inserted += len(col.insert_many(batch, ordered=False).inserted_ids)
+        except BulkWriteError as e:
+            errors = e.details.get("writeErrors", [])
+            dup = sum(1 for w in errors if w.get("code") == 11000)
+            if dup != len(errors):
+                raise
+            inserted += e.details.get("nInserted", 0)
+            duplicates += dup
+
+    batch = []
+    for doc in iter_chunk(path, fmt):
+        batch.append(doc)
+        if len(batch) >= batch_size:
+            flush(batch)
+            batch = []
+    if batch:
+        flush(batch)
+    return name, inserted, duplicates
+
+
+def restore_indexes(db, name, indexes):
+    for index_name, info in indexes.items():
+        options = {k: info[k] for k in INDEX_OPTIONS if k in info}
+        db[name].create_index([(f, int(d) if isinstance(d, float) else d) for f, d in info["key"]],
+                              name=index_name, **options)
+
+
+def restore(uri, db_name, snapshot_dir, collections=None, drop=False, workers=None, batch_size=1000, log=None):
+    """
+    Load a snapshot. With drop=True each collection is dropped first (so the
+    load runs without secondary indexes); otherwise documents whose _id
+    already exists are counted as duplicates and skipped. Returns
+    {collection: {"expected", "inserted", "duplicates", "count"}}.
+    """
+    manifest = read_manifest(snapshot_dir)
+    fmt = manifest["format"]
+    wanted = collections or list(manifest["collections"])
+    missing = [n for n in wanted if n not in manifest["collections"]]
+    if missing:
+        raise SnapshotError(f"Not in snapshot: {', '.join(missing)}")
+
+    db = _db(uri, db_name)
+    report = {}
+    for name in wanted:
+        if drop:
+            db[name].drop()
+        report[name] = {"expected": manifest["collections"][name]["count"], "inserted": 0, "duplicates": 0}
+
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count()) as pool:
+        futures = [pool.submit(restore_chunk, uri, db_name, name, chunk, snapshot_dir, fmt, batch_size)
+                   for name in wanted for chunk in manifest["collections"][name]["chunks"]]
+        for future in futures:
+            name, inserted, duplicates = future.result()
+            report[name]["inserted"] += inserted
+            report[name]["duplicates"] += duplicates
+
+    for name in wanted:
+        restore_indexes(db, name, manifest["collections"][name]["indexes"])
+        report[name]["count"] = db[name].count_documents({})
+        if log:
+            log(f"{name}: {report[name]}")
+    return report
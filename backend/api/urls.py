@@ -7,4 +7,10 @@ urlpatterns = [
     path("predictions/3day", views.predictions_3day, name="predictions_3day"),   # ✅ alias
     path("forecast/3day", views.forecast_3day, name="forecast_3day"),           # ✅ main endpoint
     path("predictions/noaa-baseline", views.noaa_baseline, name="noaa_baseline"),
+    path("forecast/batch", views.forecast_batch, name="forecast_batch"),
+    path("forecast/range", views.forecast_range, name="forecast_range"),
+    path("stats/kp", views.kp_stats, name="kp_stats"),
+    path("forecast/upload", views.forecast_upload, name="forecast_upload"),
+    path("forecast/upload/<str:job_id>", views.forecast_upload_status, name="forecast_upload_status"),
+    path("ingest/metrics", views.ingest_metrics, name="ingest_metrics"),
 ]
@@ -1,17 +1,10 @@
 # backend/api/utils_spaceweather.py
-from datetime import datetime, timedelta
+from datetime import datetime, date, timedelta, timezone as dt_timezone
 import os
 from pymongo import MongoClient
 
-# NOAA-style Kp → Ap map
-Kp_to_Ap_map = {0:0, 1:2, 2:3, 3:4, 4:6, 5:9, 6:15, 7:27, 8:48, 9:80}
-
-def kp_to_ap(kp):
-    try:
-        k = float(kp)
-        return Kp_to_Ap_map.get(int(round(k)), 0)
-    except Exception:
-        return 0
+# NOAA Kp → ap, thirds-aware (same table the write-time derivation uses)
+from .derive import kp_to_ap  # noqa: F401
 
 def ensure_space_fields(day):
     if "Ap" not in day and "Kp" in day:
@@ -20,14 +13,21 @@ def ensure_space_fields(day):
     day.setdefault("radio_blackout_pct", 35)
     return day
 
+NOAA_BASELINE_SOURCE = "NOAA_3day"
+
+
+def noaa_baseline_location():
+    """(database, collection) holding the NOAA baseline document."""
+    return os.environ.get("MONGO_DBNAME", "space_forecast_db"), os.environ.get("NOAA_COLLECTION", "noaa_baseline")
+
+
 def get_noaa_baseline():
     mongo_uri = os.environ.get("MONGO_URI", "mongodb://localhost:27017")
-    dbname = os.environ.get("MONGO_DBNAME", "space_forecast_db")
-    coll_name = os.environ.get("NOAA_COLLECTION", "noaa_baseline")
+    dbname, coll_name = noaa_baseline_location()
     try:
         client = MongoClient(mongo_uri, serverSelectionTimeoutMS=3000)
         db = client[dbname]
-        doc = db[coll_name].find_one({"source": "NOAA_3day"})
+        doc = db[coll_name].find_one({"source": NOAA_BASELINE_SOURCE})
         return doc
     except Exception:
         return None
@@ -42,3 +42,44 @@ def baseline_next_day(baseline_end):
             baseline_end = datetime.strptime(baseline_end.split("T")[0], "%Y-%m-%d")
     be = baseline_end.replace(hour=0, minute=0, second=0, microsecond=0)
     return be + timedelta(days=1)
+
+
+def to_utc_date(val):
+    """Normalize a stored `date` (BSON date, date, ISO string with/without Z) -> date or None."""
+    if val is None:
+        return None
+    if isinstance(val, datetime):
+        if val.tzinfo is not None:
+            val = val.astimezone(dt_timezone.utc)
+        return val.date()
+    if isinstance(val, date):
+        return val
+    s = str(val).strip()
+    if s.endswith("Z"):
+        s = s[:-1] + "+00:00"
+    try:
+        dt = datetime.fromisoformat(s)
+        if dt.tzinfo is not None:
+            dt = dt.astimezone(dt_timezone.utc)
+        return dt.date()
+    except Exception:
+        try:
+            return date.fromisoformat(s.split("T")[0])
+        except Exception:
+            return None
+
+
+def date_match_values(d):
+    """
+    All representations a calendar day's `date` may be stored as, for use in
+    an indexed equality / $in match (BSON date at UTC midnight, plain ISO day,
+    and the ISO midnight strings written by the seeders and predict_3day).
+    """
+    iso = d.isoformat()
+    return [
+        datetime(d.year, d.month, d.day),
+        iso,
+        f"{iso}T00:00:00Z",
+        f"{iso}T00:00:00+00:00",
+        f"{iso}T00:00:00",
+    ]
@@ -0,0 +1,292 @@
+# backend/api/validation.py
+"""
+Forecast record validation, per record and per batch.
+
+The rules (same as Forecast3Day.full_clean, which applies them through the
+field types and Forecast3Day.clean()):
+
+  date            required, a date (or a YYYY-MM-DD string);
+  kp_index        empty or a list of at most 8 slots, each empty or 0..9;
+  solar_radiation empty, a list or an object (JSONField);
+  a_index         empty or an integer in 0..2147483647 (IntegerField parsing);
+  radio_flux      empty or a number >= 0 (FloatField parsing);
+  radio_blackout  an object whose keys are "R1-R2" / "R3 or greater" and
+                  whose values are numbers >= 0;
+  source          at most 32 characters;
+  noaa_future     a NOAA baseline ("noaa" in rationale_geomagnetic) must not
+                  start after today (UTC).
+
+field_errors() checks one record and is what Forecast3Day.clean() uses.
+validate_batch() checks a whole batch with column operations (one NumPy
+array per field, a Python fallback only for columns holding strings) and
+returns one boolean mask per rule, so bulk writers skip building a model
+instance per record. scripts/check_batch_validation.py compares the two
+against full_clean on generated edge cases.
+
+Kept free of Django imports so standalone scripts can use it.
+"""
+
+import re
+from datetime import date, datetime
+
+import numpy as np
+
+KP_SLOTS = 8
+KP_MIN, KP_MAX = 0.0, 9.0
+INT_MAX = 2147483647
+SOURCE_MAX = 32
+BLACKOUT_KEYS = frozenset(("R1-R2", "R3 or greater"))
+FIELDS = ("date", "kp_index", "solar_radiation", "a_index", "radio_flux", "radio_blackout", "source",
+          "rationale_geomagnetic")
+RULES = ("date", "kp_index", "solar_radiation", "a_index", "radio_flux", "radio_blackout", "source", "noaa_future")
+
+MESSAGES = {
+    "date": "missing/invalid date",
+    "kp_index": f"kp_index must be a list of up to {KP_SLOTS} values within {KP_MIN:g}..{KP_MAX:g}",
+    "solar_radiation": "solar_radiation must be a list or an object",
+    "a_index": f"a_index must be an integer within 0..{INT_MAX}",
+    "radio_flux": "radio_flux must be a number >= 0",
+    "radio_blackout": f"radio_blackout keys must be {sorted(BLACKOUT_KEYS)} with numbers >= 0",
+    "source": f"source must be at most {SOURCE_MAX} characters",
+    "noaa_future": "NOAA baseline start date cannot be in the future.",
+}
+
+
+def _today():
+    return datetime.utcnow().date()
+
+
+_DATE_RE = re.compile(r"(\d{4})-(\d{1,2})-(\d{1,2})$")
+
+
+def _empty(value):
+    return value is None or value == ""
+
+
+def _json_empty(value):
+    # the model skips blank JSONField values: None, "", [], (), {}
+    return value is None or (isinstance(value, (str, list, tuple, dict)) and not value)
+
+
+# -- single record -------------------------------------------------------
+
+def _parse_date(value):
+    """DateField parsing: date / datetime, or a YYYY-MM-DD string; None otherwise."""
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    if not isinstance(value, str):
+        return None
+    m = _DATE_RE.match(value)
+    if not m:
+        return None
+    try:
+        return date(*map(int, m.groups()))
+    except ValueError:
+        return None
+
+
+def _kp_ok(value):
+    if _json_empty(value):
+        return True
+    if not isinstance(value, list):
+        return False
+    values = value
+    if len(values) > KP_SLOTS:
+        return False
+    for v in values:
+        if v is None:
+            continue
+        if isinstance(v, (dict, list, tuple)):
+            return False
+        try:
+            f = float(v)
+        except (TypeError, ValueError):
+            return False
+        if f == f and not KP_MIN <= f <= KP_MAX:
+            return False
+    return True
+
+
+def _a_index_ok(value):
+    if _empty(value):
+        return True
+    try:
+        n = int(value)
+    except (TypeError, ValueError, OverflowError):
+        return False
+    return 0 <= n <= INT_MAX
+
+
+def _radio_flux_ok(value):
+    if _empty(value):
+        return True
+    try:
+        f = float(value)
+    except (TypeError, ValueError):
+        return False
+    return not f < 0
+
+
+def _solar_ok(value):
+    return _json_empty(value) or isinstance(value, (list, dict))
+
+
+def _blackout_ok(value):
+    if _json_empty(value):
+        return True
+    if not isinstance(value, dict) or not set(value) <= BLACKOUT_KEYS:
+        return False
+    for v in value.values():
+        if isinstance(v, bool) or not isinstance(v, (int, float)) or v < 0:
+            return False
+    return True
+
+
+def _is_noaa(rationale):
+    return "noaa" in str(rationale or "").lower()
+
+
+def field_errors(record, today=None):
+    """{rule: message} for everything wrong with one record (empty when valid)."""
+    errors = {}
+    day = _parse_date(record.get("date"))
+    if day is None:
+        errors["date"] = MESSAGES["date"]
+    if not _kp_ok(record.get("kp_index")):
+        errors["kp_index"] = MESSAGES["kp_index"]
+    if not _solar_ok(record.get("solar_radiation")):
+        errors["solar_radiation"] = MESSAGES["solar_radiation"]
+    if not _a_index_ok(record.get("a_index")):
+        errors["a_index"] = MESSAGES["a_index"]
+    if not _radio_flux_ok(record.get("radio_flux")):
+        errors["radio_flux"] = MESSAGES["radio_flux"]
+    if not _blackout_ok(record.get("radio_blackout")):
+        errors["radio_blackout"] = MESSAGES["radio_blackout"]
+    if len(str(record.get("source") or "")) > SOURCE_MAX:
+        errors["source"] = MESSAGES["source"]
+    if day is not None and _is_noaa(record.get("rationale_geomagnetic")) and day > (today or _today()):
+        errors["noaa_future"] = MESSAGES["noaa_future"]
+    return errors
+
+
+# -- batch ---------------------------------------------------------------
+
+def _column(records, field):
+    return [r.get(field) for r in records]
+
+
+def _numbers(values):
+    """(float array, empty mask, unparseable mask); NaN where empty or unparseable."""
+    empty = np.fromiter((_empty(v) for v in values), dtype=bool, count=len(values))
+    try:
+        if any(isinstance(v, str) for v in values):
+            raise ValueError
+        out = np.array([np.nan if e else v for v, e in zip(values, empty)], dtype=float)
+        if out.ndim != 1:
+            # list values ([1] or [[1], [2]]) stack into a 2-D array instead of failing
+            raise ValueError
+        return out, empty, np.zeros(len(values), dtype=bool)
+    except (TypeError, ValueError):
+        out = np.full(len(values), np.nan)
+        bad = np.zeros(len(values), dtype=bool)
+        for i, (v, e) in enumerate(zip(values, empty)):
+            if e:
+                continue
+            try:
+                out[i] = float(v)
+            except (TypeError, ValueError):
+                bad[i] = True
+        return out, empty, bad
+
+
+def _dates(values):
+    """datetime64[D] column; NaT where DateField parsing would fail."""
+    plain = [v.date() if isinstance(v, datetime) else v if isinstance(v, date) else None for v in values]
+    arr = np.array(plain, dtype="datetime64[D]")
+    for i, v in enumerate(values):
+        if isinstance(v, str):
+            parsed = _parse_date(v)
+            if parsed is not None:
+                arr[i] = np.datetime64(parsed, "D")
+    return arr
+
+
+def _kp_mask(values):
+    """True where kp_index breaks the rule."""
+    rows = [[] if _json_empty(v) else v for v in values]
+    bad = np.fromiter((not isinstance(r, list) or len(r) > KP_SLOTS for r in rows), dtype=bool, count=len(rows))
+    if bad.any() or any(isinstance(x, (str, bool, dict, list, tuple)) for r in rows for x in r):
+        # rare shapes: fall back to the per-record rule
+        return np.fromiter((not _kp_ok(v) for v in values), dtype=bool, count=len(values))
+    # one NaN-padded (n, 8) matrix; None -> NaN
+    matrix = np.full((len(rows), KP_SLOTS), np.nan)
+    for i, r in enumerate(rows):
+        if r:
+            matrix[i, :len(r)] = [np.nan if x is None else x for x in r]
+    with np.errstate(invalid="ignore"):
+        out_of_range = ((matrix < KP_MIN) | (matrix > KP_MAX)).any(axis=1)
+    return bad | out_of_range
+
+
+def validate_batch(records, today=None):
+    """
+    Check a batch of model-shaped dicts. Returns {rule: bool array} (True =
+    the record breaks that rule) plus "invalid", the union of all rules.
+    """
+    n = len(records)
+    today = np.datetime64(today or _today(), "D")
+
+    days = _dates(_column(records, "date"))
+    masks = {"date": np.isnat(days)}
+
+    masks["kp_index"] = _kp_mask(_column(records, "kp_index"))
+    masks["solar_radiation"] = np.fromiter(
+        (not _solar_ok(v) for v in _column(records, "solar_radiation")), dtype=bool, count=n
+    )
+
+    a_values = _column(records, "a_index")
+    if any(isinstance(v, str) for v in a_values):
+        # IntegerField parses strings with int(): "3" is fine, "3.0" is not
+        masks["a_index"] = np.fromiter((not _a_index_ok(v) for v in a_values), dtype=bool, count=n)
+    else:
+        a, empty, unparseable = _numbers(a_values)
+        with np.errstate(invalid="ignore"):
+            truncated = np.trunc(a)
+            masks["a_index"] = unparseable | (~empty & ~((truncated >= 0) & (truncated <= INT_MAX)))
+
+    flux, empty, unparseable = _numbers(_column(records, "radio_flux"))
+    with np.errstate(invalid="ignore"):
+        masks["radio_flux"] = unparseable | (~empty & (flux < 0))
+
+    masks["radio_blackout"] = np.fromiter(
+        (not _blackout_ok(b) for b in _column(records, "radio_blackout")), dtype=bool, count=n
+    )
+
+    sources = np.array([str(s or "") for s in _column(records, "source")], dtype=str)
+    masks["source"] = np.char.str_len(sources) > SOURCE_MAX if n else np.zeros(0, dtype=bool)
+
+    rationale = np.char.lower(np.array([str(r or "") for r in _column(records, "rationale_geomagnetic")], dtype=str))
+    is_noaa = np.char.find(rationale, "noaa") >= 0 if n else np.zeros(0, dtype=bool)
+    masks["noaa_future"] = is_noaa & ~masks["date"] & (days > today)
+
+    invalid = np.zeros(n, dtype=bool)
+    for rule in RULES:
+        invalid |= masks[rule]
+    masks["invalid"] = invalid
+    return masks
+
+
+def batch_messages(masks):
+    """Per-record error message (None when valid), listing every broken rule."""
+    broken = np.stack([masks[r] for r in RULES], axis=1) if len(masks["invalid"]) else None
+    out = []
+    for i, bad in enumerate(masks["invalid"].tolist()):
+        if not bad:
+            out.append(None)
+            continue
+        out.append("validation error: " + "; ".join(
+            f"{rule}: {MESSAGES[rule]}" for rule, hit in zip(RULES, broken[i]) if hit
+        ))
+    return out
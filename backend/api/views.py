@@ -1,10 +1,17 @@
+import hmac
+import json
 import logging
 from datetime import datetime, date, timezone as dt_timezone, timedelta
+from itertools import chain
 from typing import List, Dict, Any, Optional
 import os
+import shutil
+import tempfile
 
-from django.http import JsonResponse
-from django.views.decorators.http import require_GET
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import JsonResponse, StreamingHttpResponse
+from django.views.decorators.http import require_GET, require_POST, require_http_methods
 from django.views.decorators.csrf import csrf_exempt
 
 from bson import ObjectId
@@ -18,9 +25,18 @@ from .utils_spaceweather import (
     get_noaa_baseline,
     baseline_next_day,
 )
+from .schema import SOURCE_NOAA
+from . import derive, kp_codec, retention
 
 logger = logging.getLogger(__name__)
 
+# upper bound on dates accepted by forecast_batch (one $in query)
+BATCH_MAX_DATES = 366
+# upper bound on the span of forecast_range (about ten years)
+RANGE_MAX_DAYS = 3660
+# upper bound on the span of daily kp_stats buckets (monthly / yearly are small enough unbounded)
+STATS_MAX_DAYS = 366
+
 try:
     from .db import collection
 except Exception:
@@ -31,15 +47,16 @@ except Exception:
 
 
 # --- helper to add CORS headers ---
-def cors_json(data, status=200):
+def cors_json(data, status=200, methods="GET, OPTIONS"):
     resp = JsonResponse(data, status=status, safe=False)
     resp["Access-Control-Allow-Origin"] = "*"  # allow all (or restrict to Vercel domain)
-    resp["Access-Control-Allow-Methods"] = "GET, OPTIONS"
-    resp["Access-Control-Allow-Headers"] = "Content-Type"
+    resp["Access-Control-Allow-Methods"] = methods
+    resp["Access-Control-Allow-Headers"] = "Content-Type, Authorization, X-Upload-Token"
     return resp
 
 
 def _serialize_doc(d: Dict[str, Any]) -> Dict[str, Any]:
+    d = kp_codec.expand_doc(d)  # packed kp_index -> plain list
     out = {}
     for k, v in d.items():
         if isinstance(v, ObjectId):
@@ -81,21 +98,20 @@ def _to_date(val) -> Optional[date]:
 def _find_latest_noaa_date() -> Optional[date]:
     """
     Backward-compatible fallback: looks for documents in the main collection
-    matching a 'noaa' rationale or otherwise returns the latest date found.
+    with source "noaa" or otherwise returns the latest date found.
     This is kept for compatibility but the preferred path is get_noaa_baseline().
     """
     if collection is None:
         return None
 
     try:
-        q = {"rationale_geomagnetic": {"$regex": "noaa", "$options": "i"}}
-        doc = collection.find_one(q, sort=[("date", -1)])
+        doc = collection.find_one({"source": SOURCE_NOAA}, sort=[("date", -1)])
         if doc:
             d = _to_date(doc.get("date"))
             if d:
                 return d
     except Exception:
-        logger.exception("Error querying for rationale_geomagnetic contains noaa")
+        logger.exception("Error querying for source noaa")
 
     try:
         doc = collection.find_one({}, sort=[("date", -1)])
@@ -192,7 +208,7 @@ def forecast_3day(request):
         elif include_noaa and not baseline_doc:
             # Attempt fallback NOAA doc fetch from collection if baseline collection not present
             try:
-                noaa_doc = collection.find_one({"rationale_geomagnetic": {"$regex": "noaa", "$options": "i"}}, sort=[("date", -1)])
+                noaa_doc = collection.find_one({"source": SOURCE_NOAA}, sort=[("date", -1)])
                 if noaa_doc:
                     resp["noaa_baseline"] = _serialize_doc(noaa_doc)
             except Exception:
@@ -205,6 +221,123 @@ def forecast_3day(request):
         return cors_json({"error": str(exc)}, status=500)
 
 
+def _enrich_forecast(doc: Dict[str, Any]) -> Dict[str, Any]:
+    """Serialize a forecast doc and add Kp (daily max), per-slot / daily Ap and dummy fields."""
+    out = _serialize_doc(doc)
+    if out.get("kp_max") is None:
+        # written before write-time derivation (see api.derive)
+        derive.apply([out])
+    if out.get("kp_max") is not None:
+        out.setdefault("Kp", out["kp_max"])
+        out.setdefault("Ap", out["ap_daily"])
+    return ensure_space_fields(out)
+
+
+@csrf_exempt
+@require_http_methods(["GET", "POST"])
+def forecast_batch(request):
+    """
+    Resolve many dates in a single indexed `$in` query.
+
+    GET  ?dates=2025-09-24,2025-09-30
+    POST {"dates": ["2025-09-24", "2025-09-30"]}
+
+    Results follow request order; each entry is {"date", "found", "forecast"}
+    with "found": false (and "error" for unparseable input) on a miss.
+    """
+    methods = "GET, POST, OPTIONS"
+    if collection is None:
+        return cors_json({"error": "mongo collection not configured"}, status=500, methods=methods)
+
+    if request.method == "POST":
+        try:
+            payload = json.loads(request.body or b"{}")
+        except ValueError:
+            return cors_json({"error": "body must be JSON"}, status=400, methods=methods)
+        raw_dates = payload.get("dates") if isinstance(payload, dict) else payload
+    else:
+        raw_dates = [d for d in request.GET.get("dates", "").split(",") if d.strip()]
+
+    if not isinstance(raw_dates, list) or not raw_dates:
+        return cors_json({"error": "provide a non-empty list of dates"}, status=400, methods=methods)
+    if len(raw_dates) > BATCH_MAX_DATES:
+        return cors_json({"error": f"at most {BATCH_MAX_DATES} dates per request"}, status=400, methods=methods)
+
+    parsed = [_to_date(d) for d in raw_dates]
+    wanted = {d for d in parsed if d is not None}
+
+    try:
+        from .rollups import pick_per_day
+
+        # hot collection + archive tier (see api.retention)
+        best = pick_per_day(retention.read_days(collection, wanted)) if wanted else {}
+    except Exception as exc:
+        logger.exception("Error in forecast_batch lookup")
+        return cors_json({"error": str(exc)}, status=500, methods=methods)
+
+    results = []
+    enriched = {}
+    for raw, d in zip(raw_dates, parsed):
+        if d is None:
+            results.append({"date": raw, "found": False, "error": "invalid date"})
+            continue
+        doc = best.get(d)
+        if doc is None:
+            results.append({"date": d.isoformat(), "found": False})
+            continue
+        if d not in enriched:
+            enriched[d] = _enrich_forecast(doc)
+        results.append({"date": d.isoformat(), "found": True, "forecast": enriched[d]})
+
+    return cors_json({"results": results, "found": sum(1 for r in results if r["found"]),
+                      "requested": len(results)}, status=200, methods=methods)
+
+
+@csrf_exempt
+@require_GET
+def forecast_range(request):
+    """
+    Every stored forecast document with start <= date <= end, hot and archived.
+
+    GET ?start=2019-01-01&end=2019-12-31[&format=ndjson]
+
+    JSON by default ({"count", "forecasts"}); format=ndjson streams one
+    document per line for exports, in date order, straight from the hot
+    cursor merged with the archive chunks (retention.iter_range): only the
+    chunks being merged are held in memory.
+    """
+    if collection is None:
+        return cors_json({"error": "mongo collection not configured"}, status=500)
+
+    start, end = _to_date(request.GET.get("start")), _to_date(request.GET.get("end"))
+    if not start or not end or end < start:
+        return cors_json({"error": "start and end (YYYY-MM-DD, start <= end) are required"}, status=400)
+    if (end - start).days + 1 > RANGE_MAX_DAYS:
+        return cors_json({"error": f"at most {RANGE_MAX_DAYS} days per request"}, status=400)
+
+    ndjson = request.GET.get("format") == "ndjson"
+    try:
+        if ndjson:
+            docs = retention.iter_range(collection, start, end)
+            # pull the first document here so a failing lookup is still a 500, not a cut stream
+            first = next(docs, None)
+            docs = chain([first] if first is not None else [], docs)
+        else:
+            docs = retention.read_range(collection, start, end)
+    except Exception as exc:
+        logger.exception("Error in forecast_range lookup")
+        return cors_json({"error": str(exc)}, status=500)
+
+    if ndjson:
+        lines = (json.dumps(_serialize_doc(d), cls=DjangoJSONEncoder) + "\n" for d in docs)
+        resp = StreamingHttpResponse(lines, content_type="application/x-ndjson")
+        resp["Content-Disposition"] = f'attachment; filename="forecasts_{start}_{end}.ndjson"'
+        resp["Access-Control-Allow-Origin"] = "*"
+        return resp
+    return cors_json({"start": start.isoformat(), "end": end.isoformat(), "count": len(docs),
+                      "forecasts": [_serialize_doc(d) for d in docs]}, status=200)
+
+
 @csrf_exempt
 @require_GET
 def predictions_3day(request):
@@ -236,3 +369,135 @@ def health(request):
     except Exception as exc:
         logger.exception("Health check: mongo ping failed")
         return cors_json({"status": "error", "mongo": "unreachable", "error": str(exc)}, status=500)
+
+
+@csrf_exempt
+@require_GET
+def kp_stats(request):
+    """
+    Kp climatology from the pre-aggregated rollups (api.rollups).
+    ?period=daily|monthly|yearly (default monthly), optional inclusive
+    ?start= / ?end= bucket ids, e.g. start=2024-01&end=2025-06. Daily stats
+    need both, as YYYY-MM-DD, at most STATS_MAX_DAYS apart.
+    """
+    if collection is None:
+        return cors_json({"error": "mongo collection not configured"}, status=500)
+
+    from . import rollups
+
+    period = request.GET.get("period", "monthly").lower()
+    if period not in ("daily", "monthly", "yearly"):
+        return cors_json({"error": "period must be daily, monthly or yearly"}, status=400)
+    start, end = request.GET.get("start") or None, request.GET.get("end") or None
+    if period == "daily":
+        first, last = _to_date(start), _to_date(end)
+        if not first or not last or last < first:
+            return cors_json({"error": "daily stats need start and end (YYYY-MM-DD, start <= end)"}, status=400)
+        if (last - first).days + 1 > STATS_MAX_DAYS:
+            return cors_json({"error": f"at most {STATS_MAX_DAYS} days of daily stats per request"}, status=400)
+        start, end = first.isoformat(), last.isoformat()
+
+    try:
+        buckets = rollups.read_stats(collection.database, period=period, start=start, end=end)
+    except Exception as exc:
+        logger.exception("Error reading kp rollups")
+        return cors_json({"error": str(exc)}, status=500)
+
+    return cors_json({"period": period, "storm_kp": rollups.STORM_KP,
+                      "buckets": [_serialize_doc(b) for b in buckets]}, status=200)
+
+
+# ---------------------------------------------------------------------
+# Bulk upload (background ingest)
+# ---------------------------------------------------------------------
+
+def _upload_allowed(request) -> bool:
+    token = getattr(settings, "INGEST_UPLOAD_TOKEN", None)
+    if not token:
+        # no token configured: only allow uploads on local/debug deployments
+        return settings.DEBUG
+    supplied = request.headers.get("X-Upload-Token") or ""
+    auth = request.headers.get("Authorization") or ""
+    if auth.lower().startswith("bearer "):
+        supplied = supplied or auth[7:].strip()
+    return hmac.compare_digest(supplied.encode(), token.encode())
+
+
+def _spool_upload(request):
+    """Copy the uploaded file (multipart `file` field or raw body) to a temp file."""
+    spool_dir = getattr(settings, "INGEST_SPOOL_DIR", None) or tempfile.gettempdir()
+    upload = request.FILES.get("file")
+    fd, path = tempfile.mkstemp(prefix="forecast-upload-", suffix=".json", dir=spool_dir)
+    with os.fdopen(fd, "wb") as out:
+        if upload is not None:
+            for chunk in upload.chunks():
+                out.write(chunk)
+            return path, upload.name
+        shutil.copyfileobj(request, out, 64 * 1024)
+    return path, ""
+
+
+@csrf_exempt
+@require_POST
+def forecast_upload(request):
+    """
+    Accept a JSON / NDJSON forecast file and ingest it in the background.
+    Responds 202 with a job id; poll forecast_upload_status for progress.
+    """
+    methods = "POST, OPTIONS"
+    if collection is None:
+        return cors_json({"error": "mongo collection not configured"}, status=500, methods=methods)
+    if not _upload_allowed(request):
+        return cors_json({"error": "upload not permitted"}, status=403, methods=methods)
+
+    from . import ingest
+
+    try:
+        path, filename = _spool_upload(request)
+    except Exception as exc:
+        logger.exception("Failed to spool forecast upload")
+        return cors_json({"error": f"could not read upload: {exc}"}, status=400, methods=methods)
+
+    if os.path.getsize(path) == 0:
+        os.remove(path)
+        return cors_json({"error": "empty upload"}, status=400, methods=methods)
+
+    job_id = ingest.submit_file(collection, path, filename=filename)
+    if job_id is None:
+        resp = cors_json({"error": "ingest queue full, retry later"}, status=503, methods=methods)
+        resp["Retry-After"] = "30"
+        return resp
+
+    return cors_json({"job_id": job_id, "status": "queued"}, status=202, methods=methods)
+
+
+@csrf_exempt
+@require_GET
+def forecast_upload_status(request, job_id):
+    if collection is None:
+        return cors_json({"error": "mongo collection not configured"}, status=500)
+
+    from . import ingest
+
+    job = ingest.get_job(collection, job_id)
+    if not job:
+        return cors_json({"error": "unknown job"}, status=404)
+    job["job_id"] = job.pop("_id")
+    return cors_json(_serialize_doc(job), status=200)
+
+
+@csrf_exempt
+@require_GET
+def ingest_metrics(request):
+    """Throughput / lag metrics stored by the drop-directory watchers (api.dropdir)."""
+    if collection is None:
+        return cors_json({"error": "mongo collection not configured"}, status=500)
+
+    from . import dropdir
+
+    try:
+        watchers = dropdir.read_metrics(collection.database)
+    except Exception as exc:
+        logger.exception("Error reading drop-dir watcher metrics")
+        return cors_json({"error": str(exc)}, status=500)
+    return cors_json({"watchers": [_serialize_doc(w) for w in watchers]}, status=200)
@@ -0,0 +1,164 @@
+# backend/forecast/admin.py
+"""
+Admin for Forecast3Day tuned for large collections behind djongo.
+
+- changelist count comes from estimated_document_count() (collection
+  metadata) instead of an exact count, and the "N total" query is disabled;
+- the year/month drill-down is a list filter whose choices come from two
+  indexed min/max lookups and which filters with a plain date range, instead
+  of Django's date_hierarchy (DISTINCT over truncated dates = full scan);
+- ordering is just "-date" (no pk tie-breaker) so Mongo can walk the date index;
+- list rows are fetched with a projection of the displayed columns only;
+- bulk actions go straight to pymongo with a single query / bulk write.
+"""
+
+from datetime import date, datetime
+
+from django.contrib import admin, messages
+from django.contrib.admin.views.main import ChangeList
+from django.core.paginator import Paginator
+from django.db import connection
+from django.utils.functional import cached_property
+from pymongo import UpdateOne
+
+from api import derive
+from api.utils_spaceweather import to_utc_date, date_match_values
+from .models import Forecast3Day
+
+LIST_FIELDS = ("id", "date", "kp_max", "g_scale", "ap_daily", "a_index", "radio_flux", "rationale_geomagnetic")
+
+
+def _mongo_collection():
+    """pymongo handle on the model's collection, via the djongo connection."""
+    connection.ensure_connection()
+    return connection.connection[Forecast3Day._meta.db_table]
+
+
+class EstimatedCountPaginator(Paginator):
+    """Uses collection metadata for the unfiltered count; exact count only when filtered."""
+
+    @cached_property
+    def count(self):
+        query = getattr(self.object_list, "query", None)
+        if query is not None and not query.where:
+            try:
+                return _mongo_collection().estimated_document_count()
+            except Exception:
+                pass
+        return super().count
+
+
+class DateHierarchyFilter(admin.SimpleListFilter):
+    """Year -> month drill-down answered from the date index."""
+
+    title = "date"
+    parameter_name = "period"
+
+    def lookups(self, request, model_admin):
+        col = _mongo_collection()
+        bounds = []
+        for direction in (1, -1):
+            doc = col.find_one({"date": {"$type": "date"}}, projection={"date": 1}, sort=[("date", direction)])
+            bounds.append(to_utc_date(doc["date"]) if doc else None)
+        first, last = bounds
+        if not first or not last:
+            return []
+
+        selected = self.value() or ""
+        if len(selected) >= 4 and selected[:4].isdigit():
+            year = int(selected[:4])
+            months = [(f"{year}-{m:02d}", date(year, m, 1).strftime("%b %Y")) for m in range(1, 13)
+                      if (year, m) >= (first.year, first.month) and (year, m) <= (last.year, last.month)]
+            return [(str(year), f"All of {year}")] + months
+        return [(str(y), str(y)) for y in range(last.year, first.year - 1, -1)]
+
+    def queryset(self, request, queryset):
+        value = self.value()
+        if not value:
+            return queryset
+        try:
+            if len(value) == 4:
+                start, end = date(int(value), 1, 1), date(int(value) + 1, 1, 1)
+            else:
+                y, m = int(value[:4]), int(value[5:7])
+                start = date(y, m, 1)
+                end = date(y + (m == 12), m % 12 + 1, 1)
+        except ValueError:
+            return queryset
+        return queryset.filter(date__gte=start, date__lt=end)
+
+
+class IndexOrderedChangeList(ChangeList):
+    def _get_deterministic_ordering(self, ordering):
+        # Django appends "-pk" for a total order; that defeats the date index.
+        return ordering
+
+
+@admin.register(Forecast3Day)
+class Forecast3DayAdmin(admin.ModelAdmin):
+    list_display = ("date", "kp_max", "g_scale", "ap_daily", "a_index", "radio_flux", "rationale_short")
+    list_filter = (DateHierarchyFilter,)
+    ordering = ("-date",)
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    list_per_page = 50
+    actions = ["rerun_enrichment", "delete_duplicate_dates"]
+
+    def get_changelist(self, request, **kwargs):
+        return IndexOrderedChangeList
+
+    def get_queryset(self, request):
+        qs = super().get_queryset(request)
+        match = getattr(request, "resolver_match", None)
+        if match and match.url_name and match.url_name.endswith("_changelist"):
+            qs = qs.only(*LIST_FIELDS)
+        return qs
+
+    def rationale_short(self, obj):
+        text = obj.rationale_geomagnetic or ""
+        return text if len(text) <= 60 else text[:57] + "..."
+
+    rationale_short.short_description = "rationale"
+
+    # -- bulk actions ---------------------------------------------------
+
+    def _selected_days(self, queryset):
+        return sorted({d for d in (to_utc_date(v) for v in queryset.values_list("date", flat=True)) if d})
+
+    def rerun_enrichment(self, request, queryset):
+        col = _mongo_collection()
+        keys = [k for d in self._selected_days(queryset) for k in date_match_values(d)]
+        docs = col.find({"date": {"$in": keys}}, projection={"kp_index": 1, "kp_packed": 1, "kp_raw": 1})
+        now = datetime.utcnow()
+        # kp_index is source data and stays as stored; only the fields derived from it are rewritten
+        ops = [UpdateOne({"_id": doc["_id"]}, {"$set": dict({k: doc[k] for k in derive.DERIVED_FIELDS}, enriched_at=now)})
+               for doc in derive.apply(docs) if doc["kp_max"] is not None]
+        if ops:
+            res = col.bulk_write(ops, ordered=False)
+            self.message_user(request, f"Re-enriched {res.modified_count} document(s).", messages.SUCCESS)
+        else:
+            self.message_user(request, "Nothing to enrich.", messages.INFO)
+
+    rerun_enrichment.short_description = "Re-run enrichment (Ap, max Kp, G-scale) on selected days"
+
+    def delete_duplicate_dates(self, request, queryset):
+        from api.dedupe import RANK_FIELDS
+        from api.rollups import pick_per_day, refresh_days
+        from api.kp_series import sync_days
+
+        col = _mongo_collection()
+        days = self._selected_days(queryset)
+        keys = [k for d in days for k in date_match_values(d)]
+        docs = list(col.find({"date": {"$in": keys}}, projection=list(RANK_FIELDS)))
+        keep = {doc["_id"] for doc in pick_per_day(docs).values()}
+        drop = [doc["_id"] for doc in docs if doc["_id"] not in keep]
+        if not drop:
+            self.message_user(request, "No duplicates among the selected days.", messages.INFO)
+            return
+        res = col.delete_many({"_id": {"$in": drop}})
+        refresh_days(col, days)
+        sync_days(col, days)
+        self.message_user(request, f"Deleted {res.deleted_count} duplicate document(s) across {len(days)} day(s).",
+                          messages.SUCCESS)
+
+    delete_duplicate_dates.short_description = "Delete duplicate documents for selected days (keep preferred)"
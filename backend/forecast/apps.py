@@ -0,0 +1,8 @@
+from django.apps import AppConfig
+
+
+class ForecastConfig(AppConfig):
+    name = "forecast"
+
+    def ready(self):
+        from . import signals  # noqa: F401
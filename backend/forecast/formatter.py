@@ -1,3 +1,13 @@
+from api import derive
+
+
+def _kp_max(forecast):
+    """Stored daily max Kp, computed from kp_index for rows saved before it existed."""
+    if forecast.kp_max is not None:
+        return forecast.kp_max
+    return derive.derive_rows([forecast.kp_index])[0]["kp_max"] or 0.0
+
+
 def generate_forecast_text(forecasts):
     """
     Generate a NOAA-style 3-day forecast string from DB objects.
@@ -28,14 +38,15 @@ def generate_forecast_text(forecasts):
                 val = forecast.kp_index[i]
             except (IndexError, TypeError):
                 val = 0.0
-            suffix = " (G1)" if val >= 4.67 else ""
+            level = int(derive.g_scale_of(val))
+            suffix = f" (G{level})" if level else ""
             row += f"{val:<6.2f}{suffix:<6}   "
         kp_table += row.rstrip() + "\n"
 
     section_a = (
         f"A. Geomagnetic Activity Forecast\n\n"
         f"The greatest expected 3 hr Kp for {date_range} is "
-        f"{max(max(f.kp_index) for f in forecasts):.2f}.\n\n"
+        f"{max(_kp_max(f) for f in forecasts):.2f}.\n\n"
         f"Kp index breakdown {date_range}\n\n"
         f"{kp_table.strip()}\n"
         f"Rationale: {forecasts[0].rationale_geomagnetic}\n"
@@ -0,0 +1,40 @@
+# backend/forecast/management/commands/archive_forecasts.py
+
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = ("Move forecast documents older than the hot window into the compressed archive tier "
+            "(api.retention); run normalize_forecast_schema first so every date is a BSON Date")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--hot-days", type=int, default=None,
+                            help="Keep this many days hot (default: RETENTION_HOT_DAYS)")
+        parser.add_argument("--batch-size", type=int, default=1000, help="Documents per archive chunk")
+        parser.add_argument("--max-batches", type=int, default=None,
+                            help="Stop after this many batches (bounded runs from cron)")
+        parser.add_argument("--stats", action="store_true", help="Only print tier sizes")
+
+    def handle(self, *args, **options):
+        from api.db import collection
+        from api import retention
+
+        if collection is None:
+            raise CommandError("Mongo collection not available (check MONGO_URI)")
+
+        if not options["stats"]:
+            moved = retention.archive(
+                collection,
+                hot_days=options["hot_days"],
+                batch_size=options["batch_size"],
+                max_batches=options["max_batches"],
+                log=lambda msg: self.stdout.write(msg),
+            )
+            self.stdout.write(self.style.SUCCESS(f"✅ Archived {moved} document(s)."))
+
+        stats = retention.stats(collection)
+        cold = stats["archive"]
+        self.stdout.write(
+            f"hot: ~{stats['hot_docs']} doc(s); archive: {cold['docs']} doc(s) in {cold['chunks']} chunk(s), "
+            f"{cold['raw_bytes']:,} -> {cold['stored_bytes']:,} bytes"
+        )
@@ -0,0 +1,62 @@
+# backend/forecast/management/commands/backfill_gfz_kp.py
+"""
+Backfill observed Kp history from local GFZ Kp/ap archive files (api.gfz_kp).
+Both the daily (Kp_ap_Ap_SN_F107_since_1932.txt) and the 3-hourly
+(Kp_ap_since_1932.txt) layouts are accepted, plain or gzipped. Incremental:
+re-runs start at the stored high-water mark, so only new days (and days that
+were preliminary) are written.
+"""
+
+import os
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = "Load observed Kp/ap history from GFZ archive text files into the forecast collection (source 'gfz')"
+
+    def add_arguments(self, parser):
+        parser.add_argument("files", nargs="+", help="GFZ archive file(s); later files win for overlapping days")
+        parser.add_argument("--batch-size", type=int, default=2000)
+        parser.add_argument("--since", help="Start day (YYYY-MM-DD) instead of the stored high-water mark")
+        parser.add_argument("--full", action="store_true", help="Reload every day in the files")
+        parser.add_argument("--dry-run", action="store_true", help="Parse and count without writing")
+
+    def handle(self, *args, **options):
+        from api.db import collection
+        from api import gfz_kp
+
+        if collection is None:
+            raise CommandError("Mongo collection not available (check MONGO_URI)")
+        missing = [f for f in options["files"] if not os.path.isfile(f)]
+        if missing:
+            raise CommandError(f"File(s) not found: {', '.join(missing)}")
+
+        start = None
+        if options["since"]:
+            try:
+                start = date.fromisoformat(options["since"])
+            except ValueError:
+                raise CommandError(f"Invalid --since date: {options['since']!r}")
+        elif options["full"]:
+            start = date.min
+
+        def progress(counts):
+            self.stdout.write(f"written={counts['written']} unchanged={counts['unchanged']} "
+                              f"invalid={counts['invalid']} of {counts['pending']}")
+
+        try:
+            counts, start = gfz_kp.backfill(collection, options["files"], batch_size=options["batch_size"],
+                                            start=start, dry_run=options["dry_run"], progress=progress)
+        except ValueError as e:
+            raise CommandError(f"Could not parse archive: {e}")
+
+        since = "the beginning" if start in (None, date.min) else start.isoformat()
+        if options["dry_run"]:
+            self.stdout.write(self.style.SUCCESS(
+                f"✅ {counts['parsed']} day(s) parsed, {counts['pending']} would be loaded from {since}"))
+            return
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ {counts['parsed']} day(s) parsed; from {since}: {counts['written']} written, "
+            f"{counts['unchanged']} unchanged, {counts['invalid']} invalid"))
@@ -0,0 +1,101 @@
+# backend/forecast/management/commands/dedupe_forecasts.py
+"""
+Remove duplicate forecast documents window by window (api.dedupe).
+
+Each date window keeps one survivor per key, (day, source) by default or the
+calendar day with --by day, and streams the removed documents to a gzip
+NDJSON backup before deleting them. Rollups and Kp series are refreshed for
+the touched days. Progress is checkpointed in `maintenance_checkpoints`:
+a re-run starts again at the last window processed, so later runs only scan
+recent data; --restart starts over.
+
+After a complete run the declared unique (date, source) index is ensured, so
+the writers' upserts cannot recreate duplicates (--no-enforce skips it).
+"""
+
+import os
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from pymongo.errors import DuplicateKeyError
+
+CHECKPOINTS = "maintenance_checkpoints"
+
+
+class Command(BaseCommand):
+    help = "Remove duplicate forecast documents in date windows with a backup (resumable)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--by", choices=("source", "day"), default="source",
+                            help="Duplicate key: (day, source) (default) or the calendar day alone")
+        parser.add_argument("--window-days", type=int, default=31)
+        parser.add_argument("--backup", default=None,
+                            help="gzip NDJSON file for removed documents (default: dedupe_backups/<timestamp>.ndjson.gz)")
+        parser.add_argument("--restart", action="store_true", help="Ignore the saved checkpoint")
+        parser.add_argument("--dry-run", action="store_true", help="Report duplicates without deleting")
+        parser.add_argument("--no-enforce", action="store_true", help="Do not ensure the unique index afterwards")
+
+    def handle(self, *args, **options):
+        from api.db import collection
+        from api import dedupe, indexes
+        from api.kp_series import sync_days
+        from api.rollups import refresh_days
+
+        if collection is None:
+            raise CommandError("Mongo collection not available (check MONGO_URI)")
+        db = collection.database
+        by, dry_run = options["by"], options["dry_run"]
+        checkpoints = db[CHECKPOINTS]
+        key = f"dedupe:{collection.name}:{by}"
+
+        first, last = dedupe.date_bounds(collection)
+        if first is None:
+            self.stdout.write(self.style.SUCCESS("✅ No dated documents; nothing to do."))
+            return
+        state = None if options["restart"] else checkpoints.find_one({"_id": key})
+        if state and state.get("window_start"):
+            first = max(first, state["window_start"])
+            self.stdout.write(f"Resuming {collection.name} from {first.date()}")
+
+        backup = None
+        if not dry_run:
+            path = options["backup"] or os.path.join(
+                "dedupe_backups", f"{collection.name}-{datetime.utcnow():%Y%m%dT%H%M%S}.ndjson.gz")
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            backup = dedupe.Backup(path)
+
+        removed = 0
+        try:
+            for lo, hi in dedupe.windows(first, last, options["window_days"]):
+                ids, days = dedupe.dedupe_window(collection, lo, hi, by=by, backup=backup, dry_run=dry_run)
+                removed += len(ids)
+                if ids:
+                    verb = "would remove" if dry_run else "removed"
+                    self.stdout.write(f"{lo.date()}..{hi.date()}: {verb} {len(ids)} across {len(days)} day(s)")
+                if not dry_run:
+                    if days:
+                        refresh_days(collection, days)
+                        sync_days(collection, days)
+                    checkpoints.update_one(
+                        {"_id": key},
+                        {"$set": {"window_start": lo, "updated_at": datetime.utcnow()}, "$inc": {"removed": len(ids)}},
+                        upsert=True,
+                    )
+        finally:
+            if backup is not None:
+                backup.close()
+
+        if dry_run:
+            self.stdout.write(self.style.SUCCESS(f"✅ {removed} duplicate(s) found (dry run)"))
+            return
+        self.stdout.write(self.style.SUCCESS(f"✅ Removed {removed} duplicate(s); backup: {backup.path}"))
+
+        if by == "source" and not options["no_enforce"]:
+            actions = [a for a in indexes.plan(db, declared={collection.name: indexes.DECLARED.get(collection.name, [])})
+                       if a.op in ("create", "rebuild") and a.spec.options.get("unique")]
+            try:
+                indexes.apply(db, actions)
+            except DuplicateKeyError as e:
+                raise CommandError(f"Unique index still blocked (documents without BSON dates?): {e}")
+            if actions:
+                self.stdout.write(self.style.SUCCESS("✅ Unique (date, source) index in place"))
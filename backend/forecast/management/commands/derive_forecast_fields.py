@@ -0,0 +1,50 @@
+# backend/forecast/management/commands/derive_forecast_fields.py
+"""
+Backfill the write-time derived fields (api.derive: ap_index, ap_daily,
+kp_max, g_scale) on existing forecast documents. Walks the collection in _id
+order with bounded batches; each batch is derived in one vectorized pass and
+written with an unordered bulk $set. Safe to interrupt and re-run.
+"""
+
+from django.core.management.base import BaseCommand, CommandError
+from pymongo import UpdateOne
+
+
+class Command(BaseCommand):
+    help = "Compute and store ap_index / ap_daily / kp_max / g_scale on existing forecast documents"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000)
+        parser.add_argument("--only-missing", action="store_true",
+                            help="Only documents without stored derived fields")
+        parser.add_argument("--dry-run", action="store_true", help="Count documents without writing")
+
+    def handle(self, *args, **options):
+        from api.db import collection
+        from api import derive
+
+        if collection is None:
+            raise CommandError("Mongo collection not available (check MONGO_URI)")
+        batch_size, dry_run = options["batch_size"], options["dry_run"]
+
+        query = {"kp_max": {"$exists": False}} if options["only_missing"] else {}
+        projection = {"kp_index": 1, "kp_packed": 1, "kp_raw": 1}
+        scanned = updated = 0
+        last_id = None
+        while True:
+            q = dict(query, _id={"$gt": last_id}) if last_id is not None else query
+            batch = list(collection.find(q, projection=projection).sort("_id", 1).limit(batch_size))
+            if not batch:
+                break
+            ops = []
+            for doc in derive.apply(batch):
+                fields = {k: doc[k] for k in derive.DERIVED_FIELDS}
+                ops.append(UpdateOne({"_id": doc["_id"]}, {"$set": fields}))
+            if not dry_run:
+                updated += collection.bulk_write(ops, ordered=False).modified_count
+            scanned += len(batch)
+            last_id = batch[-1]["_id"]
+            self.stdout.write(f"scanned={scanned} updated={updated}")
+
+        verb = "would be derived" if dry_run else f"scanned, {updated} updated"
+        self.stdout.write(self.style.SUCCESS(f"✅ {scanned} document(s) {verb}"))
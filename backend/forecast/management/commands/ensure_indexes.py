@@ -0,0 +1,37 @@
+# backend/forecast/management/commands/ensure_indexes.py
+
+from django.core.management.base import BaseCommand, CommandError
+from pymongo.errors import DuplicateKeyError
+
+
+class Command(BaseCommand):
+    help = "Report differences between the declared indexes (api.indexes) and MongoDB; --apply reconciles them"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--apply", action="store_true", help="Create / rebuild indexes (default: report only)")
+        parser.add_argument("--drop-extra", action="store_true", help="Also drop indexes that are not declared")
+
+    def handle(self, *args, **options):
+        from api.db import collection
+        from api import indexes
+
+        if collection is None:
+            raise CommandError("Mongo collection not available (check MONGO_URI)")
+        db = collection.database
+
+        actions = indexes.plan(db, drop_extra=options["drop_extra"])
+        if not actions:
+            self.stdout.write(self.style.SUCCESS("✅ Indexes match the declarations; nothing to do."))
+            return
+        for action in actions:
+            self.stdout.write(indexes.describe(action))
+
+        pending = [a for a in actions if a.op != "extra"]
+        if not options["apply"]:
+            self.stdout.write(f"{len(pending)} change(s) pending; re-run with --apply to reconcile.")
+            return
+        try:
+            indexes.apply(db, pending)
+        except DuplicateKeyError as e:
+            raise CommandError(f"Unique index blocked by duplicate documents; remove them and re-run: {e}")
+        self.stdout.write(self.style.SUCCESS(f"✅ Applied {len(pending)} index change(s)."))
@@ -0,0 +1,57 @@
+# backend/forecast/management/commands/import_noaa_text.py
+"""
+Backfill NOAA day documents from archived SWPC ":Product: 3-Day Forecast"
+text files (api.noaa_text). Directories are walked for *.txt; files are
+parsed on a process pool, each day keeps the last-issued product, and the
+newest product becomes the noaa_baseline document.
+"""
+
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = "Parse archived NOAA SWPC 3-day forecast text products and upsert them as NOAA records"
+
+    def add_arguments(self, parser):
+        parser.add_argument("paths", nargs="+", help="Product files or directories holding them")
+        parser.add_argument("--workers", type=int, default=None, help="Parser processes (default: CPU count)")
+        parser.add_argument("--batch-size", type=int, default=1000)
+        parser.add_argument("--no-baseline", action="store_true", help="Do not update the noaa_baseline document")
+        parser.add_argument("--dry-run", action="store_true", help="Parse and count without writing")
+
+    def handle(self, *args, **options):
+        from api.db import collection
+        from api import noaa_text
+        from api.utils_spaceweather import noaa_baseline_location
+
+        if collection is None:
+            raise CommandError("Mongo collection not available (check MONGO_URI)")
+        baseline = None
+        if not options["no_baseline"]:
+            db_name, coll_name = noaa_baseline_location()
+            baseline = collection.database.client[db_name][coll_name]
+
+        def progress(counts):
+            self.stdout.write(f"written={counts['written']} unchanged={counts['unchanged']} "
+                              f"superseded={counts['superseded']} invalid={counts['invalid']} of {counts['days']}")
+
+        try:
+            counts, failures = noaa_text.backfill(collection, baseline, options["paths"], workers=options["workers"],
+                                                  batch_size=options["batch_size"], dry_run=options["dry_run"],
+                                                  progress=progress)
+        except noaa_text.MissingIndexError as e:
+            raise CommandError(str(e))
+        for path, error in failures[:20]:
+            self.stderr.write(f"Skipped {path}: {error}")
+        if len(failures) > 20:
+            self.stderr.write(f"... and {len(failures) - 20} more unparsable file(s)")
+
+        summary = (f"{counts['files']} file(s), {counts['products']} product(s), {counts['failed']} unparsable, "
+                   f"{counts['days']} day(s)")
+        if options["dry_run"]:
+            self.stdout.write(self.style.SUCCESS(f"✅ {summary} (dry run, nothing written)"))
+            return
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ {summary}: {counts['written']} written, {counts['unchanged']} unchanged, "
+            f"{counts['superseded']} superseded, {counts['invalid']} invalid; "
+            f"baseline {'updated' if counts['baseline'] else 'unchanged'}"))
@@ -1,43 +1,36 @@
 # backend/forecast/management/commands/load_ml_forecast.py
 
-import json
 import os
-from django.core.management.base import BaseCommand
-from forecast.models import Forecast3Day
+from django.core.management.base import BaseCommand, CommandError
 from django.conf import settings
-from datetime import datetime
+
 
 class Command(BaseCommand):
     help = 'Load ML-predicted 3-day forecast from JSON and save to database'
 
-    def handle(self, *args, **kwargs):
-        file_path = os.path.join(settings.BASE_DIR, 'ml_model', 'forecast_3day.json')
+    def add_arguments(self, parser):
+        parser.add_argument("--file", default=os.path.join(settings.BASE_DIR, 'ml_model', 'forecast_3day.json'),
+                            help="JSON / NDJSON file (default: ml_model/forecast_3day.json)")
+        parser.add_argument("--batch-size", type=int, default=None)
+
+    def handle(self, *args, **options):
+        from api.db import collection
+        from api import ingest
 
+        file_path = options["file"]
         if not os.path.exists(file_path):
             self.stdout.write(self.style.ERROR(f"❌ File not found: {file_path}"))
             return
-
-        with open(file_path, 'r') as f:
-            data = json.load(f)
-
-        for entry in data:
-            date = datetime.strptime(entry['date'], "%Y-%m-%d").date()
-
-            # Avoid duplicates
-            if Forecast3Day.objects.filter(date=date).exists():
-                self.stdout.write(self.style.WARNING(f"⚠️ Forecast for {date} already exists. Skipping."))
-                continue
-
-            Forecast3Day.objects.create(
-                date=date,
-                kp_index=entry['kp_index'],
-                solar_radiation=entry['solar_radiation'],
-                radio_blackout=entry['radio_blackout'],
-                rationale_geomagnetic=entry['rationale_geomagnetic'],
-                rationale_radiation=entry['rationale_radiation'],
-                rationale_blackout=entry['rationale_blackout']
-            )
-
-            self.stdout.write(self.style.SUCCESS(f"✅ Saved forecast for {date}"))
-
-        self.stdout.write(self.style.SUCCESS("✅ All forecasts saved successfully."))
+        if collection is None:
+            raise CommandError("Mongo collection not available (check MONGO_URI)")
+
+        # streamed through the shared engine: existing (date, source) rows are
+        # updated in place, unchanged ones skipped by content hash
+        counts, errors = ingest.ingest_file(collection, file_path, batch_size=options["batch_size"])
+        for e in errors:
+            self.stdout.write(self.style.WARNING(f"⚠️ Record {e.get('index', '?')} ({e.get('date')}): {e['error']}"))
+
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ {counts['processed']} forecast(s): {counts['created']} created, {counts['updated']} updated, "
+            f"{counts['unchanged']} unchanged, {counts['invalid']} invalid."
+        ))
@@ -0,0 +1,88 @@
+# backend/forecast/management/commands/normalize_forecast_schema.py
+"""
+Rewrite forecast documents to the canonical shape defined in api.schema
+(BSON Date `date`, native arrays / objects for the JSON fields, and a
+`source` inferred from the rationale text for documents written before the
+field existed).
+
+Walks the collection in _id order with bounded batches and unordered bulk
+writes. Progress is checkpointed in `maintenance_checkpoints`, so an
+interrupted run resumes where it stopped; --restart starts over.
+"""
+
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from pymongo import UpdateOne
+
+CHECKPOINTS = "maintenance_checkpoints"
+
+
+class Command(BaseCommand):
+    help = "Normalize forecast documents to canonical BSON dates and native arrays (resumable)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000)
+        parser.add_argument("--collection", default=None, help="Collection to normalize (default: forecast collection)")
+        parser.add_argument("--restart", action="store_true", help="Ignore the saved checkpoint")
+        parser.add_argument("--dry-run", action="store_true", help="Count changes without writing")
+
+    def handle(self, *args, **options):
+        from api.db import collection as default_collection
+        from api.schema import JSON_FIELDS, canonical_changes
+
+        if default_collection is None:
+            raise CommandError("Mongo collection not available (check MONGO_URI)")
+        db = default_collection.database
+        col = db[options["collection"]] if options["collection"] else default_collection
+        checkpoints = db[CHECKPOINTS]
+        key = f"normalize_schema:{col.name}"
+        dry_run = options["dry_run"]
+
+        state = None if options["restart"] else checkpoints.find_one({"_id": key})
+        last_id = state.get("last_id") if state else None
+        totals = {
+            "scanned": state.get("scanned", 0) if state else 0,
+            "modified": state.get("modified", 0) if state else 0,
+            "invalid": state.get("invalid", 0) if state else 0,
+        }
+        if last_id is not None:
+            self.stdout.write(f"Resuming {col.name} after _id {last_id} ({totals['scanned']} scanned so far)")
+
+        projection = ["_id", "date", "source", "rationale_geomagnetic"] + list(JSON_FIELDS)
+        while True:
+            query = {"_id": {"$gt": last_id}} if last_id is not None else {}
+            batch = list(col.find(query, projection=projection).sort("_id", 1).limit(options["batch_size"]))
+            if not batch:
+                break
+
+            ops = []
+            for doc in batch:
+                changes = canonical_changes(doc)
+                if changes:
+                    ops.append(UpdateOne({"_id": doc["_id"]}, {"$set": changes}))
+                elif "date" in doc and not isinstance(doc["date"], datetime):
+                    totals["invalid"] += 1
+                    self.stdout.write(self.style.WARNING(f"⚠️ {doc['_id']}: unparseable date {doc['date']!r}"))
+
+            if ops and not dry_run:
+                col.bulk_write(ops, ordered=False)
+            totals["scanned"] += len(batch)
+            totals["modified"] += len(ops)
+            last_id = batch[-1]["_id"]
+
+            if not dry_run:
+                checkpoints.update_one(
+                    {"_id": key},
+                    {"$set": dict(totals, last_id=last_id, updated_at=datetime.utcnow())},
+                    upsert=True,
+                )
+            self.stdout.write(f"{col.name}: scanned={totals['scanned']} "
+                              f"{'would modify' if dry_run else 'modified'}={totals['modified']}")
+
+        if not dry_run:
+            checkpoints.update_one({"_id": key}, {"$set": {"finished_at": datetime.utcnow()}}, upsert=True)
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ {col.name}: {totals['scanned']} scanned, {totals['modified']} "
+            f"{'to rewrite' if dry_run else 'rewritten'}, {totals['invalid']} with invalid dates."
+        ))
@@ -0,0 +1,88 @@
+# backend/forecast/management/commands/pack_kp_index.py
+"""
+Convert kp_index arrays to the compact packed layout (api.kp_codec), or back
+with --unpack. Covers the forecast collection and the docs_preview copies in
+prediction_publishes. Walks each collection in _id order with bounded
+batches and unordered bulk writes, so it is safe to interrupt and re-run.
+
+collStats (data size, average document size, storage size, index sizes) is
+printed before and after so the saving can be measured on real data.
+"""
+
+from django.core.management.base import BaseCommand, CommandError
+from pymongo import UpdateOne
+
+PUBLISHES = "prediction_publishes"
+
+
+class Command(BaseCommand):
+    help = "Pack kp_index into uint8 thirds (kp_packed / kp_raw), or --unpack back to plain arrays"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000)
+        parser.add_argument("--unpack", action="store_true", help="Restore plain kp_index arrays")
+        parser.add_argument("--dry-run", action="store_true", help="Count convertible documents without writing")
+
+    def handle(self, *args, **options):
+        from api.db import collection
+        from api import kp_codec
+
+        if collection is None:
+            raise CommandError("Mongo collection not available (check MONGO_URI)")
+        db = collection.database
+        unpack, dry_run, batch_size = options["unpack"], options["dry_run"], options["batch_size"]
+
+        def convert(doc):
+            return kp_codec.expand_doc(doc) if unpack else kp_codec.pack_doc(doc)
+
+        def forecast_op(doc):
+            new = convert(doc)
+            if new is doc:
+                return None
+            fields = {k: new[k] for k in ("kp_index", "kp_packed", "kp_raw") if k in new}
+            return UpdateOne({"_id": doc["_id"]}, kp_codec.update_for(fields))
+
+        def publish_op(doc):
+            preview = doc.get("docs_preview") or []
+            converted = [convert(d) for d in preview]
+            if all(new is old for new, old in zip(converted, preview)):
+                return None
+            return UpdateOne({"_id": doc["_id"]}, {"$set": {"docs_preview": converted}})
+
+        layout = {"kp_packed": {"$ne": None}} if unpack else {"kp_index": {"$type": "array"}, "kp_packed": None}
+        targets = [
+            (collection, layout, {"kp_index": 1, "kp_packed": 1, "kp_raw": 1}, forecast_op),
+            (db[PUBLISHES], {"docs_preview.0": {"$exists": True}}, {"docs_preview": 1}, publish_op),
+        ]
+
+        for col, query, projection, make_op in targets:
+            before = self._stats(db, col.name)
+            scanned = changed = 0
+            last_id = None
+            while True:
+                q = dict(query, _id={"$gt": last_id}) if last_id is not None else query
+                batch = list(col.find(q, projection=projection).sort("_id", 1).limit(batch_size))
+                if not batch:
+                    break
+                ops = [op for op in (make_op(doc) for doc in batch) if op is not None]
+                if ops and not dry_run:
+                    col.bulk_write(ops, ordered=False)
+                scanned += len(batch)
+                changed += len(ops)
+                last_id = batch[-1]["_id"]
+                self.stdout.write(f"{col.name}: scanned={scanned} converted={changed}")
+
+            after = self._stats(db, col.name)
+            self.stdout.write(self.style.SUCCESS(
+                f"✅ {col.name}: {changed}/{scanned} document(s) {'convertible' if dry_run else 'converted'}"
+            ))
+            if before and after:
+                for key in ("count", "size", "avgObjSize", "storageSize", "totalIndexSize"):
+                    self.stdout.write(f"   {key:<15}{before.get(key, 0):>14,} -> {after.get(key, 0):>14,}")
+
+    @staticmethod
+    def _stats(db, name):
+        try:
+            return db.command("collStats", name)
+        except Exception:
+            return None
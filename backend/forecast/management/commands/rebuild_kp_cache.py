@@ -0,0 +1,33 @@
+# backend/forecast/management/commands/rebuild_kp_cache.py
+
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = "Rebuild the local memory-mapped Kp history cache (ml_model.kp_cache) from forecast_forecast3day"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--cache-dir", default=os.environ.get("KP_CACHE_DIR"),
+                            help="Cache root (default: KP_CACHE_DIR)")
+        parser.add_argument("--batch-size", type=int, default=5000, help="Cursor batch size (documents)")
+
+    def handle(self, *args, **options):
+        from api.db import collection
+
+        if collection is None:
+            raise CommandError("Mongo collection not available (check MONGO_URI)")
+        if not options["cache_dir"]:
+            raise CommandError("Set KP_CACHE_DIR or pass --cache-dir")
+        try:
+            from ml_model import kp_cache
+        except ImportError as e:
+            raise CommandError(f"Kp cache needs the ml_model dependencies ({e})")
+
+        cache = kp_cache.rebuild(collection, root=options["cache_dir"], batch_size=options["batch_size"])
+        manifest = cache.manifest
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ Rebuilt Kp cache {cache.path}: {len(cache)} slot(s), {len(manifest['months'])} month(s), "
+            f"up to {manifest['hwm']} (generation {manifest['generation']})"
+        ))
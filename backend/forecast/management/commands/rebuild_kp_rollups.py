@@ -0,0 +1,24 @@
+# backend/forecast/management/commands/rebuild_kp_rollups.py
+
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = "Regenerate the daily/monthly/yearly Kp rollup collections from forecast_forecast3day"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000, help="Cursor / bulk write batch size")
+
+    def handle(self, *args, **options):
+        from api.db import collection
+        from api import rollups
+
+        if collection is None:
+            raise CommandError("Mongo collection not available (check MONGO_URI)")
+
+        days = rollups.rebuild(
+            collection,
+            batch_size=options["batch_size"],
+            log=lambda msg: self.stdout.write(msg),
+        )
+        self.stdout.write(self.style.SUCCESS(f"✅ Rebuilt Kp rollups for {days} day(s)."))
@@ -0,0 +1,26 @@
+# backend/forecast/management/commands/rebuild_kp_series.py
+
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = "Regenerate the monthly Kp series buckets (kp_series_buckets) from forecast_forecast3day"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000, help="Cursor / bulk write batch size (days)")
+
+    def handle(self, *args, **options):
+        from api.db import collection
+        from api import kp_series
+
+        if collection is None:
+            raise CommandError("Mongo collection not available (check MONGO_URI)")
+
+        values = kp_series.rebuild(
+            collection,
+            batch_size=options["batch_size"],
+            log=lambda msg: self.stdout.write(msg),
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ Rebuilt Kp series buckets ({values} slot(s) written). KP_SERIES_MODE={kp_series.mode()}"
+        ))
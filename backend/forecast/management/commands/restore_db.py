@@ -0,0 +1,48 @@
+# backend/forecast/management/commands/restore_db.py
+"""
+Restore a snapshot written by `manage.py snapshot_db` (api.snapshot). Chunks
+are checksum-verified and bulk-inserted in parallel; indexes are recreated
+after the data is loaded and the resulting counts are checked against the
+manifest.
+"""
+
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = "Restore a snapshot directory: verify checksums, parallel unordered inserts, then rebuild indexes"
+
+    def add_arguments(self, parser):
+        parser.add_argument("snapshot_dir")
+        parser.add_argument("--collections", nargs="*", default=None, help="Collections to restore (default: all)")
+        parser.add_argument("--drop", action="store_true", help="Drop each collection before loading it")
+        parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: CPU count)")
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        from api.db import collection, MONGO_URI, DB_NAME
+        from api import snapshot
+
+        if collection is None:
+            raise CommandError("Mongo collection not available (check MONGO_URI)")
+        try:
+            report = snapshot.restore(
+                MONGO_URI, DB_NAME, options["snapshot_dir"],
+                collections=options["collections"],
+                drop=options["drop"],
+                workers=options["workers"],
+                batch_size=options["batch_size"],
+                log=self.stdout.write,
+            )
+        except snapshot.SnapshotError as e:
+            raise CommandError(str(e))
+
+        short = {n: r for n, r in report.items() if r["inserted"] + r["duplicates"] != r["expected"]}
+        for name, r in short.items():
+            self.stdout.write(self.style.WARNING(
+                f"⚠️ {name}: expected {r['expected']}, inserted {r['inserted']} + {r['duplicates']} existing"
+            ))
+        if short:
+            raise CommandError(f"{len(short)} collection(s) did not restore completely")
+        total = sum(r["inserted"] for r in report.values())
+        self.stdout.write(self.style.SUCCESS(f"✅ Restored {total} document(s) into {len(report)} collection(s)"))
@@ -0,0 +1,45 @@
+# backend/forecast/management/commands/snapshot_db.py
+"""
+Snapshot the Mongo database into a directory of compressed chunks plus a
+manifest (api.snapshot). Collections and their date partitions are dumped in
+parallel by a process pool; restore with `manage.py restore_db <dir>`.
+"""
+
+import os
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = "Dump collections to gzip NDJSON / BSON chunks in parallel, with checksums and indexes in a manifest"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--out", default=None, help="Snapshot directory (default: snapshots/<timestamp>)")
+        parser.add_argument("--collections", nargs="*", default=None, help="Collections to dump (default: all)")
+        parser.add_argument("--format", choices=("ndjson", "bson"), default="ndjson")
+        parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: CPU count)")
+        parser.add_argument("--chunk-docs", type=int, default=50000, help="Documents per chunk file")
+
+    def handle(self, *args, **options):
+        from api.db import collection, MONGO_URI, DB_NAME
+        from api import snapshot
+
+        if collection is None:
+            raise CommandError("Mongo collection not available (check MONGO_URI)")
+        out = options["out"] or os.path.join("snapshots", f"{DB_NAME}-{datetime.utcnow():%Y%m%dT%H%M%S}")
+        if os.path.exists(os.path.join(out, snapshot.MANIFEST)):
+            raise CommandError(f"{out} already holds a snapshot")
+
+        manifest = snapshot.snapshot(
+            MONGO_URI, DB_NAME, out,
+            collections=options["collections"],
+            fmt=options["format"],
+            workers=options["workers"],
+            chunk_docs=options["chunk_docs"],
+            log=self.stdout.write,
+        )
+        total = sum(c["count"] for c in manifest["collections"].values())
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ {total} document(s) from {len(manifest['collections'])} collection(s) written to {out}"
+        ))
@@ -0,0 +1,63 @@
+# backend/forecast/management/commands/watch_drop_dir.py
+"""
+Long-running ingest service for a drop directory (api.dropdir): new or
+changed payload files are ingested through the bulk engine on a bounded
+worker pool, checkpointed in ingest_files and moved to the archive
+directory. Metrics: GET /api/ingest/metrics.
+"""
+
+import os
+import signal
+import threading
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = "Watch a drop directory and ingest new or changed forecast payload files"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--drop-dir", default=settings.INGEST_DROP_DIR,
+                            help="Directory to watch (default: INGEST_DROP_DIR)")
+        parser.add_argument("--archive-dir", default=settings.INGEST_ARCHIVE_DIR,
+                            help="Where processed files are moved (default: INGEST_ARCHIVE_DIR; unset = leave in place)")
+        parser.add_argument("--workers", type=int, default=settings.INGEST_DROP_WORKERS)
+        parser.add_argument("--interval", type=float, default=settings.INGEST_WATCH_INTERVAL,
+                            help="Seconds between polls")
+        parser.add_argument("--batch-size", type=int, default=None)
+        parser.add_argument("--max-attempts", type=int, default=settings.INGEST_DROP_MAX_ATTEMPTS,
+                            help="Tries per failed file before it waits for a change")
+        parser.add_argument("--retry-seconds", type=float, default=settings.INGEST_DROP_RETRY_SECONDS,
+                            help="Delay before the first retry of a failed file (doubles per attempt)")
+        parser.add_argument("--once", action="store_true", help="Process what is there now and exit")
+
+    def handle(self, *args, **options):
+        from api.db import collection
+        from api.dropdir import Watcher
+
+        if collection is None:
+            raise CommandError("Mongo collection not available (check MONGO_URI)")
+        drop_dir = options["drop_dir"]
+        if not drop_dir:
+            raise CommandError("No drop directory (pass --drop-dir or set INGEST_DROP_DIR)")
+        if not os.path.isdir(drop_dir):
+            raise CommandError(f"Drop directory not found: {drop_dir}")
+
+        watcher = Watcher(collection, drop_dir, archive_dir=options["archive_dir"], workers=options["workers"],
+                          interval=options["interval"], batch_size=options["batch_size"],
+                          max_attempts=options["max_attempts"], retry_base=options["retry_seconds"])
+        if options["once"]:
+            watcher.drain()
+            totals = watcher.metrics.snapshot()["totals"]
+            self.stdout.write(self.style.SUCCESS(
+                f"✅ {totals['files']} file(s) ingested ({totals['records']} record(s)), "
+                f"{totals['duplicates']} duplicate(s), {totals['failed']} failed"))
+            return
+
+        stop = threading.Event()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            signal.signal(sig, lambda *_: stop.set())
+        self.stdout.write(f"Watching {drop_dir} (Ctrl+C to stop)")
+        watcher.run(stop)
+        self.stdout.write(self.style.SUCCESS("✅ Watcher stopped"))
@@ -0,0 +1,22 @@
+from django.db import migrations, models
+import djongo.models.fields
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('forecast', '0002_forecast3day_source'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='forecast3day',
+            name='kp_packed',
+            field=models.BinaryField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='forecast3day',
+            name='kp_raw',
+            field=djongo.models.fields.JSONField(blank=True, default=list, editable=False),
+        ),
+    ]
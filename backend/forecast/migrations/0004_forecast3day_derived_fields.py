@@ -0,0 +1,32 @@
+from django.db import migrations, models
+import djongo.models.fields
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('forecast', '0003_forecast3day_kp_packed'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='forecast3day',
+            name='ap_index',
+            field=djongo.models.fields.JSONField(blank=True, default=list, editable=False),
+        ),
+        migrations.AddField(
+            model_name='forecast3day',
+            name='ap_daily',
+            field=models.IntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='forecast3day',
+            name='kp_max',
+            field=models.FloatField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='forecast3day',
+            name='g_scale',
+            field=models.IntegerField(blank=True, editable=False, null=True),
+        ),
+    ]
@@ -0,0 +1,16 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('forecast', '0004_forecast3day_derived_fields'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='forecast3day',
+            name='content_hash',
+            field=models.CharField(blank=True, default='', editable=False, max_length=40),
+        ),
+    ]
@@ -1,6 +1,9 @@
 from djongo import models
-from django.core.exceptions import ValidationError
-from datetime import datetime
+from django.core.exceptions import NON_FIELD_ERRORS, ValidationError
+
+from api import content_hash, derive, kp_codec, validation
+from api.schema import JSON_FIELDS, canonical_date, canonical_json, infer_source
+from api.utils_spaceweather import to_utc_date
 
 class Forecast3Day(models.Model):
     """
@@ -16,6 +19,15 @@ class Forecast3Day(models.Model):
     # keep Kp as either single int or list depending on your use;
     # using JSONField to allow both (list of 3 values or single int)
     kp_index = models.JSONField(default=list, blank=True)
+    # compact layout (api.kp_codec); when set it takes precedence over kp_index
+    kp_packed = models.BinaryField(null=True, blank=True, editable=False)
+    kp_raw = models.JSONField(default=list, blank=True, editable=False)
+
+    # derived from kp_index on every save (api.derive)
+    ap_index = models.JSONField(default=list, blank=True, editable=False)
+    ap_daily = models.IntegerField(null=True, blank=True, editable=False)
+    kp_max = models.FloatField(null=True, blank=True, editable=False)
+    g_scale = models.IntegerField(null=True, blank=True, editable=False)
 
     # additional arrays / structured fields
     solar_radiation = models.JSONField(default=list, blank=True)
@@ -26,16 +38,85 @@ class Forecast3Day(models.Model):
     rationale_radiation = models.TextField(blank=True, default="")
     rationale_blackout = models.TextField(blank=True, default="")
 
+    # producer of the document (noaa / seed / lstm_kp_model / ml / gfz), indexed
+    source = models.CharField(max_length=32, blank=True, default="")
+
+    # hash of the content fields (api.content_hash); writers skip unchanged rows
+    content_hash = models.CharField(max_length=40, blank=True, default="", editable=False)
+
     class Meta:
         db_table = "forecast_forecast3day"  # keep existing collection name
 
     def __str__(self):
         return f"Forecast for {self.date}"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        packed = instance.__dict__.get("kp_packed")
+        if packed:
+            instance.kp_index = kp_codec.kp_list({"kp_packed": packed, "kp_raw": instance.__dict__.get("kp_raw")})
+        return instance
+
+    @classmethod
+    def stored_hashes(cls, days):
+        """{(date, source): content_hash} of the stored rows for `days`, in one query."""
+        rows = cls.objects.filter(date__in=list(days)).values_list("date", "source", "content_hash")
+        return {(to_utc_date(d), s): h for d, s, h in rows}
+
+    def normalize(self):
+        """
+        Bring the instance to the shape save() stores: canonical fields, source,
+        derived fields and content_hash. Lets callers compare a pending row's
+        hash with stored_hashes() before deciding to save.
+        """
+        # keep the stored shape canonical (BSON Date, native arrays) even for
+        # callers that pass ISO strings or JSON-serialized fields
+        if isinstance(self.date, str):
+            d = canonical_date(self.date)
+            if d is None:
+                raise ValidationError(f"Invalid date: {self.date!r}")
+            self.date = d.date()
+        for field, kind in JSON_FIELDS.items():
+            val = getattr(self, field)
+            if isinstance(val, str):
+                setattr(self, field, canonical_json(val, fallback=kind()))
+        if not self.source:
+            self.source = infer_source({"rationale_geomagnetic": self.rationale_geomagnetic})
+
+        fields = derive.derive_rows([self.kp_index])[0]
+        for name in derive.DERIVED_FIELDS:
+            setattr(self, name, fields[name])
+        self.content_hash = content_hash.compute(
+            {name: getattr(self, name) for name in content_hash.CONTENT_FIELDS if hasattr(self, name)}
+        )
+        return self
+
+    def save(self, *args, **kwargs):
+        self.normalize()
+
+        # re-pack when the row was packed (or packing is on); keep kp_index usable in memory
+        kp = self.kp_index
+        packed = kp_codec.encode(kp) if (self.kp_packed or kp_codec.enabled()) else None
+        if packed:
+            self.kp_packed, self.kp_raw, self.kp_index = bytes(packed["kp_packed"]), packed["kp_raw"], []
+        else:
+            self.kp_packed, self.kp_raw = None, []
+        try:
+            super().save(*args, **kwargs)
+        finally:
+            self.kp_index = kp
+
     def clean(self):
         """
-        Prevent NOAA baselines from being saved with a future start date.
+        Value rules the field types do not cover (api.validation): Kp slots in
+        0..9, non-negative a_index / radio_flux, radio_blackout shape, and no
+        NOAA baseline with a future start date.
         """
-        if self.rationale_geomagnetic and "noaa" in self.rationale_geomagnetic.lower():
-            if self.date and self.date > datetime.utcnow().date():
-                raise ValidationError("NOAA baseline start date cannot be in the future.")
+        errors = validation.field_errors({name: getattr(self, name) for name in validation.FIELDS})
+        # the DateField reports a bad date itself
+        errors.pop("date", None)
+        if "noaa_future" in errors:
+            errors[NON_FIELD_ERRORS] = errors.pop("noaa_future")
+        if errors:
+            raise ValidationError(errors)
@@ -1,8 +1,7 @@
 # backend/forecast/serializers.py
 from rest_framework import serializers
 from .models import Forecast3Day
-import json
-import ast
+from api.schema import canonical_json
 
 class Forecast3DaySerializer(serializers.ModelSerializer):
     kp_index = serializers.SerializerMethodField()
@@ -11,23 +10,12 @@ class Forecast3DaySerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Forecast3Day
-        fields = '__all__'
+        exclude = ("kp_packed", "kp_raw")  # expanded into kp_index by the model
 
     def _safe_load(self, val, fallback):
-        if val is None:
-            return fallback
-        if isinstance(val, (list, dict)):
-            return val
-        if isinstance(val, str):
-            # try JSON first, then ast literal_eval, else fallback
-            try:
-                return json.loads(val)
-            except Exception:
-                try:
-                    return ast.literal_eval(val)
-                except Exception:
-                    return fallback
-        return fallback
+        # legacy documents may still hold string-serialized values
+        val = canonical_json(val, fallback)
+        return val if isinstance(val, (list, dict)) else fallback
 
     def get_kp_index(self, obj):
         return self._safe_load(obj.kp_index, [])
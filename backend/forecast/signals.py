@@ -0,0 +1,24 @@
+# backend/forecast/signals.py
+import logging
+
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from .models import Forecast3Day
+
+logger = logging.getLogger(__name__)
+
+
+@receiver(post_save, sender=Forecast3Day)
+@receiver(post_delete, sender=Forecast3Day)
+def refresh_kp_rollups(sender, instance, **kwargs):
+    """Keep the Kp rollups and series buckets in step with ORM writes (see api.rollups, api.kp_series)."""
+    try:
+        from api.db import collection
+        from api.rollups import refresh_days
+        from api.kp_series import sync_days
+    except Exception:
+        logger.exception("Rollup refresh skipped: mongo helpers unavailable")
+        return
+    refresh_days(collection, [instance.date])
+    sync_days(collection, [instance.date])
@@ -1,5 +1,5 @@
 import json
-from .models import Forecast3Day
+
 
 def load_forecast_json(filepath):
     """
@@ -11,17 +11,14 @@ def load_forecast_json(filepath):
 def save_forecast_data(data):
     """
     Save a list of 3-day forecast entries to the database.
-    This expects a list of dicts structured like the LSTM output.
+    This expects a list of dicts structured like the LSTM output; they go
+    through the shared ingest engine (api.ingest) in bulk.
+    Returns the engine counts (processed / created / updated / unchanged / invalid).
     """
-    for entry in data:
-        Forecast3Day.objects.update_or_create(
-            date=entry['date'],
-            defaults={
-                'kp_index': entry['kp_index'],
-                'solar_radiation': entry['solar_radiation'],
-                'radio_blackout': entry['radio_blackout'],
-                'rationale_geomagnetic': entry['rationale_geomagnetic'],
-                'rationale_radiation': entry['rationale_radiation'],
-                'rationale_blackout': entry['rationale_blackout'],
-            }
-        )
+    from api.db import collection
+    from api import ingest
+
+    if collection is None:
+        raise RuntimeError("Mongo collection not available (check MONGO_URI)")
+    counts, _errors = ingest.ingest_records(collection, data)
+    return counts
@@ -5,15 +5,22 @@ from datetime import date, datetime, timedelta, timezone as dt_timezone
 from django.utils import timezone as dj_timezone
 import logging
 
+from api import dedupe, derive
+from api.schema import SOURCE_GFZ
+
 from .models import Forecast3Day
 from .serializers import Forecast3DaySerializer
 
 logger = logging.getLogger(__name__)
 
+FORECAST_DAYS = 3
+
 
 class Forecast3DayViewSet(viewsets.ViewSet):
     """
-    Return only the next 3 future days, normalized. Robust to datetimes/strings/timezones.
+    Return only the next 3 future forecast days, normalized, one row per day
+    (the dedupe.rank survivor). Observed GFZ rows are left out. Robust to
+    datetimes/strings/timezones.
     """
 
     def list(self, request):
@@ -25,10 +32,8 @@ class Forecast3DayViewSet(viewsets.ViewSet):
             now_utc = now
         today_utc = now_utc.date()
 
-        # Fetch all items ordered by date (DB-side ordering). We'll filter in-Python.
-        qs = Forecast3Day.objects.all().order_by("date")
-
-        logger.debug("Forecast3Day: total records fetched=%d", qs.count())
+        # forecast rows only: the observed GFZ history (decades of daily rows) never belongs in this listing
+        forecasts = Forecast3Day.objects.exclude(source=SOURCE_GFZ)
 
         def to_date_obj(val):
             """Normalize model `date` field to a date object or None."""
@@ -52,43 +57,22 @@ class Forecast3DayViewSet(viewsets.ViewSet):
                 except Exception:
                     return None
 
-        cleaned = []
-        seen = set()
-
-        # iterate ordered queryset and pick dates strictly after today_utc
-        for f in qs:
-            d_obj = to_date_obj(f.date)
-            if not d_obj:
-                continue
+        def kp_and_ap(f):
+            """Daily max Kp and derived daily Ap: stored fields, computed for rows saved before them."""
+            kp, ap = f.kp_max, f.ap_daily
+            if kp is None or ap is None:
+                fields = derive.derive_rows([f.kp_index])[0]
+                kp = fields["kp_max"] if kp is None else kp
+                ap = fields["ap_daily"] if ap is None else ap
+            return kp, ap
 
-            # only future dates (strictly after today)
-            if not (d_obj > today_utc):
-                continue
+        def preference(f):
+            """dedupe.rank of the row (preferred source first); the later insert wins a tie."""
+            doc = {"source": f.source, "rationale_geomagnetic": f.rationale_geomagnetic}
+            return dedupe.rank(doc), f.pk or 0
 
-            sdate = d_obj.isoformat()
-            if sdate in seen:
-                continue
-            seen.add(sdate)
-
-            # Normalize kp_index (list -> max, numeric -> itself)
-            kp = None
-            try:
-                if isinstance(f.kp_index, list) and f.kp_index:
-                    kp_candidates = []
-                    for x in f.kp_index:
-                        try:
-                            kp_candidates.append(float(x))
-                        except Exception:
-                            pass
-                    if kp_candidates:
-                        kp = max(kp_candidates)
-                elif isinstance(f.kp_index, (int, float)):
-                    kp = float(f.kp_index)
-            except Exception:
-                kp = None
-
-            # ap index
-            ap = getattr(f, "a_index", None)
+        def to_row(d_obj, f):
+            kp, ap = kp_and_ap(f)
 
             # solar_radiation normalization
             solar_val = None
@@ -104,77 +88,35 @@ class Forecast3DayViewSet(viewsets.ViewSet):
 
             blackout = f.radio_blackout or {}
 
-            cleaned.append(
-                {
-                    "date": sdate,
-                    "kp_index": kp,
-                    "a_index": ap,
-                    "solar_radiation": solar_val,
-                    "radio_blackout": blackout,
-                }
-            )
-
-            if len(cleaned) >= 3:
-                break
-
-        # Fallback: if we didn't find 3 future items, include earliest available (keeps behavior safe)
-        if len(cleaned) < 3:
-            logger.debug("Not enough future items; falling back to earliest available records")
-            seen = set()
-            cleaned = []
-            for f in Forecast3Day.objects.all().order_by("date"):
+            return {
+                "date": d_obj.isoformat(),
+                "kp_index": kp,
+                "a_index": getattr(f, "a_index", None),
+                "ap_daily": ap,
+                "solar_radiation": solar_val,
+                "radio_blackout": blackout,
+            }
+
+        def collect(qs, limit):
+            """Up to `limit` days of `qs` (ordered by date), one row per day: the dedupe.rank survivor."""
+            best = {}
+            for f in qs:
                 d_obj = to_date_obj(f.date)
                 if not d_obj:
                     continue
-                sdate = d_obj.isoformat()
-                if sdate in seen:
-                    continue
-                seen.add(sdate)
-
-                # Normalize kp_index (list -> max, numeric -> itself)
-                kp = None
-                try:
-                    if isinstance(f.kp_index, list) and f.kp_index:
-                        kp_candidates = []
-                        for x in f.kp_index:
-                            try:
-                                kp_candidates.append(float(x))
-                            except Exception:
-                                pass
-                        if kp_candidates:
-                            kp = max(kp_candidates)
-                    elif isinstance(f.kp_index, (int, float)):
-                        kp = float(f.kp_index)
-                except Exception:
-                    kp = None
-
-                ap = getattr(f, "a_index", None)
-
-                solar_val = None
-                try:
-                    if isinstance(f.solar_radiation, dict) and f.solar_radiation:
-                        solar_val = list(f.solar_radiation.values())[0]
-                    elif isinstance(f.solar_radiation, list) and f.solar_radiation:
-                        solar_val = f.solar_radiation[0]
-                    else:
-                        solar_val = getattr(f, "radio_flux", None)
-                except Exception:
-                    solar_val = None
-
-                blackout = f.radio_blackout or {}
+                if d_obj not in best and len(best) >= limit:
+                    break
+                if d_obj not in best or preference(f) > preference(best[d_obj]):
+                    best[d_obj] = f
+            return [to_row(d_obj, f) for d_obj, f in best.items()]
 
-                cleaned.append(
-                    {
-                        "date": sdate,
-                        "kp_index": kp,
-                        "a_index": ap,
-                        "solar_radiation": solar_val,
-                        "radio_blackout": blackout,
-                    }
-                )
+        # only future dates (strictly after today), read upwards from the date index
+        cleaned = collect(forecasts.filter(date__gt=today_utc).order_by("date"), FORECAST_DAYS)
 
-                if len(cleaned) >= 3:
-                    break
+        # Fallback: if we didn't find 3 future items, include earliest available (keeps behavior safe)
+        if len(cleaned) < FORECAST_DAYS:
+            logger.debug("Not enough future items; falling back to earliest available records")
+            cleaned = collect(forecasts.order_by("date"), FORECAST_DAYS)
 
         logger.debug("Returning cleaned dates: %s", [c["date"] for c in cleaned])
         return Response({"data": cleaned})
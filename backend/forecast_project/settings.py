@@ -3,6 +3,8 @@ import json
 from pathlib import Path
 from urllib.parse import urlparse
 
+from corsheaders.defaults import default_headers
+
 try:
     from dotenv import load_dotenv
 except Exception:
@@ -62,6 +64,7 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     "corsheaders.middleware.CorsMiddleware",
+    "api.ratelimit.RateLimitMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
@@ -183,6 +186,46 @@ CORS_ALLOWED_ORIGIN_REGEXES = [
     r"^https?:\/\/.*\.vercel\.app$",
 ]
 
+# the upload endpoint authenticates with X-Upload-Token or Authorization: Bearer
+CORS_ALLOW_HEADERS = list(default_headers) + ["x-upload-token"]
+
+# -----------------------------
+# Rate limiting / load shedding (api.ratelimit)
+# -----------------------------
+# Buckets are shared by all gunicorn workers through RATE_LIMIT_STATE_FILE.
+RATE_LIMIT_ENABLED = str(os.environ.get("RATE_LIMIT_ENABLED", "True")).lower() in ("true", "1", "yes")
+RATE_LIMIT_RATE = float(os.environ.get("RATE_LIMIT_RATE", "2"))       # tokens / second / client
+RATE_LIMIT_BURST = float(os.environ.get("RATE_LIMIT_BURST", "20"))
+RATE_LIMIT_STATE_FILE = os.environ.get("RATE_LIMIT_STATE_FILE", "/tmp/space-forecast-ratelimit.bin")
+RATE_LIMIT_SLOTS = int(os.environ.get("RATE_LIMIT_SLOTS", "4096"))
+# number of gunicorn sync workers; all of them busy = pool saturated
+RATE_LIMIT_WORKER_CAPACITY = int(os.environ.get("WEB_CONCURRENCY", "3"))
+RATE_LIMIT_MAX_QUEUE_MS = float(os.environ.get("RATE_LIMIT_MAX_QUEUE_MS", "2000"))
+# client address = X-Forwarded-For entry appended by the N-th proxy from us. 0 (default) = REMOTE_ADDR and
+# X-Forwarded-For is ignored, since clients can set it; behind a proxy (e.g. Render's router) set it to 1
+RATE_LIMIT_PROXY_HOPS = int(os.environ.get("RATE_LIMIT_PROXY_HOPS", "0"))
+RATE_LIMIT_PATHS = ("/api/", "/forecast/")
+RATE_LIMIT_EXEMPT_PATHS = ("/api/health/",)
+
+# -----------------------------
+# Forecast upload / background ingest (api.ingest)
+# -----------------------------
+# Uploads require INGEST_UPLOAD_TOKEN (X-Upload-Token or Bearer header);
+# without a token they are only accepted when DEBUG is on.
+INGEST_UPLOAD_TOKEN = os.environ.get("INGEST_UPLOAD_TOKEN", "").strip() or None
+INGEST_WORKERS = int(os.environ.get("INGEST_WORKERS", "2"))
+INGEST_MAX_PENDING_JOBS = int(os.environ.get("INGEST_MAX_PENDING_JOBS", "8"))
+INGEST_BATCH_SIZE = int(os.environ.get("INGEST_BATCH_SIZE", "500"))
+INGEST_SPOOL_DIR = os.environ.get("INGEST_SPOOL_DIR", "").strip() or None
+# Drop-directory watcher (manage.py watch_drop_dir, api.dropdir)
+INGEST_DROP_DIR = os.environ.get("INGEST_DROP_DIR", "").strip() or None
+INGEST_ARCHIVE_DIR = os.environ.get("INGEST_ARCHIVE_DIR", "").strip() or None
+INGEST_WATCH_INTERVAL = float(os.environ.get("INGEST_WATCH_INTERVAL", "5"))
+INGEST_DROP_WORKERS = int(os.environ.get("INGEST_DROP_WORKERS", str(INGEST_WORKERS)))
+# failed files are retried with exponential backoff (RETRY_SECONDS, doubling) up to MAX_ATTEMPTS times
+INGEST_DROP_MAX_ATTEMPTS = int(os.environ.get("INGEST_DROP_MAX_ATTEMPTS", "5"))
+INGEST_DROP_RETRY_SECONDS = float(os.environ.get("INGEST_DROP_RETRY_SECONDS", "30"))
+
 # -----------------------------
 # Logging
 # -----------------------------
@@ -0,0 +1,343 @@
+# ml_model/kp_cache.py
+"""
+On-disk columnar cache of the 3-hourly Kp history, shared by train_lstm and
+predict_3day.
+
+One directory per <db>.<collection> under KP_CACHE_DIR (relative to the
+backend directory unless absolute, see cache_root) holds three flat
+column files read back as read-only np.memmap arrays (no parsing, no copy):
+
+  times.<gen>.bin      datetime64[s]  slot start, UTC
+  values.<gen>.bin     float32        Kp
+  preferred.<gen>.bin  uint8          1 for slots of the day's preferred
+                                      document (api.dedupe.rank), the
+                                      series predict_3day uses
+
+and manifest.json with the generation, the row count, the high-water mark
+(last cached day) and one fingerprint per calendar month: a SHA-1 over the
+month's document _ids and content hashes (api.content_hash, computed when a
+document was not stamped). Rows are the ml_model.kp_history series: every document expanded,
+NaN slots dropped, in time order.
+
+refresh() fingerprints the months in Mongo with a small projected scan
+(_id, date, content_hash) and compares them with the manifest. The first
+month that differs - a rewritten or removed historical document, or a month
+past the high-water mark - is where the cache is cut and re-read from Mongo;
+the rows before it are kept as they are (copied as raw bytes, not parsed).
+Day documents hold at most 8 slots (api.validation), so no document's slots
+cross into the next month. Every change writes a new generation of column
+files and then replaces the manifest, so processes still mapping the
+previous generation are never truncated under and an interrupted refresh
+leaves the previous cache readable. Documents with non-canonical (string)
+dates cannot be range-queried and force a full rebuild.
+
+Both the fingerprints and the scan cover the retention archive
+(api.retention.iter_archived, kp_history.day_batches) as well as the hot
+collection. Moving a document to `<collection>_archive` keeps its _id and
+content hash, so an archive run leaves every month's fingerprint unchanged
+and costs no re-read.
+
+verify_months limits the fingerprint scan to the newest months (predict_3day
+uses this: its tail only depends on them); a full refresh also catches
+backfilled old months. `manage.py rebuild_kp_cache` rebuilds from scratch.
+
+Caching is off unless KP_CACHE_DIR is set.
+"""
+
+import hashlib
+import json
+import logging
+import os
+from datetime import datetime
+
+import numpy as np
+
+from api import content_hash, dedupe, retention
+from api.utils_spaceweather import to_utc_date
+from ml_model import kp_history
+
+try:
+    import fcntl
+except ImportError:  # Windows: refreshes are not serialized between processes
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+VERSION = 1
+MANIFEST = "manifest.json"
+LOCK = ".lock"
+COLUMNS = {"times": "datetime64[s]", "values": "float32", "preferred": "uint8"}
+BATCH_SIZE = int(os.environ.get("KP_CACHE_BATCH", 5000))
+VERIFY_MONTHS = int(os.environ.get("KP_CACHE_VERIFY_MONTHS", 2))
+SCAN_PROJECTION = kp_history.RANK_PROJECTION
+PRINT_PROJECTION = {"date": 1, content_hash.HASH_FIELD: 1}
+UNSTAMPED_PROJECTION = dict({f: 1 for f in content_hash.CONTENT_FIELDS}, **kp_history.PROJECTION)
+
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def cache_root(root=None):
+    """
+    The cache root: `root` or KP_CACHE_DIR, with a relative path taken from
+    the backend directory (settings.BASE_DIR), whatever the working directory
+    of the script or command. "" when caching is off.
+    """
+    root = (root or os.environ.get("KP_CACHE_DIR", "")).strip()
+    return os.path.join(BACKEND_DIR, root) if root else ""
+
+
+def enabled():
+    return bool(cache_root())
+
+
+def cache_dir(collection, root=None):
+    return os.path.join(cache_root(root), f"{collection.database.name}.{collection.name}")
+
+
+class KpCache:
+    """Read-only column views of one cache directory."""
+
+    def __init__(self, path, manifest):
+        self.path = path
+        self.manifest = manifest
+        count = manifest["count"]
+        for name, dtype in COLUMNS.items():
+            if count:
+                column = np.memmap(_column_path(path, name, manifest["generation"]), dtype=dtype, mode="r",
+                                   shape=(count,))
+            else:
+                column = np.empty(0, dtype=dtype)
+            setattr(self, name, column)
+
+    def __len__(self):
+        return self.manifest["count"]
+
+    def tail(self, n):
+        """(times, values) of the newest n preferred slots; fewer if the cache holds fewer."""
+        window = 2 * n
+        while True:
+            lo = max(len(self) - window, 0)
+            mask = self.preferred[lo:].astype(bool)
+            if mask.sum() >= n or lo == 0:
+                return self.times[lo:][mask][-n:], self.values[lo:][mask][-n:]
+            window *= 2
+
+
+# -- manifest / files -------------------------------------------------------
+
+def _column_path(path, name, generation):
+    return os.path.join(path, f"{name}.{generation}.bin")
+
+
+def read_manifest(path):
+    """The manifest, or None if missing, from another format, or ahead of its column files."""
+    try:
+        with open(os.path.join(path, MANIFEST), "r", encoding="utf-8") as fh:
+            manifest = json.load(fh)
+    except (OSError, ValueError):
+        return None
+    if manifest.get("version") != VERSION:
+        return None
+    for name, dtype in COLUMNS.items():
+        try:
+            size = os.path.getsize(_column_path(path, name, manifest["generation"]))
+        except OSError:
+            return None
+        if size < manifest["count"] * np.dtype(dtype).itemsize:
+            return None
+    return manifest
+
+
+def _write_generation(path, manifest, previous, keep, columns):
+    """
+    Write generation manifest["generation"]: the first `keep` rows of the
+    `previous` KpCache (if any) followed by `columns`, then publish the
+    manifest and drop older generations.
+    """
+    generation = manifest["generation"]
+    for name, dtype in COLUMNS.items():
+        with open(_column_path(path, name, generation), "wb") as fh:
+            if keep:
+                getattr(previous, name)[:keep].tofile(fh)
+            np.ascontiguousarray(columns[name], dtype=dtype).tofile(fh)
+    tmp = os.path.join(path, f"{MANIFEST}.tmp")
+    with open(tmp, "w", encoding="utf-8") as fh:
+        json.dump(manifest, fh, indent=1, sort_keys=True)
+    os.replace(tmp, os.path.join(path, MANIFEST))
+    for entry in os.listdir(path):
+        parts = entry.split(".")
+        if len(parts) == 3 and parts[0] in COLUMNS and parts[2] == "bin" and parts[1] != str(generation):
+            try:
+                os.remove(os.path.join(path, entry))
+            except OSError:  # still mapped elsewhere (Windows); removed by a later refresh
+                pass
+
+
+class _Lock:
+    def __init__(self, path):
+        self.path = path
+
+    def __enter__(self):
+        os.makedirs(self.path, exist_ok=True)
+        self.fh = open(os.path.join(self.path, LOCK), "a")
+        if fcntl:
+            fcntl.flock(self.fh, fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, *exc):
+        if fcntl:
+            fcntl.flock(self.fh, fcntl.LOCK_UN)
+        self.fh.close()
+
+
+# -- Mongo side -------------------------------------------------------------
+
+def _month(day):
+    return f"{day.year:04d}-{day.month:02d}"
+
+
+def _month_start(month):
+    return datetime(int(month[:4]), int(month[5:7]), 1)
+
+
+def fingerprints(collection, since=None):
+    """
+    ({month: fingerprint}, canonical) for documents dated from `since` (a
+    datetime, None = all). canonical is False when a string date was seen.
+    """
+    query = {"date": {"$gte": since}} if since else {}
+    entries, unstamped, canonical = {}, [], True
+    for doc in retention.iter_archived(collection, since):
+        digest = doc.get(content_hash.HASH_FIELD) or content_hash.compute(doc)
+        entries.setdefault(_month(to_utc_date(doc["date"])), []).append((str(doc["_id"]), digest))
+    for doc in collection.find(query, projection=PRINT_PROJECTION, batch_size=BATCH_SIZE):
+        raw = doc.get("date")
+        day = to_utc_date(raw)
+        if day is None:
+            continue
+        canonical = canonical and isinstance(raw, datetime)
+        digest = doc.get(content_hash.HASH_FIELD)
+        if digest is None:
+            unstamped.append(doc["_id"])
+        entries.setdefault(_month(day), []).append((str(doc["_id"]), digest))
+    if unstamped:
+        computed = {}
+        for i in range(0, len(unstamped), BATCH_SIZE):
+            for doc in collection.find({"_id": {"$in": unstamped[i:i + BATCH_SIZE]}}, projection=UNSTAMPED_PROJECTION):
+                computed[str(doc["_id"])] = content_hash.compute(doc)
+        entries = {m: [(i, d if d is not None else computed.get(i)) for i, d in rows] for m, rows in entries.items()}
+    out = {}
+    for month, rows in entries.items():
+        h = hashlib.sha1()
+        for _id, digest in sorted(rows, key=lambda r: r[0]):
+            h.update(f"{_id}:{digest};".encode("utf-8"))
+        out[month] = h.hexdigest()
+    return out, canonical
+
+
+def scan(collection, since=None, batch_size=BATCH_SIZE):
+    """
+    Columns {times, values, preferred} for documents dated from `since`
+    (None = all), in time order. Documents come in whole days of both tiers
+    (kp_history.day_batches), so each day's preferred document is chosen
+    among all of its documents. A cold build (since=None) is the partitioned
+    kp_history.load_days scan training uses; a top-up reads one cursor.
+    """
+    if since is None:
+        return dict(zip(COLUMNS, kp_history.load_days(collection, batch_size=batch_size, tagged=True)))
+    estimate = collection.count_documents({"date": {"$gte": since}})
+    estimate += sum(c.get("count", 0) for c in retention.chunks(collection, since))
+    buf = kp_history.SeriesBuffer(estimate * kp_history.SLOTS_PER_DAY, tags=True)
+    for batch in kp_history.day_batches(collection, since, SCAN_PROJECTION, batch_size):
+        buf.append(*kp_history.batch_arrays(batch, tags=kp_history.preferred_flags(batch)))
+    columns = dict(zip(COLUMNS, buf.result()))
+    times = columns["times"]
+    if len(times) > 1 and (np.diff(times) < np.timedelta64(0, "s")).any():
+        order = np.argsort(times, kind="stable")
+        columns = {name: a[order] for name, a in columns.items()}
+    return columns
+
+
+# -- build / refresh --------------------------------------------------------
+
+def _new_manifest(collection, months):
+    return {
+        "version": VERSION,
+        "db": collection.database.name,
+        "collection": collection.name,
+        "columns": COLUMNS,
+        "generation": 0,
+        "count": 0,
+        "hwm": None,
+        "months": months,
+        "built_at": datetime.utcnow().isoformat(),
+    }
+
+
+def _hwm(columns, previous=None):
+    if len(columns["times"]):
+        return str(columns["times"][-1].astype("datetime64[D]"))
+    return previous
+
+
+def _build(collection, path, batch_size, generation):
+    months, _ = fingerprints(collection)
+    columns = scan(collection, batch_size=batch_size)
+    manifest = _new_manifest(collection, months)
+    manifest.update(generation=generation, count=len(columns["times"]), hwm=_hwm(columns),
+                    updated_at=manifest["built_at"])
+    _write_generation(path, manifest, None, 0, columns)
+    logger.info("Kp cache %s rebuilt: %d slot(s)", path, manifest["count"])
+    return KpCache(path, manifest)
+
+
+def rebuild(collection, root=None, batch_size=BATCH_SIZE):
+    """Re-read the whole history into a fresh cache generation. Returns the opened KpCache."""
+    path = cache_dir(collection, root)
+    with _Lock(path):
+        manifest = read_manifest(path)
+        return _build(collection, path, batch_size, manifest["generation"] + 1 if manifest else 1)
+
+
+def _first_change(stored, current, since):
+    """First month (>= since) whose fingerprint differs, or None."""
+    months = sorted(m for m in set(stored) | set(current) if since is None or m >= since)
+    return next((m for m in months if stored.get(m) != current.get(m)), None)
+
+
+def refresh(collection, root=None, verify_months=None, batch_size=BATCH_SIZE):
+    """
+    Bring the cache up to date and return it (KpCache). verify_months=None
+    fingerprints every month; otherwise only the newest `verify_months`
+    months up to the high-water mark, plus everything after it.
+    """
+    path = cache_dir(collection, root)
+    with _Lock(path):
+        manifest = read_manifest(path)
+        if manifest is None:
+            return _build(collection, path, batch_size, 1)
+        since = None
+        if verify_months and manifest["hwm"]:
+            since = str(np.datetime64(manifest["hwm"], "M") - np.timedelta64(verify_months - 1, "M"))
+        current, canonical = fingerprints(collection, _month_start(since) if since else None)
+        changed = _first_change(manifest["months"], current, since)
+        if changed is None:
+            return KpCache(path, manifest)
+        if not canonical:
+            logger.info("Kp cache %s: string dates present, rebuilding", path)
+            return _build(collection, path, batch_size, manifest["generation"] + 1)
+
+        start = _month_start(changed)
+        previous = KpCache(path, manifest)
+        keep = int(np.searchsorted(previous.times, np.datetime64(start, "s")))
+        columns = scan(collection, since=start, batch_size=batch_size)
+        months = {m: v for m, v in manifest["months"].items() if m < changed}
+        months.update({m: v for m, v in current.items() if m >= changed})
+        manifest = dict(manifest, generation=manifest["generation"] + 1, count=keep + len(columns["times"]),
+                        hwm=_hwm(columns, manifest["hwm"] if keep else None), months=months,
+                        updated_at=datetime.utcnow().isoformat())
+        _write_generation(path, manifest, previous, keep, columns)
+        logger.info("Kp cache %s: re-read from %s (%d slot(s) kept, %d read)",
+                    path, changed, keep, len(columns["times"]))
+        return KpCache(path, manifest)
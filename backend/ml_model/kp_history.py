@@ -0,0 +1,399 @@
+# ml_model/kp_history.py
+"""
+Streaming loader for the full 3-hourly Kp history of the forecast collection.
+
+load() walks a projected cursor (date + the kp fields only) in batches. Per
+batch it:
+
+  - parses every date with one pd.to_datetime call (BSON dates, ISO strings
+    with or without "Z"; unparsable dates fall back to the _id timestamp);
+  - gathers the kp values of all documents into one flat float array
+    (packed documents through kp_codec.decode_many, the rest in one pass);
+  - derives the slot timestamps with repeat / offset arithmetic:
+    np.repeat(day start, values per document) + slot index * 3h.
+
+The results are appended to preallocated float32 / datetime64[s] arrays
+sized from the collection's document count (grown by doubling if that was
+low), so the history is never held as Python objects. Slots without a
+usable value are dropped.
+
+load() reads every document matched by a query. Both it and the loaders
+below cover the retention archive too (api.retention: documents older than
+RETENTION_HOT_DAYS live in compressed `<collection>_archive` chunks), so
+training keeps the full history after an archive run; copies left in both
+tiers by an interrupted archive run are read once.
+
+load_preferred() is the series predict_3day forecasts from and train_lstm
+trains on (directly or through the ml_model.kp_cache cold build): one
+document per day, the preferred one (api.dedupe.rank), so days holding both
+an observed and a model-output document are not counted twice. It reads
+both tiers merged by day (day_batches) and reduces each day as it goes.
+
+With KP_LOAD_WORKERS > 1 that scan is partitioned: the date range of both
+tiers is cut into PARTITIONS_PER_WORKER x workers windows of whole days
+(day_windows), each counted and then scanned on a thread pool, so a day's
+documents always meet in the same partition and are reduced there. Every
+partition writes into its own slice of one output array sized from the
+counts; the slices are then packed to the front in order (a move within the
+same buffer), so the stitched series needs no second allocation. Documents
+whose date is not a BSON date are read once up front and handed to the
+window of their day. A cold load over a high-latency link is then bound by
+the slowest partition rather than by the sum of every batch's round trip
+(scripts/bench_kp_load_parallel.py; scripts/bench_kp_history.py compares it
+with the previous per-value loader).
+"""
+
+import bisect
+import heapq
+import math
+import os
+import warnings
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime
+from functools import partial
+from itertools import chain
+
+import numpy as np
+import pandas as pd
+
+from api import dedupe, kp_codec, retention
+from api.utils_spaceweather import to_utc_date
+
+PROJECTION = {"date": 1, "kp_index": 1, "kp_packed": 1, "kp_raw": 1, "predicted_kp_3hr": 1, "kp": 1}
+RANK_PROJECTION = dict(PROJECTION, **{f: 1 for f in dedupe.RANK_FIELDS})
+BATCH_SIZE = int(os.environ.get("KP_LOAD_BATCH", 5000))
+WORKERS = int(os.environ.get("KP_LOAD_WORKERS", 4))
+PARTITIONS_PER_WORKER = 4
+SLOTS_PER_DAY = 8
+STEP = np.timedelta64(3, "h")
+DTYPE = np.float32
+
+
+def _empty(size, tags=False):
+    """Output columns: times datetime64[s], values float32 and, with `tags`, a uint8 tag per slot."""
+    columns = [np.empty(size, dtype="datetime64[s]"), np.empty(size, dtype=DTYPE)]
+    if tags:
+        columns.append(np.empty(size, dtype=np.uint8))
+    return columns
+
+
+class SeriesBuffer:
+    """Growable preallocated columns (times datetime64[s], values float32, optionally uint8 tags)."""
+
+    def __init__(self, capacity, out=None, tags=False):
+        if out is not None:
+            # fill caller-owned slices (a partition of a shared output); growing detaches from them
+            self.columns = list(out)
+        else:
+            self.columns = _empty(max(int(capacity), 1), tags)
+        self.size = 0
+
+    def append(self, *columns):
+        end = self.size + len(columns[1])
+        if end > len(self.columns[1]):
+            capacity = max(end, 2 * len(self.columns[1]))
+            self.columns = [np.resize(c, capacity) for c in self.columns]
+        for column, data in zip(self.columns, columns):
+            column[self.size:end] = data
+        self.size = end
+
+    def result(self):
+        """Views of the filled part: (times, values) or (times, values, tags)."""
+        return tuple(c[:self.size] for c in self.columns)
+
+
+def _floats(rows, total):
+    """Flatten kp rows into one float64 array; NaN for None / non-numeric values."""
+    flat = chain.from_iterable(rows)
+    try:
+        return np.fromiter((np.nan if v is None else v for v in flat), dtype=float, count=total)
+    except (TypeError, ValueError):
+        out = np.empty(total)
+        for i, v in enumerate(chain.from_iterable(rows)):
+            try:
+                out[i] = float(v)
+            except (TypeError, ValueError):
+                out[i] = np.nan
+        return out
+
+
+def _rows(docs):
+    """Per-document kp rows: arrays for packed documents, lists / [scalar] otherwise."""
+    rows = [None] * len(docs)
+    packed = [i for i, d in enumerate(docs) if d.get("kp_packed") is not None]
+    if packed:
+        decoded = kp_codec.decode_many([docs[i] for i in packed])
+        for i, row in zip(packed, decoded):
+            rows[i] = row
+    for i, d in enumerate(docs):
+        if rows[i] is not None:
+            continue
+        kp = d.get("kp_index") or d.get("predicted_kp_3hr") or d.get("kp")
+        rows[i] = kp if isinstance(kp, (list, tuple)) else [kp]
+    return rows
+
+
+def _one_date(doc):
+    """Slow path for a date the batch parse missed: parse it alone, else the _id timestamp."""
+    try:
+        ts = pd.to_datetime(doc.get("date"), utc=True)
+        if not pd.isna(ts):
+            return np.datetime64(ts.tz_localize(None), "s")
+    except (TypeError, ValueError):
+        pass
+    _id = doc.get("_id")
+    if hasattr(_id, "generation_time"):
+        return np.datetime64(_id.generation_time.replace(tzinfo=None), "s")
+    return np.datetime64("NaT")
+
+
+def _day_starts(docs):
+    """datetime64[s] (UTC, naive) per document, parsed in one vectorized call."""
+    with warnings.catch_warnings():
+        # mixed date types make pandas warn that it parses element-wise
+        warnings.simplefilter("ignore", UserWarning)
+        parsed = pd.to_datetime(pd.Series([d.get("date") for d in docs], dtype=object), utc=True, errors="coerce")
+    starts = parsed.dt.tz_localize(None).to_numpy(dtype="datetime64[s]")
+    # a batch mixing ISO layouts can leave a few NaT behind
+    for i in np.flatnonzero(np.isnat(starts)):
+        starts[i] = _one_date(docs[i])
+    return starts
+
+
+def batch_arrays(docs, tags=None):
+    """
+    (times, values) for one batch of documents, NaN slots dropped. With
+    `tags` (one value per document) a third array repeats each document's tag
+    for its slots.
+    """
+    rows = _rows(docs)
+    lengths = np.fromiter((len(r) for r in rows), dtype=np.int64, count=len(rows))
+    total = int(lengths.sum())
+    if not total:
+        empty = (np.empty(0, dtype="datetime64[s]"), np.empty(0, dtype=DTYPE))
+        return empty if tags is None else empty + (np.empty(0, dtype=np.asarray(tags).dtype),)
+    values = _floats(rows, total)
+    starts = _day_starts(docs)
+    # slot index within its document: position minus the document's first position
+    first = np.repeat(np.cumsum(lengths) - lengths, lengths)
+    times = np.repeat(starts, lengths) + (np.arange(total) - first) * STEP
+    keep = ~np.isnan(values) & ~np.isnat(times)
+    if tags is None:
+        return times[keep], values[keep].astype(DTYPE)
+    return times[keep], values[keep].astype(DTYPE), np.repeat(np.asarray(tags), lengths)[keep]
+
+
+def _fill(cursor, buf, batch_size):
+    batch = []
+    for doc in cursor:
+        batch.append(doc)
+        if len(batch) >= batch_size:
+            buf.append(*batch_arrays(batch))
+            batch = []
+    if batch:
+        buf.append(*batch_arrays(batch))
+    return buf.result()
+
+
+def _in_order(times, *columns):
+    """Stable time order, written back into the same arrays; only sorts if needed."""
+    if len(times) > 1 and (np.diff(times) < np.timedelta64(0, "s")).any():
+        order = np.argsort(times, kind="stable")
+        times[:] = times[order]
+        for column in columns:
+            column[:] = column[order]
+    return (times,) + columns
+
+
+def _archive_arrays(collection, chunk):
+    """(times, values) of one retention archive chunk, hot duplicates skipped."""
+    return batch_arrays(retention.read_chunk(collection, chunk, PROJECTION))
+
+
+def load(collection, query=None, batch_size=BATCH_SIZE, sort=True):
+    """
+    Every Kp value matched by `query` as (times datetime64[s], values float32),
+    in time order, every document expanded (load_preferred() keeps one per
+    day). An unfiltered load covers both retention tiers (the archive chunks
+    first, then the hot collection).
+    """
+    chunks = retention.chunks(collection) if not query else []
+    if query:
+        estimate = collection.count_documents(query)
+    else:
+        estimate = collection.estimated_document_count() + sum(c.get("count", 0) for c in chunks)
+    buf = SeriesBuffer(estimate * SLOTS_PER_DAY)
+    for chunk in chunks:
+        buf.append(*_archive_arrays(collection, chunk))
+    cursor = collection.find(query or {}, projection=PROJECTION, batch_size=batch_size)
+    if sort:
+        cursor = cursor.sort("date", 1)
+    # mixed date encodings (and late archive runs) can break the order; restore it (stable) only if needed
+    return _in_order(*_fill(cursor, buf, batch_size))
+
+
+def _day(doc):
+    return to_utc_date(doc.get("date")) or date.min
+
+
+def day_batches(collection, since=None, projection=RANK_PROJECTION, batch_size=BATCH_SIZE, until=None, extra=()):
+    """
+    Documents dated from `since` and before `until` (datetimes, None = no
+    bound) of both tiers - retention.iter_archived() merged by day with the
+    date-sorted hot collection and `extra` (documents already in day order) -
+    in lists of about `batch_size` that never split a day.
+    """
+    query = {}
+    if since or until:
+        query["date"] = {}
+        if since:
+            query["date"]["$gte"] = since
+        if until:
+            query["date"]["$lt"] = until
+    cursor = collection.find(query, projection=dict(projection), batch_size=batch_size).sort("date", 1)
+    archived = retention.iter_archived(collection, since, projection, until)
+    batch, last_day = [], None
+    try:
+        for doc in heapq.merge(archived, cursor, extra, key=_day):
+            day = _day(doc)
+            if len(batch) >= batch_size and day != last_day:
+                yield batch
+                batch = []
+            batch.append(doc)
+            last_day = day
+        if batch:
+            yield batch
+    finally:
+        cursor.close()
+
+
+def preferred_flags(docs):
+    """uint8 flag per document: 1 for each day's preferred document (api.dedupe.rank) among `docs`."""
+    best = {}
+    for i, doc in enumerate(docs):
+        day = to_utc_date(doc.get("date"))
+        if day not in best or dedupe.rank(doc) > dedupe.rank(docs[best[day]]):
+            best[day] = i
+    flags = np.zeros(len(docs), dtype=np.uint8)
+    flags[list(best.values())] = 1
+    return flags
+
+
+def _bounds(collection):
+    """(first, last) BSON dates over both tiers, or (None, None) when there are none."""
+    first, last = dedupe.date_bounds(collection)
+    chunks = retention.chunks(collection)
+    if chunks:
+        lo, hi = chunks[0]["start"], max(c["end"] for c in chunks)
+        first = lo if first is None else min(first, lo)
+        last = hi if last is None else max(last, hi)
+    return first, last
+
+
+def day_windows(collection, parts):
+    """
+    About `parts` disjoint [since, until) windows of whole days covering both
+    tiers in order, as (since, until, strays): the documents whose `date` is
+    not a BSON date cannot be range-queried, so they are read once here and
+    handed to the window of their day (the first one when unparsable).
+    """
+    strays = sorted(collection.find({"date": {"$not": {"$type": "date"}}}, projection=dict(RANK_PROJECTION)),
+                    key=_day)
+    first, last = _bounds(collection)
+    if first is None:
+        # nothing range-queryable: one unbounded window reads everything
+        return [(None, None, [])]
+    known = [to_utc_date(doc.get("date")) for doc in strays]
+    known = [datetime(d.year, d.month, d.day) for d in known if d]
+    if known:
+        first, last = min(first, known[0]), max(last, known[-1])
+    days = max(1, math.ceil(((last - first).days + 1) / parts))
+    windows = [(lo, hi, []) for lo, hi in dedupe.windows(first, last, days)]
+    ends = [hi for _, hi, _ in windows]
+    for doc in strays:
+        day = to_utc_date(doc.get("date"))
+        i = bisect.bisect_right(ends, datetime(day.year, day.month, day.day)) if day else 0
+        windows[min(i, len(windows) - 1)][2].append(doc)
+    return windows
+
+
+def _window_count(collection, chunks, window):
+    """Upper bound on the documents of one window: hot count plus the overlapping chunks' counts."""
+    since, until, strays = window
+    query = {"date": {"$gte": since, "$lt": until}} if since else {}
+    archived = sum(c.get("count", 0) for c in chunks if since is None or (c["end"] >= since and c["start"] < until))
+    return collection.count_documents(query) + archived + len(strays)
+
+
+def _scan_days(batches, buf, tagged):
+    """Reduce whole-day batches to each day's preferred document into `buf`; returns the buffer in time order."""
+    for batch in batches:
+        flags = preferred_flags(batch)
+        if tagged:
+            buf.append(*batch_arrays(batch, tags=flags))
+        else:
+            buf.append(*batch_arrays([doc for doc, keep in zip(batch, flags) if keep]))
+    return _in_order(*buf.result())
+
+
+def _scan_window(collection, window, out, batch_size, tagged):
+    since, until, strays = window
+    batches = day_batches(collection, since, RANK_PROJECTION, batch_size, until=until, extra=strays)
+    return _scan_days(batches, SeriesBuffer(0, out=out), tagged)
+
+
+def load_days(collection, workers=None, batch_size=BATCH_SIZE, tagged=False):
+    """
+    Each day's documents of both tiers reduced to the preferred one
+    (api.dedupe.rank), in time order: (times, values) of the preferred
+    documents' slots, or with `tagged` every slot plus a uint8 preferred flag
+    as (times, values, flags). With `workers` (default KP_LOAD_WORKERS) above
+    1 the day windows (day_windows) are scanned on a thread pool.
+    """
+    workers = WORKERS if workers is None else workers
+    windows = day_windows(collection, workers * PARTITIONS_PER_WORKER if workers > 1 else 1)
+    chunks = retention.chunks(collection)
+    if workers <= 1:
+        estimate = collection.estimated_document_count() + sum(c.get("count", 0) for c in chunks)
+        batches = chain.from_iterable(
+            day_batches(collection, since, RANK_PROJECTION, batch_size, until=until, extra=strays)
+            for since, until, strays in windows)
+        return _scan_days(batches, SeriesBuffer(estimate * SLOTS_PER_DAY, tags=tagged), tagged)
+
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="kp-load") as pool:
+        counts = list(pool.map(partial(_window_count, collection, chunks), windows))
+        capacity = np.array(counts, dtype=np.int64) * SLOTS_PER_DAY
+        offsets = np.concatenate(([0], np.cumsum(capacity)))
+        columns = _empty(int(offsets[-1]), tagged)
+        spans = [(window, lo, hi) for window, lo, hi in zip(windows, offsets[:-1], offsets[1:]) if hi > lo]
+        futures = [pool.submit(_scan_window, collection, window, tuple(c[lo:hi] for c in columns),
+                               batch_size, tagged)
+                   for window, lo, hi in spans]
+        parts = [f.result() for f in futures]
+
+    # a window that outgrew its slice (documents with more than 8 slots) was detached from it
+    in_place = [part[1].base is columns[1] for part in parts]
+    size = sum(len(part[1]) for part in parts)
+    if not all(in_place):
+        columns = _empty(size, tagged)
+        in_place = [False] * len(parts)
+    pos = 0
+    for part, (_, lo, _), same in zip(parts, spans, in_place):
+        n = len(part[1])
+        # pack each window down to the end of the previous one: slices only move left
+        if not same or lo != pos:
+            for column, data in zip(columns, part):
+                column[pos:pos + n] = data
+        pos += n
+    # windows are disjoint whole days in order; only unparsable dates (first window) can be out of place
+    return _in_order(*(c[:pos] for c in columns))
+
+
+def load_preferred(collection, batch_size=BATCH_SIZE, workers=None):
+    """(times, values) of each day's preferred document only, from both tiers, in time order (load_days)."""
+    return load_days(collection, workers=workers, batch_size=batch_size)
+
+
+def to_frame(times, values):
+    """The DataFrame shape train_lstm has always used: tz-aware UTC `datetime` and float `kp`."""
+    return pd.DataFrame({"datetime": pd.to_datetime(times, utc=True), "kp": values.astype(float)})
@@ -1,5 +1,6 @@
 # ml_model/predict_3day.py
 import os
+import sys
 import joblib
 import numpy as np
 import pandas as pd
@@ -7,6 +8,15 @@ from datetime import datetime, timedelta
 from pymongo import MongoClient
 from tensorflow.keras.models import load_model
 import logging
+from itertools import groupby
+
+# backend/ on the path so the shared api helpers can be imported
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from api.rollups import refresh_days
+from api import dedupe, derive, kp_codec, kp_series
+from api.utils_spaceweather import to_utc_date
+from api.publish import publish as publish_forecast
+from ml_model import kp_cache
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger("predict_3day")
@@ -29,67 +39,81 @@ def get_latest_quality(db):
         return float(doc["quality_0_1"])
     return float(doc.get("quality", 0.0))
 
-def _safe_to_datetime(val):
-    """
-    Convert val to a timezone-aware (UTC) pandas Timestamp.
-    Handles strings, naive datetimes, and pandas Timestamps.
-    """
-    try:
-        # let pandas handle many formats; force utc
-        ts = pd.to_datetime(val, utc=True)
-        return ts
-    except Exception:
+# newest documents needed for one sequence: ceil(SEQ_LENGTH / 8) days plus a margin
+TAIL_MARGIN_DAYS = int(os.environ.get("TAIL_MARGIN_DAYS", 2))
+TAIL_PROJECTION = {"date": 1, "kp_index": 1, "kp_packed": 1, "kp_raw": 1, "predicted_kp_3hr": 1, "kp": 1,
+                   "source": 1}
+SLOT = np.timedelta64(3, "h")
+
+
+def _kp_values(doc):
+    """Usable Kp values of one document, in slot order (non-numeric values skipped)."""
+    kp = kp_codec.kp_list(doc) or doc.get("predicted_kp_3hr") or doc.get("kp")
+    out = []
+    for v in kp if isinstance(kp, (list, tuple)) else [kp]:
         try:
-            # last-resort: if val is a datetime without tz, attach UTC
-            if isinstance(val, datetime):
-                return pd.to_datetime(val).tz_localize("UTC")
-        except Exception:
-            pass
-    return None
+            out.append(float(v))
+        except (TypeError, ValueError):
+            continue
+    return out
+
 
 def load_recent_sequence_from_collection(db, lookback):
+    """
+    The newest `lookback` 3-hourly Kp values as a (lookback, 1) array, plus a
+    small DataFrame of the same values with their times.
+
+    Reads only the tail: a descending date query (the (date, source) index)
+    with a kp-only projection, consumed one day at a time until the
+    preallocated array is full, so the cost does not grow with the stored
+    history. Where several documents share a day, the preferred one is used
+    (api.dedupe.rank: observed before model output). With KP_CACHE_DIR set the
+    values come from the local cache (ml_model.kp_cache) instead.
+    """
+    if kp_series.mode() == "series":
+        times, values = kp_series.tail(db, lookback)
+        if len(values) < lookback:
+            raise RuntimeError("Not enough history to build recent sequence")
+        df = pd.DataFrame({"datetime": pd.to_datetime(times, utc=True), "kp": values.astype(float)})
+        return values.astype(float).reshape(-1, 1), df
+
     col = db.get_collection(TRAIN_COLLECTION)
-    docs = list(col.find({}).sort("date", 1))
-    records = []
-    for d in docs:
-        date = d.get("date")
-        kp = d.get("kp_index") or d.get("predicted_kp_3hr") or d.get("kp")
-        if isinstance(kp, (list, tuple)) and len(kp) > 0:
-            for i, v in enumerate(kp):
-                try:
-                    base_ts = _safe_to_datetime(date)
-                    if base_ts is None:
-                        base_ts = pd.to_datetime(d.get("_id").generation_time, utc=True)
-                    ts = base_ts + pd.to_timedelta(i * 3, unit="h")
-                except Exception:
-                    ts = pd.to_datetime(d.get("_id").generation_time, utc=True) + pd.to_timedelta(i * 3, unit="h")
-                try:
-                    records.append({"datetime": ts, "kp": float(v)})
-                except Exception:
-                    continue
-        else:
-            try:
-                ts = _safe_to_datetime(date)
-                if ts is None:
-                    ts = pd.to_datetime(d.get("_id").generation_time, utc=True)
-            except Exception:
-                ts = pd.to_datetime(d.get("_id").generation_time, utc=True)
-            try:
-                records.append({"datetime": ts, "kp": float(kp)})
-            except Exception:
+    if kp_cache.enabled():
+        # preferred slots from the memory-mapped cache; only the newest months are re-verified
+        times, values = kp_cache.refresh(col, verify_months=kp_cache.VERIFY_MONTHS).tail(lookback)
+        if len(values) < lookback:
+            raise RuntimeError("Not enough history to build recent sequence")
+        df = pd.DataFrame({"datetime": pd.to_datetime(times, utc=True), "kp": values.astype(float)})
+        return values.astype(float).reshape(-1, 1), df
+
+    need_days = -(-lookback // 8) + TAIL_MARGIN_DAYS
+    cursor = (col.find({"date": {"$exists": True}}, projection=TAIL_PROJECTION)
+              .sort("date", -1).batch_size(need_days * 2))
+
+    seq = np.full(lookback, np.nan)
+    times = np.empty(lookback, dtype="datetime64[s]")
+    pos = lookback
+    try:
+        for day, group in groupby(cursor, key=lambda d: to_utc_date(d.get("date"))):
+            if day is None:
                 continue
-
-    df = pd.DataFrame(records)
-    if df.empty:
-        raise RuntimeError("Not enough history to build recent sequence")
-    # ensure timezone-aware and sorted
-    df["datetime"] = pd.to_datetime(df["datetime"], utc=True)
-    df = df.sort_values("datetime").reset_index(drop=True)
-
-    if len(df) < lookback:
+            values = _kp_values(max(group, key=dedupe.rank))[-pos:]
+            if not values:
+                continue
+            # fill backwards: this day's values end where the newer days begin
+            lo = pos - len(values)
+            seq[lo:pos] = values
+            times[lo:pos] = np.datetime64(day, "s") + np.arange(len(values)) * SLOT
+            pos = lo
+            if pos == 0:
+                break
+    finally:
+        cursor.close()
+
+    if pos > 0:
         raise RuntimeError("Not enough history to build recent sequence")
-    seq = df["kp"].values.astype(float)[-lookback:].reshape(-1,1)
-    return seq, df
+    df = pd.DataFrame({"datetime": pd.to_datetime(times, utc=True), "kp": seq})
+    return seq.reshape(-1, 1), df
 
 def main():
     if not MONGO_URI:
@@ -126,30 +150,34 @@ def main():
         end = start + 8
         slice_vals = preds_inv[start:end].flatten() if end <= len(preds_inv) else preds_inv[start:].flatten()
         daily_avg = float(np.mean(slice_vals)) if len(slice_vals) else None
-        # use ISO UTC date string for the day (midnight UTC)
+        # midnight UTC as a BSON Date (canonical shape, see api.schema)
         day_date = (now + timedelta(days=day+1)).replace(hour=0, minute=0, second=0, microsecond=0)
-        iso_date = day_date.strftime("%Y-%m-%dT%H:%M:%SZ")
         docs.append({
-            "date": iso_date,
+            "date": day_date,
             "kp_index": slice_vals.tolist(),
             "kp_daily_avg": daily_avg,
             "created_at": datetime.utcnow(),
             "source": "lstm_kp_model"
         })
+    derive.apply(docs)
+    if kp_codec.enabled():
+        docs = [kp_codec.pack_doc(d) for d in docs]
 
     publish = True
     if quality is not None:
         publish = (quality >= PUBLISH_IF_QUALITY_GE)
 
     if publish:
-        res = db.get_collection(FORECAST_COLLECTION).insert_many(docs)
-        logger.info("Inserted %d forecast docs", len(res.inserted_ids))
-        db.get_collection("prediction_publishes").insert_one({
-            "published_at": now,
-            "inserted_ids": [str(x) for x in res.inserted_ids],
+        # keyed on (date, source): a rerun for the same days updates in place
+        entry = publish_forecast(db.get_collection(FORECAST_COLLECTION), docs, log={
             "model_quality_0_1": float(quality) if quality is not None else None
         })
-        print("Published:", res.inserted_ids)
+        logger.info("Published %d forecast docs (new=%d, changed=%d, unchanged=%d, transactional=%s)",
+                    len(docs), len(entry["upserted_ids"]), entry["modified"], entry["unchanged"],
+                    entry["transactional"])
+        refresh_days(db.get_collection(FORECAST_COLLECTION), [d["date"] for d in docs])
+        kp_series.sync_days(db.get_collection(FORECAST_COLLECTION), [d["date"] for d in docs])
+        print("Published:", entry["keys"])
     else:
         logger.warning("Not publishing: quality=%s threshold=%s", quality, PUBLISH_IF_QUALITY_GE)
         db.get_collection("prediction_publishes").insert_one({
@@ -12,6 +12,7 @@ os.environ.setdefault("DJANGO_SETTINGS_MODULE", "forecast_project.settings")
 django.setup()
 
 from forecast.models import Forecast3Day
+from api.schema import SOURCE_NOAA
 
 logging.basicConfig(level=logging.INFO)
 log = logging.getLogger("seed_future_forecast")
@@ -70,18 +71,19 @@ def generate_placeholder_for(date_obj):
         "rationale_geomagnetic": "Auto-seeded future placeholder",
         "rationale_radiation": "Auto-seeded future placeholder",
         "rationale_blackout": "Auto-seeded future placeholder",
+        "source": "seed",
     }
 
 
 def get_latest_noaa_date():
     """
     Return the most recent NOAA-related Forecast3Day.date (as a date object).
-    Preference: rationale_geomagnetic contains 'noaa' (case-insensitive).
-    Falls back to the latest record if no explicit NOAA rationale found.
+    Preference: documents with source "noaa" (indexed on source, date).
+    Falls back to the latest record if there is no NOAA document.
     """
     try:
         noaa_doc = (
-            Forecast3Day.objects.filter(rationale_geomagnetic__icontains="noaa")
+            Forecast3Day.objects.filter(source=SOURCE_NOAA)
             .order_by("-date")
             .first()
         )
@@ -106,14 +108,16 @@ def seed_future(n_days=3):
     latest_noaa = get_latest_noaa_date()
     if not latest_noaa:
         log.error("[seed] No NOAA baseline found. Aborting.")
-        return {"created": 0, "updated": 0}
+        return {"created": 0, "updated": 0, "unchanged": 0}
 
     # Seed starting from day after NOAA's 3-day block (i.e., start = latest_noaa + 3)
     start_date = latest_noaa + timedelta(days=3)
     log.info(f"[seed] NOAA baseline start: {latest_noaa}; seeding from {start_date}")
 
-    created, updated = 0, 0
+    created, updated, unchanged = 0, 0, 0
     model_field_names = {f.name for f in Forecast3Day._meta.get_fields()}
+    # stored content hashes for the whole range, fetched once
+    stored = Forecast3Day.stored_hashes(start_date + timedelta(days=i) for i in range(n_days))
 
     for i in range(n_days):
         target = start_date + timedelta(days=i)
@@ -141,8 +145,16 @@ def seed_future(n_days=3):
             log.warning(f"[seed] No valid fields to upsert for {payload_date}, skipping.")
             continue
 
+        pending = Forecast3Day(date=payload_date, **defaults).normalize()
+        if stored.get((payload_date, pending.source)) == pending.content_hash:
+            unchanged += 1
+            log.info(f"[seed] unchanged {payload_date}")
+            continue
+
         try:
-            obj, created_flag = Forecast3Day.objects.update_or_create(date=payload_date, defaults=defaults)
+            obj, created_flag = Forecast3Day.objects.update_or_create(
+                date=payload_date, source=pending.source, defaults=defaults
+            )
             if created_flag:
                 created += 1
                 log.info(f"[seed] created {payload_date}")
@@ -152,8 +164,8 @@ def seed_future(n_days=3):
         except Exception:
             log.exception(f"[seed] DB upsert failed for {payload_date}")
 
-    log.info(f"[seed] done — created: {created}, updated: {updated}")
-    return {"created": created, "updated": updated}
+    log.info(f"[seed] done — created: {created}, updated: {updated}, unchanged: {unchanged}")
+    return {"created": created, "updated": updated, "unchanged": unchanged}
 
 
 if __name__ == "__main__":
@@ -48,6 +48,7 @@ def generate_placeholder_for(date_obj):
         "rationale_geomagnetic": "Auto-seeded placeholder",
         "rationale_radiation": "Auto-seeded placeholder",
         "rationale_blackout": "Auto-seeded placeholder",
+        "source": "seed",
     }
 
 def seed_future(n_days=3):
@@ -61,6 +62,9 @@ def seed_future(n_days=3):
 
     created = 0
     updated = 0
+    unchanged = 0
+    # stored content hashes for the whole range, fetched once
+    stored = Forecast3Day.stored_hashes(start + timedelta(days=i) for i in range(n_days))
 
     for i in range(n_days):
         target = start + timedelta(days=i)
@@ -80,9 +84,18 @@ def seed_future(n_days=3):
             "rationale_radiation": payload.get("rationale_radiation"),
             "rationale_blackout": payload.get("rationale_blackout"),
             "a_index": payload.get("a_index"),
+            "source": payload.get("source"),
         }
 
-        obj, created_flag = Forecast3Day.objects.update_or_create(date=payload_date, defaults=defaults)
+        pending = Forecast3Day(date=payload_date, **defaults).normalize()
+        if stored.get((payload_date, pending.source)) == pending.content_hash:
+            unchanged += 1
+            print(f"Unchanged forecast for {payload_date.isoformat()}")
+            continue
+
+        obj, created_flag = Forecast3Day.objects.update_or_create(
+            date=payload_date, source=pending.source, defaults=defaults
+        )
         if created_flag:
             created += 1
             print(f"Created forecast for {payload_date.isoformat()}")
@@ -90,7 +103,7 @@ def seed_future(n_days=3):
             updated += 1
             print(f"Updated forecast for {payload_date.isoformat()}")
 
-    print(f"Seed complete — created: {created}, updated: {updated}")
+    print(f"Seed complete — created: {created}, updated: {updated}, unchanged: {unchanged}")
 
 if __name__ == "__main__":
     seed_future(n_days=3)  # change to 7 if you want a larger buffer
@@ -1,17 +1,31 @@
 # ml_model/train_lstm.py
 import os
+import sys
+import time
 import numpy as np
 import pandas as pd
 from datetime import datetime
+from numpy.lib.stride_tricks import sliding_window_view
 from pymongo import MongoClient
 from sklearn.preprocessing import MinMaxScaler
 from sklearn.metrics import mean_squared_error
 import joblib
 import logging
 
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+import tensorflow as tf
 from tensorflow.keras.models import Sequential
 from tensorflow.keras.layers import LSTM, Dense, Dropout
-from tensorflow.keras.callbacks import EarlyStopping, ReduceLROnPlateau
+from tensorflow.keras.callbacks import Callback, EarlyStopping, ReduceLROnPlateau
+
+# backend/ on the path so the shared api helpers can be imported
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from api import kp_series
+from ml_model import kp_cache, kp_history
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger("train_lstm")
@@ -36,59 +50,85 @@ def load_kp_series(mongo_client, collection_name):
     """
     Load Kp time series from the Mongo collection and return a DataFrame
     with timezone-aware datetimes (UTC). Handles lists of 3-hour kp values
-    or single values per document.
+    or single values per document. Only each day's preferred document
+    (api.dedupe.rank) is used, the same series predict_3day forecasts from.
     """
     db = mongo_client[MONGO_DB]
-    col = db[collection_name]
-
-    # fetch docs sorted by stored date if possible
-    docs = list(col.find({}).sort("date", 1))
-    records = []
-
-    for d in docs:
-        date = d.get("date")
-        # prefer existing predicted_kp_3hr / kp_index fields, fall back to kp
-        kp = d.get("kp_index") or d.get("predicted_kp_3hr") or d.get("kp")
-
-        if isinstance(kp, (list, tuple)) and len(kp) > 0:
-            # expand each element into its own datetime (3-hour steps)
-            for i, v in enumerate(kp):
-                try:
-                    ts = pd.to_datetime(date, utc=True) + pd.to_timedelta(i * 3, unit="h")
-                except Exception:
-                    # fallback: use ObjectId generation time (tz-aware)
-                    ts = pd.to_datetime(d.get("_id").generation_time, utc=True) + pd.to_timedelta(i * 3, unit="h")
-                try:
-                    records.append({"datetime": ts, "kp": float(v)})
-                except Exception:
-                    continue
-        else:
-            # single value document
-            try:
-                ts = pd.to_datetime(date, utc=True)
-            except Exception:
-                ts = pd.to_datetime(d.get("_id").generation_time, utc=True)
-            try:
-                records.append({"datetime": ts, "kp": float(kp)})
-            except Exception:
-                continue
-
-    if not records:
+    if kp_series.mode() == "series":
+        # bucketed layout: one query per month range, no per-element expansion
+        times, values = kp_series.read_all(db)
+        if not len(values):
+            raise RuntimeError("No Kp records found in kp series buckets.")
+        return pd.DataFrame({"datetime": pd.to_datetime(times, utc=True), "kp": values.astype(float)})
+
+    if kp_cache.enabled():
+        # memory-mapped local copy, topped up from Mongo (ml_model.kp_cache)
+        cache = kp_cache.refresh(db[collection_name])
+        preferred = cache.preferred.astype(bool)
+        times, values = cache.times[preferred], cache.values[preferred]
+    else:
+        # whole days on KP_LOAD_WORKERS threads, vectorized date parsing and slot expansion (ml_model.kp_history)
+        times, values = kp_history.load_preferred(db[collection_name])
+    if not len(values):
         raise RuntimeError("No Kp records found in collection.")
-
-    df = pd.DataFrame(records)
-    # ensure datetime col is timezone-aware (UTC) and sorted
-    df["datetime"] = pd.to_datetime(df["datetime"], utc=True)
-    df = df.sort_values("datetime").reset_index(drop=True)
-    return df
+    return kp_history.to_frame(times, values)
 
 
 def create_sequences(values, input_len, output_len):
-    X, y = [], []
-    for i in range(len(values) - input_len - output_len + 1):
-        X.append(values[i:i + input_len])
-        y.append(values[i + input_len: i + input_len + output_len])
-    return np.array(X), np.array(y)
+    """
+    X (N, input_len, 1) and y (N, output_len) as read-only strided views over
+    `values` (sliding_window_view): every window shares the series' memory.
+    """
+    series = np.asarray(values).reshape(-1)
+    if len(series) < input_len + output_len:
+        return np.empty((0, input_len, 1), series.dtype), np.empty((0, output_len), series.dtype)
+    windows = sliding_window_view(series, input_len + output_len)
+    return windows[:, :input_len, np.newaxis], windows[:, input_len:]
+
+
+def window_dataset(series, start, stop, input_len, output_len, batch_size, shuffle=False):
+    """
+    tf.data pipeline over windows start..stop-1 of `series` (a 1-D tensor).
+    Only window start indices are batched (and shuffled); each batch gathers
+    its windows from the shared series tensor, so no more than one batch of
+    windows exists at a time. Train and validation are index ranges of the
+    same series.
+    """
+    offsets = tf.range(input_len + output_len, dtype=tf.int64)
+
+    def gather(idx):
+        windows = tf.gather(series, idx[:, tf.newaxis] + offsets)
+        return windows[:, :input_len, tf.newaxis], windows[:, input_len:]
+
+    ds = tf.data.Dataset.range(start, stop)
+    if shuffle:
+        ds = ds.shuffle(stop - start, reshuffle_each_iteration=True)
+    return ds.batch(batch_size).map(gather, num_parallel_calls=tf.data.AUTOTUNE).prefetch(tf.data.AUTOTUNE)
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process in MB (None where unavailable)."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+class EpochStats(Callback):
+    """Logs the wall time of every epoch and the process' peak RSS."""
+
+    def __init__(self):
+        super().__init__()
+        self.epoch_seconds = []
+        self._start = None
+
+    def on_epoch_begin(self, epoch, logs=None):
+        self._start = time.perf_counter()
+
+    def on_epoch_end(self, epoch, logs=None):
+        self.epoch_seconds.append(time.perf_counter() - self._start)
+        logger.info("Epoch %d: %.2fs, peak RSS %s MB", epoch + 1, self.epoch_seconds[-1], peak_rss_mb())
 
 
 def build_model(input_shape, out_len):
@@ -111,37 +151,39 @@ def main():
     df = load_kp_series(client, HIST_COLLECTION)
     logger.info("Loaded %d kp rows", len(df))
 
-    values = df["kp"].values.reshape(-1, 1).astype(float)
+    values = df["kp"].to_numpy(dtype=np.float32).reshape(-1, 1)
 
     scaler = MinMaxScaler()
-    scaled = scaler.fit_transform(values)
+    scaled = scaler.fit_transform(values).astype(np.float32, copy=False).reshape(-1)
     joblib.dump(scaler, SCALER_OUT)
     logger.info("Saved scaler -> %s", SCALER_OUT)
 
-    X, y = create_sequences(scaled, SEQ_LENGTH, FORECAST_LENGTH)
-    if X.size == 0:
+    n_windows = len(scaled) - SEQ_LENGTH - FORECAST_LENGTH + 1
+    if n_windows <= 0:
         raise RuntimeError("Not enough data for sequence creation.")
 
-    X = X.reshape((X.shape[0], SEQ_LENGTH, 1))
-    y = y.reshape((y.shape[0], FORECAST_LENGTH))
-
-    split_idx = int(0.8 * len(X))
-    X_train, X_test = X[:split_idx], X[split_idx:]
-    y_train, y_test = y[:split_idx], y[split_idx:]
+    # windows are index ranges over one copy of the series; nothing is materialized up front
+    split_idx = int(0.8 * n_windows)
+    series = tf.constant(scaled)
+    train_ds = window_dataset(series, 0, split_idx, SEQ_LENGTH, FORECAST_LENGTH, BATCH_SIZE, shuffle=True)
+    val_ds = window_dataset(series, split_idx, n_windows, SEQ_LENGTH, FORECAST_LENGTH, BATCH_SIZE)
+    _, y = create_sequences(scaled, SEQ_LENGTH, FORECAST_LENGTH)
+    y_test = y[split_idx:]
 
     model = build_model((SEQ_LENGTH, 1), FORECAST_LENGTH)
     model.summary(print_fn=lambda s: logger.info(s))
 
+    stats = EpochStats()
     callbacks = [
         EarlyStopping(monitor="val_loss", patience=10, restore_best_weights=True),
-        ReduceLROnPlateau(monitor="val_loss", factor=0.5, patience=5, min_lr=1e-6)
+        ReduceLROnPlateau(monitor="val_loss", factor=0.5, patience=5, min_lr=1e-6),
+        stats,
     ]
 
     model.fit(
-        X_train, y_train,
-        validation_data=(X_test, y_test),
+        train_ds,
+        validation_data=val_ds,
         epochs=EPOCHS,
-        batch_size=BATCH_SIZE,
         callbacks=callbacks,
         verbose=2
     )
@@ -150,7 +192,7 @@ def main():
     logger.info("Saved model -> %s", MODEL_OUT)
 
     # --- Evaluation ---
-    y_pred_scaled = model.predict(X_test)
+    y_pred_scaled = model.predict(val_ds)
     y_test_flat = y_test.reshape(-1, 1)
     y_pred_flat = y_pred_scaled.reshape(-1, 1)
     y_test_inv = scaler.inverse_transform(y_test_flat)
@@ -182,7 +224,9 @@ def main():
         "norm_mse_0_1": norm_mse,
         "quality_0_1": quality,
         "trained_at": datetime.utcnow(),
-        "rows": int(len(df))
+        "rows": int(len(df)),
+        "epoch_seconds": round(float(np.mean(stats.epoch_seconds)), 3) if stats.epoch_seconds else None,
+        "peak_rss_mb": peak_rss_mb(),
     }
     runs.insert_one(run_doc)
     logger.info("Inserted model run metadata into '%s'", MODEL_RUNS_COLLECTION)
@@ -0,0 +1,62 @@
+# backend/scripts/bench_batch_lookup.py
+"""
+Compare one /api/forecast/batch call against N sequential single-date calls.
+
+  API_BASE=http://127.0.0.1:8000 python scripts/bench_batch_lookup.py 2025-09-01 90
+
+Arguments: first date (default 90 days ago) and number of consecutive dates.
+"""
+import json
+import os
+import sys
+import time
+import urllib.request
+from datetime import date, timedelta
+
+API_BASE = os.environ.get("API_BASE", "http://127.0.0.1:8000").rstrip("/")
+ROUNDS = int(os.environ.get("ROUNDS", 3))
+
+start = date.fromisoformat(sys.argv[1]) if len(sys.argv) > 1 else date.today() - timedelta(days=90)
+count = int(sys.argv[2]) if len(sys.argv) > 2 else 90
+dates = [(start + timedelta(days=i)).isoformat() for i in range(count)]
+
+
+def get(url):
+    with urllib.request.urlopen(url, timeout=30) as resp:
+        return json.loads(resp.read())
+
+
+def post(url, payload):
+    req = urllib.request.Request(
+        url, data=json.dumps(payload).encode(), headers={"Content-Type": "application/json"}
+    )
+    with urllib.request.urlopen(req, timeout=30) as resp:
+        return json.loads(resp.read())
+
+
+def sequential():
+    found = 0
+    for d in dates:
+        found += get(f"{API_BASE}/api/forecast/batch?dates={d}")["found"]
+    return found
+
+
+def batched():
+    return post(f"{API_BASE}/api/forecast/batch", {"dates": dates})["found"]
+
+
+def best_of(fn):
+    timings = []
+    for _ in range(ROUNDS):
+        t0 = time.perf_counter()
+        found = fn()
+        timings.append(time.perf_counter() - t0)
+    return min(timings), found
+
+
+print(f"Benchmarking {count} dates from {dates[0]} against {API_BASE} (best of {ROUNDS})")
+seq_t, seq_found = best_of(sequential)
+batch_t, batch_found = best_of(batched)
+print(f"sequential: {seq_t * 1000:9.1f} ms  ({seq_t / count * 1000:.2f} ms/date, found={seq_found})")
+print(f"batch:      {batch_t * 1000:9.1f} ms  ({batch_t / count * 1000:.2f} ms/date, found={batch_found})")
+print(f"speedup:    {seq_t / batch_t:9.1f}x")
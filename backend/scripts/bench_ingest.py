@@ -0,0 +1,120 @@
+# backend/scripts/bench_ingest.py
+"""
+Records/second of the shared ingest engine (api.ingest) on a synthetic NDJSON
+file, against the old per-record path (upsert_record in
+ml_model/save_ml_forecast_json.py before the engine: ORM exists(), full_clean
+on a temporary Forecast3Day, then update_or_create or save) on a sample.
+
+  MONGO_URI=... python scripts/bench_ingest.py [records] [batch_size ...]
+
+Both run in a scratch database (<MONGO_DB>_bench, dropped afterwards; the ORM
+is pointed at it too) so the real database and its rollup / series side
+collections are not touched.
+"""
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "forecast_project.settings")
+import django  # noqa: E402
+from django.conf import settings  # noqa: E402
+from django.core.exceptions import ValidationError  # noqa: E402
+
+django.setup()
+
+from pymongo import MongoClient  # noqa: E402
+
+from api import ingest  # noqa: E402
+from api.db import MONGO_URI, DB_NAME, COLLECTION_NAME  # noqa: E402
+from api.schema import infer_source  # noqa: E402
+from forecast.models import Forecast3Day  # noqa: E402
+
+RECORDS = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+BATCH_SIZES = [int(b) for b in sys.argv[2:]] or [500, 2000]
+SAMPLE = int(os.environ.get("SAMPLE", 2000))
+
+if not MONGO_URI:
+    sys.exit("Set MONGO_URI")
+
+random.seed(7)
+thirds = [round(k / 3, 2) for k in range(28)]
+start = date(1932, 1, 1)
+# one record per (day, source): 100k records ~ 137 years of two sources
+records = [
+    {
+        "date": (start + timedelta(days=i // 2)).isoformat(),
+        "kp_index": [random.choice(thirds[:16]) for _ in range(8)],
+        "a_index": random.randint(0, 40),
+        "radio_flux": round(random.uniform(65, 250), 1),
+        "radio_blackout": {"R1-R2": random.randint(0, 40), "R3 or greater": random.randint(0, 5)},
+        "rationale_geomagnetic": "NOAA baseline" if i % 2 else "model output",
+    }
+    for i in range(RECORDS)
+]
+
+fd, path = tempfile.mkstemp(suffix=".ndjson")
+with os.fdopen(fd, "w") as fh:
+    for rec in records:
+        fh.write(json.dumps(rec) + "\n")
+
+client = MongoClient(MONGO_URI)
+bench_db = f"{DB_NAME}_bench"
+# no connection is open yet, so the ORM picks this up on first use
+settings.DATABASES["default"]["NAME"] = bench_db
+MODEL_FIELDS = {f.name for f in Forecast3Day._meta.get_fields()}
+
+
+def fresh_collection():
+    client.drop_database(bench_db)
+    # the auto-increment counter djongo's migrations would have created
+    client[bench_db]["__schema__"].insert_one(
+        {"name": Forecast3Day._meta.db_table, "auto": {"field_names": ["id"], "seq": 0}})
+    return client[bench_db][COLLECTION_NAME]
+
+
+def per_record(sample):
+    """The old upsert_record: exists() round trip, full_clean, then update_or_create (or save) per record."""
+    for rec in sample:
+        mapped = ingest.normalize_record(rec)
+        key = {"date": mapped["date"], "source": infer_source(mapped)}
+        defaults = {k: v for k, v in mapped.items() if k in MODEL_FIELDS and k not in key}
+        exists = Forecast3Day.objects.filter(**key).exists()
+        tmp = Forecast3Day(**key, **defaults)
+        try:
+            tmp.full_clean()
+        except ValidationError:
+            continue
+        if exists:
+            Forecast3Day.objects.update_or_create(**key, defaults=defaults)
+        else:
+            tmp.save()
+
+
+try:
+    print(f"{RECORDS} records, {os.path.getsize(path) / 1e6:.1f} MB NDJSON")
+
+    fresh_collection()
+    t0 = time.perf_counter()
+    per_record(records[:SAMPLE])
+    dt = time.perf_counter() - t0
+    print(f"per-record   (sample {SAMPLE:>6}): {SAMPLE / dt:>9,.0f} rec/s")
+
+    for batch_size in BATCH_SIZES:
+        col = fresh_collection()
+        t0 = time.perf_counter()
+        counts, _ = ingest.ingest_file(col, path, batch_size=batch_size)
+        dt = time.perf_counter() - t0
+        print(f"engine batch={batch_size:<6}        : {RECORDS / dt:>9,.0f} rec/s  {counts}")
+
+        t0 = time.perf_counter()
+        counts, _ = ingest.ingest_file(col, path, batch_size=batch_size)
+        dt = time.perf_counter() - t0
+        print(f"  re-run (all unchanged)       : {RECORDS / dt:>9,.0f} rec/s  unchanged={counts['unchanged']}")
+finally:
+    client.drop_database(bench_db)
+    os.remove(path)
@@ -0,0 +1,78 @@
+# backend/scripts/bench_kp_codec.py
+"""
+Size and decode-speed comparison of plain kp_index arrays vs. the packed
+layout in api.kp_codec, on synthetic NOAA-style days (values on thirds, a
+small share off-grid).
+
+  python scripts/bench_kp_codec.py [days]
+
+Document sizes are measured with bson.encode, i.e. what MongoDB stores before
+compression; run `python manage.py pack_kp_index --dry-run` / without it for
+collStats on a real collection.
+"""
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+import bson
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from api import kp_codec  # noqa: E402
+
+DAYS = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+ROUNDS = int(os.environ.get("ROUNDS", 3))
+OFF_GRID = float(os.environ.get("OFF_GRID", 0.02))
+
+random.seed(7)
+thirds = [round(k / 3, 2) for k in range(28)]
+weights = [max(1, 40 - 3 * k) for k in range(28)]
+base = datetime(1990, 1, 1)
+
+plain = []
+for i in range(DAYS):
+    kp = random.choices(thirds, weights, k=8)
+    if random.random() < OFF_GRID:
+        kp[random.randrange(8)] = round(random.uniform(0, 9), 3)
+    plain.append({"date": base + timedelta(days=i), "kp_index": kp, "source": "noaa"})
+packed = [kp_codec.pack_doc(d) for d in plain]
+
+
+def best_of(fn):
+    timings = []
+    for _ in range(ROUNDS):
+        t0 = time.perf_counter()
+        out = fn()
+        timings.append(time.perf_counter() - t0)
+    return min(timings), out
+
+
+def decode_plain():
+    return [np.array([float(v) for v in d["kp_index"]]) for d in plain]
+
+
+def decode_packed_each():
+    return [kp_codec.decode(d["kp_packed"], d.get("kp_raw")) for d in packed]
+
+
+def decode_packed_batch():
+    return kp_codec.decode_many(packed)
+
+
+size_plain = sum(len(bson.encode(d)) for d in plain)
+size_packed = sum(len(bson.encode(d)) for d in packed)
+n_packed = sum(1 for d in packed if "kp_packed" in d)
+
+print(f"{DAYS:,} days, {n_packed:,} packed ({100.0 * n_packed / DAYS:.1f}%), off-grid share {OFF_GRID:.0%}")
+print(f"BSON size   plain {size_plain / DAYS:7.1f} B/doc   packed {size_packed / DAYS:7.1f} B/doc   "
+      f"({100.0 * (1 - size_packed / size_plain):.1f}% smaller)")
+
+t_plain, ref = best_of(decode_plain)
+t_each, each = best_of(decode_packed_each)
+t_batch, batch = best_of(decode_packed_batch)
+assert all(np.allclose(a, b) for a, b in zip(ref, each)) and all(np.allclose(a, b) for a, b in zip(ref, batch))
+
+for label, t in (("plain list -> ndarray", t_plain), ("kp_codec.decode", t_each), ("kp_codec.decode_many", t_batch)):
+    print(f"{label:<24}{t * 1000:9.1f} ms  {DAYS / t / 1e6:6.2f} M days/s")
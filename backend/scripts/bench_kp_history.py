@@ -0,0 +1,113 @@
+# backend/scripts/bench_kp_history.py
+"""
+Wall-clock and peak memory of train_lstm's cold load of the Kp history
+(ml_model.kp_history.load_preferred, the path it and the kp_cache cold build
+read through) against the previous per-value loader of train_lstm
+(list(find()), one pd.to_datetime per value, list of dicts -> DataFrame).
+Every day holds one document, so both loaders see the same series.
+
+  MONGO_URI=... python scripts/bench_kp_history.py [days]
+
+Runs in a scratch database (<MONGO_DB>_bench, dropped afterwards). Peak
+memory is the tracemalloc peak (Python objects and NumPy buffers) during each
+load, and includes the DataFrame each loader hands to training.
+"""
+import os
+import random
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+import pandas as pd
+from pymongo import MongoClient
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from api import kp_codec  # noqa: E402
+from ml_model import kp_history  # noqa: E402
+
+MONGO_URI = os.environ.get("MONGO_URI")
+DB_NAME = os.environ.get("MONGO_DB", "forecast3day")
+DAYS = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+
+if not MONGO_URI:
+    sys.exit("Set MONGO_URI")
+
+
+def legacy_load(col):
+    """train_lstm.load_kp_series before ml_model.kp_history (collection mode)."""
+    docs = list(col.find({}).sort("date", 1))
+    records = []
+    for d in docs:
+        date = d.get("date")
+        kp = kp_codec.kp_list(d) or d.get("predicted_kp_3hr") or d.get("kp")
+        if isinstance(kp, (list, tuple)) and len(kp) > 0:
+            for i, v in enumerate(kp):
+                try:
+                    ts = pd.to_datetime(date, utc=True) + pd.to_timedelta(i * 3, unit="h")
+                except Exception:
+                    ts = pd.to_datetime(d.get("_id").generation_time, utc=True) + pd.to_timedelta(i * 3, unit="h")
+                try:
+                    records.append({"datetime": ts, "kp": float(v)})
+                except Exception:
+                    continue
+        else:
+            try:
+                ts = pd.to_datetime(date, utc=True)
+            except Exception:
+                ts = pd.to_datetime(d.get("_id").generation_time, utc=True)
+            try:
+                records.append({"datetime": ts, "kp": float(kp)})
+            except Exception:
+                continue
+    df = pd.DataFrame(records)
+    df["datetime"] = pd.to_datetime(df["datetime"], utc=True)
+    return df.sort_values("datetime").reset_index(drop=True)
+
+
+def new_load(col):
+    """train_lstm.load_kp_series now (collection mode, no kp_cache)."""
+    return kp_history.to_frame(*kp_history.load_preferred(col))
+
+
+def measure(label, fn, col):
+    tracemalloc.start()
+    t0 = time.perf_counter()
+    df = fn(col)
+    dt = time.perf_counter() - t0
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{label:<8} {len(df):>10,} values  {dt:>8.2f} s  peak {peak / 1e6:>8.1f} MB")
+    return df
+
+
+client = MongoClient(MONGO_URI)
+bench_db = f"{DB_NAME}_bench"
+client.drop_database(bench_db)
+col = client[bench_db]["forecast_forecast3day"]
+try:
+    random.seed(5)
+    thirds = [round(k / 3, 2) for k in range(28)]
+    start = datetime(1900, 1, 1)
+    batch = []
+    for i in range(DAYS):
+        doc = {"date": start + timedelta(days=i), "source": "gfz",
+               "kp_index": [random.choice(thirds[:16]) for _ in range(8)]}
+        if i % 3 == 0:
+            doc = kp_codec.pack_doc(doc)
+        batch.append(doc)
+        if len(batch) == 10_000:
+            col.insert_many(batch)
+            batch = []
+    if batch:
+        col.insert_many(batch)
+    col.create_index([("date", 1), ("source", 1)], unique=True)
+    print(f"{DAYS:,} day documents ({DAYS * 8:,} values)")
+
+    old = measure("legacy", legacy_load, col)
+    new = measure("streamed", new_load, col)
+    same = len(old) == len(new) and (old["kp"].round(4).values == new["kp"].round(4).values).all() \
+        and (old["datetime"].values == new["datetime"].values).all()
+    print("identical series" if same else "SERIES DIFFER")
+finally:
+    client.drop_database(bench_db)
@@ -0,0 +1,73 @@
+# backend/scripts/bench_kp_load_parallel.py
+"""
+Cold-load time of the series training reads (ml_model.kp_history.load_preferred,
+also the kp_cache cold build) with one cursor against the day-window
+partitioned scan on several thread counts.
+
+  MONGO_URI=mongodb://localhost:27017 python scripts/bench_kp_load_parallel.py [documents] [workers ...]
+
+The default 400k day documents are 3.2M slots; every fifth day also holds a
+model-output document, so each partition has days to reduce. Runs in a
+scratch database (<MONGO_DB>_bench, dropped afterwards); every run is checked
+against the single-cursor series.
+"""
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+from pymongo import MongoClient
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from api import kp_codec  # noqa: E402
+from ml_model import kp_history  # noqa: E402
+
+MONGO_URI = os.environ.get("MONGO_URI")
+DB_NAME = os.environ.get("MONGO_DB", "forecast3day")
+DOCS = int(sys.argv[1]) if len(sys.argv) > 1 else 400_000
+WORKERS = [int(w) for w in sys.argv[2:]] or [2, 4, 8]
+
+if not MONGO_URI:
+    sys.exit("Set MONGO_URI")
+
+client = MongoClient(MONGO_URI)
+bench_db = f"{DB_NAME}_bench"
+client.drop_database(bench_db)
+col = client[bench_db]["forecast_forecast3day"]
+try:
+    random.seed(11)
+    thirds = [round(k / 3, 2) for k in range(28)]
+    start = datetime(900, 1, 1)
+    batch = []
+    for i in range(DOCS):
+        doc = {"date": start + timedelta(days=i), "source": "gfz",
+               "kp_index": [random.choice(thirds[:16]) for _ in range(8)]}
+        if i % 2:
+            doc = kp_codec.pack_doc(doc)
+        batch.append(doc)
+        if i % 5 == 0:
+            batch.append({"date": doc["date"], "source": "lstm_kp_model", "kp_index": [9.0] * 8})
+        if len(batch) >= 10_000:
+            col.insert_many(batch)
+            batch = []
+    if batch:
+        col.insert_many(batch)
+    col.create_index([("date", 1), ("source", 1)], unique=True)
+    print(f"{DOCS:,} days ({DOCS * 8:,} preferred slots)")
+
+    t0 = time.perf_counter()
+    base_times, base_values = kp_history.load_preferred(col, workers=1)
+    single = time.perf_counter() - t0
+    print(f"{'1 cursor':<12} {single:>8.2f} s  {len(base_values) / single:>12,.0f} slots/s")
+
+    for workers in WORKERS:
+        t0 = time.perf_counter()
+        times, values = kp_history.load_preferred(col, workers=workers)
+        dt = time.perf_counter() - t0
+        same = np.array_equal(times, base_times) and np.array_equal(values, base_values)
+        print(f"{f'{workers} workers':<12} {dt:>8.2f} s  {len(values) / dt:>12,.0f} slots/s  "
+              f"x{single / dt:.2f}  {'identical' if same else 'SERIES DIFFER'}")
+finally:
+    client.drop_database(bench_db)
@@ -0,0 +1,76 @@
+# backend/scripts/bench_train_windows.py
+"""
+Training input memory and epoch time: the previous create_sequences
+(Python list of slices -> np.array, X and y passed to model.fit) against the
+strided views / tf.data pipeline of ml_model.train_lstm.
+
+  python scripts/bench_train_windows.py [points] [epochs]
+
+Each variant runs in its own subprocess so the peak RSS figures are not
+shared. Reported per variant: time and tracemalloc peak for building the
+windows, mean epoch time, and process peak RSS after training. Needs the
+training dependencies (tensorflow, scikit-learn); uses a synthetic series,
+no database.
+"""
+import os
+import subprocess
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+POINTS = int(sys.argv[1]) if len(sys.argv) > 1 else 300_000
+EPOCHS = int(sys.argv[2]) if len(sys.argv) > 2 else 2
+MODES = ("arrays", "dataset")
+
+
+def legacy_sequences(values, input_len, output_len):
+    """train_lstm.create_sequences before the strided views."""
+    X, y = [], []
+    for i in range(len(values) - input_len - output_len + 1):
+        X.append(values[i:i + input_len])
+        y.append(values[i + input_len: i + input_len + output_len])
+    return np.array(X), np.array(y)
+
+
+def run(mode):
+    sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    from ml_model import train_lstm as t
+
+    rng = np.random.default_rng(3)
+    series = (rng.integers(0, 28, POINTS) / 27).astype(np.float32)
+    seq, out, batch = t.SEQ_LENGTH, t.FORECAST_LENGTH, t.BATCH_SIZE
+
+    tracemalloc.start()
+    t0 = time.perf_counter()
+    if mode == "arrays":
+        X, y = legacy_sequences(series.reshape(-1, 1).astype(float), seq, out)
+        X = X.reshape((X.shape[0], seq, 1))
+        y = y.reshape((y.shape[0], out))
+        split = int(0.8 * len(X))
+        fit_args = dict(x=X[:split], y=y[:split], validation_data=(X[split:], y[split:]), batch_size=batch)
+    else:
+        n_windows = len(series) - seq - out + 1
+        split = int(0.8 * n_windows)
+        tensor = t.tf.constant(series)
+        fit_args = dict(x=t.window_dataset(tensor, 0, split, seq, out, batch, shuffle=True),
+                        validation_data=t.window_dataset(tensor, split, n_windows, seq, out, batch))
+    build = time.perf_counter() - t0
+    _, build_peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    stats = t.EpochStats()
+    model = t.build_model((seq, 1), out)
+    model.fit(epochs=EPOCHS, callbacks=[stats], verbose=0, **fit_args)
+    print(f"{mode:<8} windows {build:>7.2f} s / {build_peak / 1e6:>8.1f} MB   "
+          f"epoch {np.mean(stats.epoch_seconds):>7.2f} s   peak RSS {t.peak_rss_mb()} MB")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 3:
+        run(sys.argv[3])
+    else:
+        print(f"{POINTS:,} points, {EPOCHS} epoch(s)")
+        for mode in MODES:
+            subprocess.run([sys.executable, os.path.abspath(__file__), str(POINTS), str(EPOCHS), mode], check=True)
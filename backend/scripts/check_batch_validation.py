@@ -0,0 +1,107 @@
+# backend/scripts/check_batch_validation.py
+"""
+Equivalence check: api.validation.validate_batch / field_errors against
+Forecast3Day.full_clean() on generated edge cases, plus a timing of both on a
+large valid batch. Needs Django settings but no database.
+
+  python scripts/check_batch_validation.py [records]
+
+Exits non-zero and prints the records on which the three disagree.
+"""
+import itertools
+import os
+import random
+import sys
+import time
+from datetime import date, datetime, timedelta
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "forecast_project.settings")
+import django  # noqa: E402
+
+django.setup()
+
+from django.core.exceptions import ValidationError  # noqa: E402
+
+from api import validation  # noqa: E402
+from forecast.models import Forecast3Day  # noqa: E402
+
+RECORDS = int(sys.argv[1]) if len(sys.argv) > 1 else 20_000
+
+today = datetime.utcnow().date()
+CASES = {
+    "date": [date(2024, 3, 1), datetime(2024, 3, 1, 12), "2024-03-01", "2024-3-1", "2024-02-30",
+             "2024-03-01T00:00:00", " 2024-03-01", "", None, 20240301, today + timedelta(days=2)],
+    "kp_index": [[], None, [1.0, 2.33, 9], [0] * 8, [0] * 9, [-0.1], [9.01], [None, 3], ["3"], ["x"],
+                 [[1]], [True], 3, "3", {}, {"a": 1}, [float("nan")]],
+    "solar_radiation": [[], None, [1, 2], {"S1": 5}, 5, "x"],
+    "a_index": [None, "", 0, 12, -1, 3.7, "7", "7.0", "x", 2147483647, 2147483648, True, [1], {}],
+    "radio_flux": [None, "", 0, 70.5, -0.5, "70.1", "x", float("nan"), [70]],
+    "radio_blackout": [{}, None, {"R1-R2": 10, "R3 or greater": 1}, {"R1-R2": -1}, {"R9": 1},
+                       {"R1-R2": "5"}, {"R1-R2": True}, [1], 5],
+    "source": ["", None, "noaa", "x" * 32, "x" * 33],
+    "rationale_geomagnetic": ["", None, "NOAA baseline", "model output"],
+}
+VALID = {"date": date(2024, 3, 1), "kp_index": [1.0, 2.0], "solar_radiation": [], "a_index": 5,
+         "radio_flux": 70.0, "radio_blackout": {}, "source": "ml", "rationale_geomagnetic": "model"}
+
+
+def model_ok(rec):
+    try:
+        Forecast3Day(**rec).full_clean()
+    except (ValidationError, ValueError, TypeError, OverflowError):
+        return False
+    return True
+
+
+def cases():
+    # every field value on an otherwise valid record, then random mixes
+    for field, values in CASES.items():
+        for value in values:
+            yield dict(VALID, **{field: value})
+    for day, rationale in itertools.product(CASES["date"], CASES["rationale_geomagnetic"]):
+        yield dict(VALID, date=day, rationale_geomagnetic=rationale)
+    rng = random.Random(3)
+    for _ in range(2000):
+        yield {field: rng.choice(values) for field, values in CASES.items()}
+
+
+records = list(cases())
+masks = validation.validate_batch(records)
+mismatches = []
+for i, rec in enumerate(records):
+    expected = model_ok(rec)
+    single = not validation.field_errors(rec)
+    batch = not masks["invalid"][i]
+    if not expected == single == batch:
+        mismatches.append((rec, expected, single, batch))
+
+print(f"{len(records)} edge-case records, {len(mismatches)} disagreement(s)")
+for rec, expected, single, batch in mismatches[:20]:
+    print(f"  full_clean={expected} field_errors={single} validate_batch={batch}: {rec}")
+
+rng = random.Random(7)
+bulk = [
+    {
+        "date": date(1932, 1, 1) + timedelta(days=i),
+        "kp_index": [round(rng.uniform(0, 9), 2) for _ in range(8)],
+        "solar_radiation": [],
+        "a_index": rng.randint(0, 40),
+        "radio_flux": round(rng.uniform(65, 250), 1),
+        "radio_blackout": {"R1-R2": rng.randint(0, 40), "R3 or greater": rng.randint(0, 5)},
+        "source": "ml",
+        "rationale_geomagnetic": "model output",
+    }
+    for i in range(RECORDS)
+]
+t0 = time.perf_counter()
+for rec in bulk[:2000]:
+    model_ok(rec)
+per_record = 2000 / (time.perf_counter() - t0)
+t0 = time.perf_counter()
+validation.validate_batch(bulk)
+batched = RECORDS / (time.perf_counter() - t0)
+print(f"full_clean per record: {per_record:>10,.0f} rec/s (sample 2000)")
+print(f"validate_batch       : {batched:>10,.0f} rec/s ({RECORDS} records)")
+
+sys.exit(1 if mismatches else 0)
@@ -0,0 +1,47 @@
+# backend/scripts/check_derive.py
+"""
+Edge cases of api.derive.derive_rows: one result per input row, including
+batches whose rows are all empty ([[]], [None]) and so build a zero-width
+matrix, and G levels for Kp written at 2 or 3 decimals. No Django or
+database needed.
+
+  python scripts/check_derive.py
+
+Exits non-zero and prints the failing cases.
+"""
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from api import derive  # noqa: E402
+
+EMPTY = {"ap_index": [], "ap_daily": None, "kp_max": None, "g_scale": None}
+CASES = [
+    ([], []),
+    ([[]], [EMPTY]),
+    ([None], [EMPTY]),
+    ([[], None], [EMPTY, EMPTY]),
+    ([[None] * 8], [EMPTY]),
+    ([[], [1, 2]], [EMPTY, {"ap_index": [4, 7], "ap_daily": 6, "kp_max": 2.0, "g_scale": 0}]),
+    ([[5.0] * 8], [{"ap_index": [48] * 8, "ap_daily": 48, "kp_max": 5.0, "g_scale": 1}]),
+    # 5- at any precision is G1, 4+ is not
+    ([[4.667] * 8], [{"ap_index": [39] * 8, "ap_daily": 39, "kp_max": 4.67, "g_scale": 1}]),
+    ([[4.67] * 8], [{"ap_index": [39] * 8, "ap_daily": 39, "kp_max": 4.67, "g_scale": 1}]),
+    ([[4.333] * 8], [{"ap_index": [32] * 8, "ap_daily": 32, "kp_max": 4.33, "g_scale": 0}]),
+    ([[8.667] * 8], [{"ap_index": [300] * 8, "ap_daily": 300, "kp_max": 8.67, "g_scale": 5}]),
+]
+
+failures = []
+for rows, expected in CASES:
+    got = derive.derive_rows(rows)
+    if got != expected:
+        failures.append((rows, expected, got))
+
+docs = derive.apply([{"kp_index": []}, {"kp_index": None}])
+if [{k: d[k] for k in derive.DERIVED_FIELDS} for d in docs] != [EMPTY, EMPTY]:
+    failures.append(("apply", [EMPTY, EMPTY], docs))
+
+for rows, expected, got in failures:
+    print(f"{rows!r}: expected {expected!r}, got {got!r}")
+print(f"{len(CASES) + 1 - len(failures)}/{len(CASES) + 1} derive cases ok")
+sys.exit(1 if failures else 0)
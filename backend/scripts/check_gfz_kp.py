@@ -0,0 +1,57 @@
+# backend/scripts/check_gfz_kp.py
+"""
+GFZ archive thirds end to end: a day of 5- (4.667 in the archive) parsed by
+api.gfz_kp is stored on the thirds grid, packs with api.kp_codec, derives G1
+and counts as a storm day in the daily rollup. No Django or database needed.
+
+  python scripts/check_gfz_kp.py
+
+Exits non-zero and prints the failing cases.
+"""
+import io
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from api import derive, gfz_kp, kp_codec, rollups  # noqa: E402
+from api.utils_spaceweather import to_utc_date  # noqa: E402
+
+
+def daily_line(y, m, d, kp):
+    # YYYY MM DD days days_m Bsr dB Kp1..Kp8 ap1..ap8 Ap SN F10.7obs F10.7adj D
+    ap = [derive.kp_to_ap(v) for v in kp]
+    cols = [y, m, d, 0, 0.5, 2600, 1] + kp + ap + [sum(ap) // 8, 100, 150.0, 150.0, 0]
+    return " ".join(str(c) for c in cols) + "\n"
+
+
+ARCHIVE = (
+    "# synthetic GFZ daily archive\n"
+    + daily_line(2003, 10, 29, [4.667] * 8)   # 5- all day: G1
+    + daily_line(2003, 10, 30, [4.333] * 8)   # 4+: quiet
+    + daily_line(2003, 10, 31, [0.333, 8.667, 2.0, 5.667, 1.0, 0.0, 3.333, 6.667])
+)
+EXPECTED = {
+    "2003-10-29": {"kp_index": [4.67] * 8, "g_scale": 1, "storm_days": 1},
+    "2003-10-30": {"kp_index": [4.33] * 8, "g_scale": 0, "storm_days": 0},
+    "2003-10-31": {"kp_index": [0.33, 8.67, 2.0, 5.67, 1.0, 0.0, 3.33, 6.67], "g_scale": 5, "storm_days": 1},
+}
+
+failures = []
+docs = derive.apply(gfz_kp.to_docs(gfz_kp.parse(io.StringIO(ARCHIVE))))
+for doc in docs:
+    day = to_utc_date(doc["date"])
+    expected = EXPECTED[day.isoformat()]
+    got = {
+        "kp_index": doc["kp_index"],
+        "g_scale": doc["g_scale"],
+        "storm_days": rollups.daily_rollup(day, doc)["storm_days"],
+    }
+    if got != expected:
+        failures.append((day, expected, got))
+    if kp_codec.encode(doc["kp_index"]) is None:
+        failures.append((day, "packable kp_index", doc["kp_index"]))
+
+for day, expected, got in failures:
+    print(f"{day}: expected {expected!r}, got {got!r}")
+print(f"{len(docs) - len({f[0] for f in failures})}/{len(EXPECTED)} GFZ days ok")
+sys.exit(1 if failures or len(docs) != len(EXPECTED) else 0)
@@ -0,0 +1,88 @@
+# backend/scripts/check_retention_rewrite.py
+"""
+Re-ingesting an archived day (api.retention): after an archive run, an
+upload for an old date lands in the hot collection next to the archived
+copy. Readers must see that (date, source) once - the new values - and the
+next archive run must leave one copy in the archive.
+
+  MONGO_URI=... python scripts/check_retention_rewrite.py
+
+Runs in a scratch database (<MONGO_DB>_check, dropped afterwards). Exits
+non-zero and prints the failing checks.
+"""
+import os
+import sys
+from datetime import date, datetime, timedelta
+
+from pymongo import MongoClient
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from api import ingest, retention  # noqa: E402
+
+MONGO_URI = os.environ.get("MONGO_URI")
+DB_NAME = os.environ.get("MONGO_DB", "noaa_database")
+DAYS = 60
+START = date(2001, 1, 1)
+REWRITTEN = START + timedelta(days=21)
+
+if not MONGO_URI:
+    sys.exit("Set MONGO_URI")
+
+
+def record(day, kp, source):
+    return {"date": day.isoformat(), "kp_index": [kp] * 8, "a_index": 5, "radio_flux": 70.0, "source": source}
+
+
+def kp_of(docs, day, source):
+    return [d["kp_index"][0] for d in docs if d["date"].date() == day and d["source"] == source]
+
+
+client = MongoClient(MONGO_URI)
+check_db = f"{DB_NAME}_check"
+client.drop_database(check_db)
+col = client[check_db]["forecast_forecast3day"]
+col.create_index([("date", 1), ("source", 1)], unique=True)
+failures = []
+
+
+def check(label, ok):
+    print(f"{'ok  ' if ok else 'FAIL'} {label}")
+    if not ok:
+        failures.append(label)
+
+
+try:
+    records = [record(START + timedelta(days=i), 1.0, "noaa") for i in range(DAYS)]
+    records += [record(START + timedelta(days=i), 2.0, "ml") for i in range(0, DAYS, 3)]
+    ingest.ingest_records(col, records, batch_size=25)
+    stored = col.count_documents({})
+    retention.archive(col, hot_days=(datetime.utcnow() - datetime(2002, 1, 1)).days, batch_size=25)
+    check("everything archived", col.count_documents({}) == 0)
+
+    # an upload for an archived day: the writers only look at the hot collection
+    counts, _ = ingest.ingest_records(col, [record(REWRITTEN, 7.0, "noaa")], batch_size=25)
+    check("re-ingested day written to the hot collection", counts["created"] == 1)
+
+    def readers_see_one_copy(stage):
+        days = retention.read_days(col, [REWRITTEN])
+        check(f"{stage}: read_days holds the new noaa values once", kp_of(days, REWRITTEN, "noaa") == [7.0])
+        check(f"{stage}: read_days keeps the other source", kp_of(days, REWRITTEN, "ml") == [2.0])
+        docs = retention.read_range(col, START, START + timedelta(days=DAYS))
+        check(f"{stage}: read_range holds every (date, source) once", len(docs) == stored)
+        check(f"{stage}: read_range has the new values", kp_of(docs, REWRITTEN, "noaa") == [7.0])
+        archived = list(retention.iter_archived(col))
+        check(f"{stage}: iter_archived holds every (date, source) once",
+              len({(d["date"], d["source"]) for d in archived}) == len(archived))
+        every = list(retention.iter_all(col))
+        check(f"{stage}: iter_all holds every (date, source) once", len(every) == stored)
+
+    readers_see_one_copy("hot + archived")
+    retention.archive(col, hot_days=(datetime.utcnow() - datetime(2002, 1, 1)).days, batch_size=25)
+    check("re-archived", col.count_documents({}) == 0)
+    check("archive holds each (date, source) once", sum(c["count"] for c in retention.chunks(col)) == stored)
+    readers_see_one_copy("re-archived")
+finally:
+    client.drop_database(check_db)
+
+print(f"{'all checks passed' if not failures else f'{len(failures)} check(s) failed'}")
+sys.exit(1 if failures else 0)
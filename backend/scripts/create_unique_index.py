@@ -1,13 +1,27 @@
+# backend/scripts/create_unique_index.py
+"""
+Standalone index setup (no Django): reconciles the indexes declared in
+api.indexes. Prefer `python manage.py ensure_indexes [--apply]`.
+
+Several sources (NOAA, model, seeders) publish the same day, so uniqueness
+is on (date, source), the key every writer upserts on.
+"""
 import os
+import sys
+
 from pymongo import MongoClient
 
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from api import indexes  # noqa: E402
+
 MONGO_URI = os.environ.get("MONGO_URI", "mongodb://localhost:27018")
 DB_NAME = os.environ.get("MONGO_DB", "noaa_database")
-COLLECTION_NAME = os.environ.get("MONGO_COLLECTION", "forecast_forecast3day")
 
 client = MongoClient(MONGO_URI)
 db = client[DB_NAME]
-coll = db[COLLECTION_NAME]
 
-coll.create_index("date", unique=True)
-print("Unique index on 'date' created.")
+actions = [a for a in indexes.plan(db) if a.op != "extra"]
+for action in actions:
+    print(indexes.describe(action))
+indexes.apply(db, actions)
+print(f"Applied {len(actions)} index change(s).")
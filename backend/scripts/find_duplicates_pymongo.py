@@ -1,26 +1,34 @@
 # scripts/find_duplicates_pymongo.py
-import os
+"""
+Report duplicate forecast documents without changing anything (no Django).
+Scans in date windows through api.dedupe instead of one $group over the
+whole collection; `python manage.py dedupe_forecasts` removes them.
+
+    python scripts/find_duplicates_pymongo.py [source|day]
+"""
 import json
+import os
+import sys
+
 from pymongo import MongoClient
-from bson import ObjectId
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from api import dedupe  # noqa: E402
 
 MONGO_URI = os.environ.get("MONGO_URI")
 DB_NAME = os.environ.get("MONGO_DB", "noaa_database")
 COLLECTION_NAME = os.environ.get("MONGO_COLLECTION", "forecast_forecast3day")
+BY = sys.argv[1] if len(sys.argv) > 1 else "source"
 
 client = MongoClient(MONGO_URI, serverSelectionTimeoutMS=5000)
 coll = client[DB_NAME][COLLECTION_NAME]
 
-# Group by date, find duplicates
-pipeline = [
-    {"$group": {
-        "_id": "$date",
-        "count": {"$sum": 1},
-        "ids": {"$push": "$_id"}
-    }},
-    {"$match": {"count": {"$gt": 1}}},
-]
-
-dupes = list(coll.aggregate(pipeline))
+first, last = dedupe.date_bounds(coll)
+report = []
+if first is not None:
+    for lo, hi in dedupe.windows(first, last, 31):
+        ids, days = dedupe.dedupe_window(coll, lo, hi, by=BY, dry_run=True)
+        if ids:
+            report.append({"window": [lo, hi], "days": days, "would_remove": ids})
 
-print(json.dumps(dupes, default=str, indent=2))
+print(json.dumps(report, default=str, indent=2))
@@ -0,0 +1,83 @@
+# backend/scripts/load_test_rate_limit.py
+"""
+Load test for api.ratelimit: one abusive poller vs. several well-behaved clients.
+
+Run the API the way production does (gunicorn, 3 sync workers), with
+RATE_LIMIT_PROXY_HOPS=1 so the X-Forwarded-For set here is taken as the
+client address (there is no proxy in front to append its own), then:
+
+  API_BASE=http://127.0.0.1:8000 python scripts/load_test_rate_limit.py
+
+The abuser hammers the endpoint from ABUSER_THREADS threads; each normal
+client polls once per NORMAL_INTERVAL seconds. With fair service the normal
+clients should see ~100% 200s and stable latency while the abuser absorbs
+the 429/503 responses.
+"""
+import os
+import statistics
+import threading
+import time
+import urllib.error
+import urllib.request
+from collections import defaultdict
+
+API_BASE = os.environ.get("API_BASE", "http://127.0.0.1:8000").rstrip("/")
+ENDPOINT = os.environ.get("ENDPOINT", "/api/forecast/3day")
+DURATION = float(os.environ.get("DURATION", 30))
+ABUSER_THREADS = int(os.environ.get("ABUSER_THREADS", 16))
+NORMAL_CLIENTS = int(os.environ.get("NORMAL_CLIENTS", 5))
+NORMAL_INTERVAL = float(os.environ.get("NORMAL_INTERVAL", 1.0))
+
+results = defaultdict(lambda: {"codes": defaultdict(int), "latency": []})
+lock = threading.Lock()
+deadline = time.time() + DURATION
+
+
+def call(client):
+    req = urllib.request.Request(API_BASE + ENDPOINT, headers={"X-Forwarded-For": client})
+    t0 = time.perf_counter()
+    try:
+        with urllib.request.urlopen(req, timeout=30) as resp:
+            resp.read()
+            code = resp.status
+    except urllib.error.HTTPError as e:
+        code = e.code
+    except Exception:
+        code = "error"
+    elapsed = (time.perf_counter() - t0) * 1000
+    with lock:
+        results[client]["codes"][code] += 1
+        if code == 200:
+            results[client]["latency"].append(elapsed)
+
+
+def abuser():
+    while time.time() < deadline:
+        call("10.66.66.66")
+
+
+def normal(i):
+    while time.time() < deadline:
+        started = time.time()
+        call(f"10.0.0.{i + 1}")
+        time.sleep(max(0.0, NORMAL_INTERVAL - (time.time() - started)))
+
+
+threads = [threading.Thread(target=abuser) for _ in range(ABUSER_THREADS)]
+threads += [threading.Thread(target=normal, args=(i,)) for i in range(NORMAL_CLIENTS)]
+print(f"{ABUSER_THREADS} abuser threads + {NORMAL_CLIENTS} normal clients for {DURATION:.0f}s -> {API_BASE}{ENDPOINT}")
+for t in threads:
+    t.start()
+for t in threads:
+    t.join()
+
+print(f"\n{'client':<14}{'requests':>9}{'200':>7}{'429':>7}{'503':>7}{'ok %':>7}{'p50 ms':>9}{'p95 ms':>9}")
+for client in sorted(results, key=lambda c: c != "10.66.66.66"):
+    r = results[client]
+    total = sum(r["codes"].values())
+    ok = r["codes"].get(200, 0)
+    lat = sorted(r["latency"])
+    p50 = statistics.median(lat) if lat else float("nan")
+    p95 = lat[int(0.95 * (len(lat) - 1))] if lat else float("nan")
+    print(f"{client:<14}{total:>9}{ok:>7}{r['codes'].get(429, 0):>7}{r['codes'].get(503, 0):>7}"
+          f"{100.0 * ok / total if total else 0:>7.1f}{p50:>9.1f}{p95:>9.1f}")
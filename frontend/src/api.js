@@ -2,6 +2,7 @@
 // Robust fetch helper for 3-day forecast.
 // - Accepts multiple backend shapes
 // - Ap Index derived from fractional Kp Index (thirds-aware) if backend missing
+//   (the backend stores ap_daily / kp_max / g_scale at write time; those win)
 // - Force Solar Radiation = [1], solar_radiation_pct = 1
 // - Force Radio Blackout = { "R1-R2": 35, "R3 or greater": 1 }
 
@@ -256,6 +257,8 @@ function normalizePredictions(raw = {}) {
         if (p.ap != null && !Array.isArray(p.ap)) providedAp = Number(p.ap);
         if (Array.isArray(p.a_index) && p.a_index[i] != null) providedA = Number(p.a_index[i]);
         if (Array.isArray(p.ap) && p.ap[i] != null) providedAp = Number(p.ap[i]);
+        // derived at write time by the backend (api/derive.py)
+        if (p.ap_daily != null) providedAp = Number(p.ap_daily);
       }
     } else {
       for (const p of preds) {
@@ -267,7 +270,7 @@ function normalizePredictions(raw = {}) {
       }
     }
 
-    // compute ap correctly from the full kp8 array (not from avg)
+    // fallback for records without backend-derived values: compute ap from the full kp8 array (not from avg)
     const apFromKp = computeApFromKpArray(kp8);
 
     const finalAp = providedAp != null ? providedAp : apFromKp;
@@ -302,6 +305,8 @@ function normalizePredictions(raw = {}) {
       kp_avg: kpAvg,
       a_index: finalA,
       ap: finalAp,
+      kp_max: dayDoc && dayDoc.kp_max != null ? Number(dayDoc.kp_max) : Math.max(...kp8),
+      g_scale: dayDoc && dayDoc.g_scale != null ? Number(dayDoc.g_scale) : null,
       // forced solar & radio blackout fields
       solar_radiation: [1],
       solar_radiation_pct: SOLAR_PCT,
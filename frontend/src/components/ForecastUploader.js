@@ -10,45 +10,78 @@ import {
   LinearProgress,
   Box
 } from '@mui/material';
-import { API_URL } from '../config'; // ✅ use centralized API_URL
+import { UPLOAD_URL } from '../config'; // ✅ use centralized upload URL
+
+const POLL_INTERVAL_MS = 1000;
+const TOKEN_KEY = 'forecastUploadToken';
+const sleep = (ms) => new Promise((resolve) => setTimeout(resolve, ms));
+
+// the upload token is typed in by the operator and kept for this tab only, never built into the bundle
+const uploadToken = ({ renew = false } = {}) => {
+  if (renew) sessionStorage.removeItem(TOKEN_KEY);
+  let token = sessionStorage.getItem(TOKEN_KEY);
+  if (!token) {
+    token = (window.prompt('Upload token') || '').trim();
+    if (token) sessionStorage.setItem(TOKEN_KEY, token);
+  }
+  return token;
+};
+
+const postUpload = (form, token) =>
+  axios.post(UPLOAD_URL, form, {
+    headers: token ? { Authorization: `Bearer ${token}` } : {},
+  });
 
 const ForecastUploader = ({ onUploadSuccess = () => {} }) => {
   const [uploading, setUploading] = useState(false);
+  const [progress, setProgress] = useState(null);
 
   const handleFileChange = async (e) => {
     const file = e.target.files[0];
     if (!file) return;
 
-    const reader = new FileReader();
+    try {
+      setUploading(true);
+      setProgress(null);
 
-    reader.onload = async (event) => {
+      // send the whole file once; the backend parses and stores it in the background
+      const form = new FormData();
+      form.append('file', file);
+      let response;
       try {
-        setUploading(true);
-
-        // parse JSON file
-        const raw = JSON.parse(event.target.result);
-        const dataArray = Array.isArray(raw) ? raw : [raw];
+        response = await postUpload(form, uploadToken());
+      } catch (err) {
+        if (!err.response || err.response.status !== 403) throw err;
+        // missing or stale token: ask once more
+        response = await postUpload(form, uploadToken({ renew: true }));
+      }
+      const { data } = response;
 
-        // POST each entry to the correct API endpoint
-        await Promise.all(
-          dataArray.map((entry) =>
-            axios.post(API_URL, entry, {
-              headers: { 'Content-Type': 'application/json' },
-            })
-          )
-        );
+      // poll job status until the background ingest finishes
+      let job = data;
+      while (job.status === 'queued' || job.status === 'running') {
+        await sleep(POLL_INTERVAL_MS);
+        ({ data: job } = await axios.get(`${UPLOAD_URL}/${data.job_id}`));
+        setProgress(job);
+      }
 
+      if (job.status !== 'done') {
+        throw new Error(job.failure || `ingest job ${job.status}`);
+      }
+      if (job.invalid) {
+        console.warn('⚠️ Some records were rejected', job.errors);
+        alert(`✅ Forecast uploaded: ${job.created + job.updated} saved, ${job.invalid} rejected (see console).`);
+      } else {
         alert('✅ Forecast uploaded successfully!');
-        onUploadSuccess();
-      } catch (error) {
-        console.error('⚠️ Upload failed', error);
-        alert('⚠️ Upload failed. Please check the console for details.');
-      } finally {
-        setUploading(false);
       }
-    };
-
-    reader.readAsText(file);
+      onUploadSuccess();
+    } catch (error) {
+      console.error('⚠️ Upload failed', error);
+      alert('⚠️ Upload failed. Please check the console for details.');
+    } finally {
+      setUploading(false);
+      e.target.value = '';
+    }
   };
 
   return (
@@ -61,7 +94,7 @@ const ForecastUploader = ({ onUploadSuccess = () => {} }) => {
         <Box display="flex" alignItems="center" gap={2}>
           <input
             type="file"
-            accept=".json"
+            accept=".json,.ndjson,.jsonl"
             id="upload-forecast"
             style={{ display: 'none' }}
             onChange={handleFileChange}
@@ -82,7 +115,9 @@ const ForecastUploader = ({ onUploadSuccess = () => {} }) => {
           </label>
           {uploading && (
             <Typography variant="body2" sx={{ color: '#facc15' }}>
-              Uploading data...
+              {progress
+                ? `Processed ${progress.processed} records (${progress.invalid} rejected)...`
+                : 'Uploading data...'}
             </Typography>
           )}
         </Box>